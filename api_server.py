@@ -0,0 +1,462 @@
+# api_server.py
+"""
+Read-only HTTP query API over the requirement store.
+
+Lets other PLM tools read requirements, impacts, history and compliance
+status without going through the Streamlit UI.
+
+Endpoints (GET only, JSON):
+    /health
+    /requirements            ?regulation_id= &country= &q= &limit= &offset=
+    /requirements/<id>
+    /impacts                 ?component= &test= &document= &criticality=
+    /impacts/<id>
+    /history                 ?requirement_id= &change_type= &since= &until=
+    /compliance              ?market=eu|india|japan &status=OK|NOK|NA|none
+
+List endpoints are paginated (limit / offset) and every response carries an
+ETag, so clients can revalidate with If-None-Match and get a 304. Bodies are
+gzip-compressed when the client sends Accept-Encoding: gzip.
+
+Usage:
+    python api_server.py --port 8765      # state read from the traceability log (read-only)
+or from the Streamlit process (shares the live store):
+    start_background_server(store)
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import asdict
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from data_store import InMemoryStore, StoreView
+
+
+# ==========================
+#  Config
+# ==========================
+API_HOST = "127.0.0.1"
+API_PORT = 8765
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Below this size gzip costs more CPU than it saves on the wire.
+GZIP_MIN_BYTES = 1024
+
+# Encoded responses kept per (store revision, path, query).
+RESPONSE_CACHE_SIZE = 512
+
+MARKETS = {
+    "eu": "compliance_eu",
+    "india": "compliance_india",
+    "japan": "compliance_japan",
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# =====================
+#  Petites fonctions
+# =====================
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+def _first(params: Dict[str, List[str]], name: str) -> Optional[str]:
+    values = params.get(name)
+    if not values:
+        return None
+    value = values[0].strip()
+    return value or None
+
+
+def _int_param(params: Dict[str, List[str]], name: str, default: int, maximum: int,
+               minimum: int = 0) -> int:
+    raw = _first(params, name)
+    if raw is None:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ApiError(400, f"Parameter '{name}' must be an integer")
+    if value < minimum:
+        raise ApiError(400, f"Parameter '{name}' must be >= {minimum}")
+    return min(value, maximum)
+
+
+def _datetime_param(params: Dict[str, List[str]], name: str) -> Optional[datetime]:
+    raw = _first(params, name)
+    if raw is None:
+        return None
+    if raw.endswith(("Z", "z")):
+        raw = raw[:-1] + "+00:00"
+    try:
+        value = datetime.fromisoformat(raw)
+    except ValueError:
+        raise ApiError(400, f"Parameter '{name}' must be an ISO-8601 datetime")
+    # Les horodatages stockés sont en UTC naïf : on compare dans ce référentiel
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _paginate(items: List[Any], params: Dict[str, List[str]],
+              to_dict: Callable[[Any], Dict[str, Any]] = asdict) -> Dict[str, Any]:
+    """Slices the filtered objects first, then only converts the page."""
+    limit = _int_param(params, "limit", DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, minimum=1)
+    offset = _int_param(params, "offset", 0, len(items))
+    page = items[offset:offset + limit]
+    next_offset = offset + len(page)
+    return {
+        "total": len(items),
+        "limit": limit,
+        "offset": offset,
+        "next_offset": next_offset if next_offset < len(items) else None,
+        "items": [to_dict(item) for item in page],
+    }
+
+
+def _compliance_rate(values: List[Optional[str]]) -> Dict[str, Any]:
+    """Same KPI as the page-5 dashboard: OK / (OK + NOK)."""
+    ok = sum(1 for v in values if v == "OK")
+    nok = sum(1 for v in values if v == "NOK")
+    rate = round(100.0 * ok / max(1, ok + nok), 1) if (ok + nok) else 0.0
+    return {"rate": rate, "ok": ok, "nok": nok}
+
+
+def _compliance_row(r: Any) -> Dict[str, Any]:
+    return {
+        "requirement_id": r.id,
+        "regulation_id": r.regulation_id,
+        "eu": r.compliance_eu,
+        "india": r.compliance_india,
+        "japan": r.compliance_japan,
+    }
+
+
+# ============================
+#  Query layer
+# ============================
+
+class StoreQueryApi:
+    """
+    Maps (path, query parameters) to JSON payloads read from a store.
+    Kept independent of the HTTP handler so it can be reused in-process.
+    """
+
+    def __init__(self, store: InMemoryStore) -> None:
+        self.store = store
+        self._cache: "OrderedDict[Tuple[int, str, str], Tuple[bytes, str]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    # --- Routing ---
+    def handle(self, path: str, query: str, view: Optional[StoreView] = None) -> Dict[str, Any]:
+        """`view` pins the store snapshot the whole request is answered from."""
+        view = view or self.store.view()
+        params = parse_qs(query, keep_blank_values=False)
+        parts = [unquote(p) for p in path.strip("/").split("/") if p]
+
+        if parts == ["health"]:
+            return {"status": "ok", "revision": view.revision}
+        if parts == ["requirements"]:
+            return self.list_requirements(view, params)
+        if len(parts) == 2 and parts[0] == "requirements":
+            return self.get_requirement(view, parts[1])
+        if parts == ["impacts"]:
+            return self.list_impacts(view, params)
+        if len(parts) == 2 and parts[0] == "impacts":
+            return self.get_impact(view, parts[1])
+        if parts == ["history"]:
+            return self.list_history(params)
+        if parts == ["compliance"]:
+            return self.list_compliance(view, params)
+
+        raise ApiError(404, f"Unknown endpoint: {path}")
+
+    def encoded_response(self, path: str, query: str) -> Tuple[bytes, str]:
+        """
+        Returns (json body, etag). Bodies are cached per store revision, so
+        a burst of identical reads only serializes once.
+        """
+        # Serveur autonome (journal en lecture seule) : rattrape l'écrivain
+        self.store.refresh_from_log()
+        # Clé et contenu lus sur la même vue : un corps n'est jamais mis en
+        # cache sous la révision précédente d'une écriture concurrente.
+        # /history est lu dans le journal : sa position fait partie de la clé.
+        log = self.store.event_log
+        view = self.store.view()
+        key = (view.revision, log.last_seq if log is not None else 0, path, query)
+        with self._cache_lock:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+                return hit
+
+        payload = self.handle(path, query, view)
+        body = json.dumps(payload, default=_json_default, ensure_ascii=False).encode("utf-8")
+        etag = 'W/"' + hashlib.sha1(body).hexdigest()[:24] + '"'
+
+        with self._cache_lock:
+            self._cache[key] = (body, etag)
+            while len(self._cache) > RESPONSE_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return body, etag
+
+    # --- Requirements ---
+    def list_requirements(self, view: StoreView, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        regulation_id = _first(params, "regulation_id")
+        country = _first(params, "country")
+        q = _first(params, "q")
+        q = q.lower() if q else None
+
+        items = []
+        for r in view.requirements_by_date:
+            if regulation_id and r.regulation_id != regulation_id:
+                continue
+            if country and r.country != country:
+                continue
+            if q and q not in r.id.lower() and q not in r.text_raw.lower() \
+                    and q not in r.text_engineering.lower():
+                continue
+            items.append(r)
+        return _paginate(items, params)
+
+    def get_requirement(self, view: StoreView, req_id: str) -> Dict[str, Any]:
+        req = view.requirements.get(req_id)
+        if req is None:
+            raise ApiError(404, f"Unknown requirement: {req_id}")
+        return asdict(req)
+
+    # --- Impacts ---
+    def list_impacts(self, view: StoreView, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        component = _first(params, "component")
+        test = _first(params, "test")
+        document = _first(params, "document")
+        criticality = _first(params, "criticality")
+
+        items = []
+        for imp in sorted(view.impacts.values(), key=lambda i: i.requirement_id):
+            if component and component not in imp.components:
+                continue
+            if test and test not in imp.tests:
+                continue
+            if document and document not in imp.documents:
+                continue
+            if criticality and imp.criticality != criticality.upper():
+                continue
+            items.append(imp)
+        return _paginate(items, params)
+
+    def get_impact(self, view: StoreView, req_id: str) -> Dict[str, Any]:
+        imp = view.impacts.get(req_id)
+        if imp is None:
+            raise ApiError(404, f"No impact computed for requirement: {req_id}")
+        return asdict(imp)
+
+    # --- History ---
+    def list_history(self, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        requirement_id = _first(params, "requirement_id")
+        change_type = _first(params, "change_type")
+        since = _datetime_param(params, "since")
+        until = _datetime_param(params, "until")
+
+        limit = _int_param(params, "limit", DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, minimum=1)
+        offset = _int_param(params, "offset", 0, sys.maxsize)
+
+        # Streamed from the event log when persistence is enabled.
+        page, total = self.store.query_history(
+            requirement_id, change_type, since, until,
+            limit=limit, offset=offset, newest_first=False,
+        )
+        next_offset = offset + len(page)
+        return {
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "next_offset": next_offset if next_offset < total else None,
+            "items": [asdict(h) for h in page],
+        }
+
+    # --- Compliance ---
+    def list_compliance(self, view: StoreView, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        market = _first(params, "market")
+        status = _first(params, "status")
+        if market and market.lower() not in MARKETS:
+            raise ApiError(400, f"Parameter 'market' must be one of {sorted(MARKETS)}")
+        if status and not market:
+            raise ApiError(400, "Parameter 'status' requires 'market'")
+
+        reqs = view.requirements_by_date
+        summary = {
+            name: _compliance_rate([getattr(r, attr) for r in reqs])
+            for name, attr in MARKETS.items()
+        }
+
+        items = []
+        for r in reqs:
+            if market:
+                value = getattr(r, MARKETS[market.lower()])
+                if status and (value or "none").upper() != status.upper():
+                    continue
+            items.append(r)
+
+        page = _paginate(items, params, _compliance_row)
+        page["summary"] = summary
+        return page
+
+
+# ============================
+#  HTTP layer
+# ============================
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive: load-test clients and PLM connectors reuse connections.
+    protocol_version = "HTTP/1.1"
+    server_version = "R67RegulatoryGPS/1.0"
+
+    api: StoreQueryApi  # set by make_server()
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        try:
+            body, etag = self.api.encoded_response(url.path, url.query)
+        except ApiError as e:
+            self._send_json(e.status, {"error": e.message})
+            return
+        except Exception as e:
+            print("[API] Erreur interne :", e)
+            self._send_json(500, {"error": "Internal server error"})
+            return
+
+        if self._etag_matches(etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self._send_body(200, body, etag)
+
+    def do_HEAD(self) -> None:
+        self.send_response(405)
+        self.send_header("Allow", "GET")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _etag_matches(self, etag: str) -> bool:
+        header = self.headers.get("If-None-Match")
+        if not header:
+            return False
+        if header.strip() == "*":
+            return True
+        # Weak comparison (RFC 9110 §13.1.2).
+        ours = etag[2:] if etag.startswith("W/") else etag
+        for candidate in header.split(","):
+            candidate = candidate.strip()
+            if candidate.startswith("W/"):
+                candidate = candidate[2:]
+            if candidate == ours:
+                return True
+        return False
+
+    def _accepts_gzip(self) -> bool:
+        accept = self.headers.get("Accept-Encoding", "")
+        return any(token.split(";")[0].strip() == "gzip" for token in accept.split(","))
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self._send_body(status, body, None)
+
+    def _send_body(self, status: int, body: bytes, etag: Optional[str]) -> None:
+        gzipped = self._accepts_gzip() and len(body) >= GZIP_MIN_BYTES
+        if gzipped:
+            body = gzip.compress(body, compresslevel=5)
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        if etag:
+            self.send_header("ETag", etag)
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # One line per request would flood the Streamlit console under load.
+        pass
+
+
+class ApiHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # listen() backlog: the default (5) drops SYNs when many readers
+    # connect at once, which shows up as ~1 s retransmit stalls at p99.
+    request_queue_size = 128
+
+
+def make_server(store: InMemoryStore, host: str = API_HOST, port: int = API_PORT) -> ApiHTTPServer:
+    handler = type("BoundApiRequestHandler", (ApiRequestHandler,), {"api": StoreQueryApi(store)})
+    return ApiHTTPServer((host, port), handler)
+
+
+_background_server: Optional[ApiHTTPServer] = None
+_background_lock = threading.Lock()
+
+
+def start_background_server(store: InMemoryStore, host: str = API_HOST,
+                            port: int = API_PORT) -> Optional[ApiHTTPServer]:
+    """
+    Starts the API in a daemon thread, once per process.
+    Streamlit reruns app.py on every interaction, so repeated calls are no-ops.
+    """
+    global _background_server
+    with _background_lock:
+        if _background_server is not None:
+            return _background_server
+        try:
+            server = make_server(store, host, port)
+        except OSError as e:
+            print(f"[API] Impossible de démarrer le serveur sur {host}:{port} :", e)
+            return None
+        threading.Thread(target=server.serve_forever, name="r67-api", daemon=True).start()
+        print(f"[INFO] Read-only API listening on http://{host}:{port}")
+        _background_server = server
+        return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read-only HTTP API over the R67 store")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args()
+
+    from data_store import open_event_log, store
+
+    # Le processus Streamlit est l'écrivain du journal : ici, lecture seule
+    open_event_log(read_only=True)
+    httpd = make_server(store, args.host, args.port)
+    print(f"[INFO] Read-only API listening on http://{args.host}:{args.port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
@@ -1,10 +1,30 @@
 # app.py
+import html
+import uuid
+from urllib.parse import quote
+
 import streamlit as st
 import pandas as pd
 
-from data_store import store
+from data_store import open_event_log, store
 from nlp_extractor import extract_requirements_from_text
-from impact_engine import infer_impact_for_requirement
+from impact_engine import (
+    DEFAULT_INFERENCE,
+    InferenceConfig,
+    list_stale_impacts,
+    recompute_stale_impacts,
+    refresh_impact,
+    tier_stats,
+)
+from api_server import start_background_server
+from campaign_planner import build_coverage_matrix, plan_test_campaign
+from snapshot_io import export_snapshot, open_snapshot
+from text_normalizer import normalize_regulation
+from revision_store import word_diff
+from source_index import locate_requirement, source_index
+import ollama_runtime
+from llm_cassette import active_cassette
+from llm_governor import governor, set_session
 
 # =========================================================
 #  APP CONFIG
@@ -15,6 +35,18 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# Traceability log: this process is its single writer (opened once per process)
+open_event_log()
+
+# Read-only HTTP API for other PLM tools (started once per process)
+start_background_server(store)
+
+# Load Mistral in the background so the first click does not pay the model load time
+ollama_runtime.start_warm_up()
+
+# LLM calls of this browser session share the Ollama queue fairly with the others
+set_session(st.session_state.setdefault("llm_session", uuid.uuid4().hex[:8]))
+
 # =========================================================
 #  GLOBAL CSS STYLING (DARK SIDEBAR, WHITE TEXT)
 # =========================================================
@@ -57,6 +89,23 @@ st.markdown(
         margin-top: 1.5rem;
         margin-bottom: 0.5rem;
     }
+
+    /* ---- VERSION DIFF (page 4) ---- */
+    .diff-box {
+        border: 1px solid #DDDDDD;
+        border-radius: 6px;
+        padding: 0.6rem 0.8rem;
+        white-space: pre-wrap;
+    }
+    .diff-box del {
+        background: #FFD7D5;
+        color: #82071E;
+    }
+    .diff-box ins {
+        background: #CCFFD8;
+        color: #116329;
+        text-decoration: none;
+    }
     </style>
     """,
     unsafe_allow_html=True,
@@ -73,6 +122,12 @@ with st.sidebar:
 
     st.markdown('<div class="sidebar-title-renault">Renault – R67 Regulatory GPS</div>', unsafe_allow_html=True)
 
+    # Lien "jump to source" (?src=<requirement id>) : ouvre la page 1 une fois
+    source_req_id = st.query_params.get("src")
+    if source_req_id and st.session_state.get("source_link_handled") != source_req_id:
+        st.session_state["source_link_handled"] = source_req_id
+        st.session_state["nav_radio"] = "1️⃣ Regulation text"
+
     page = st.radio(
         "Navigation",
         [
@@ -81,10 +136,37 @@ with st.sidebar:
             "3️⃣ Impact analysis",
             "4️⃣ History & traceability",
             "5️⃣ Compliance dashboard",
+            "6️⃣ Component view",
+            "7️⃣ Test campaign planner",
+            "8️⃣ Snapshots (export / import)",
         ],
         key="nav_radio",
     )
 
+    rt = ollama_runtime.status
+    cassette = active_cassette()
+    if cassette is not None and cassette.replaying:
+        st.caption(f"📼 Replaying LLM calls from {cassette.path} ({cassette.hits} served, {cassette.misses} missing)")
+    elif rt.warmup_state == "ready":
+        st.caption(f"🟢 {ollama_runtime.MODEL_NAME} loaded in {rt.warmup_seconds:.1f}s · keep_alive {ollama_runtime.KEEP_ALIVE}")
+    elif rt.warmup_state == "failed":
+        st.caption(f"🔴 {ollama_runtime.MODEL_NAME} warm-up failed (is Ollama running?)")
+    else:
+        st.caption(f"🟡 {ollama_runtime.MODEL_NAME} loading…")
+    for task, ts in rt.tasks.items():
+        if ts.calls:
+            st.caption(f"{task}: last call {ts.last_seconds:.1f}s (model load {ts.last_load_seconds:.1f}s)")
+    if cassette is not None and not cassette.replaying:
+        st.caption(f"⏺ Recording LLM calls to {cassette.path} ({cassette.recorded} recorded)")
+    queue = governor.status()
+    waiting = sum(queue["waiting"].values())
+    if queue["running"] or waiting or queue["coalesced"]:
+        st.caption(
+            f"LLM queue: {queue['running']}/{queue['max_in_flight']} running, "
+            f"{queue['waiting']['interactive']} interactive + {queue['waiting']['batch']} batch waiting, "
+            f"{queue['coalesced']} shared call(s)"
+        )
+
 # =========================================================
 #  HELPERS
 # =========================================================
@@ -92,6 +174,34 @@ def get_r67():
     return store.get_r67()
 
 
+def source_url(req_id: str) -> str:
+    return f"?src={quote(req_id)}"
+
+
+def source_link(req) -> str:
+    """Markdown "jump to source" link for a requirement ("" if its text is not found)."""
+    loc = locate_requirement(req, get_r67())
+    if loc is None:
+        return ""
+    return f"[§ {loc.paragraph or '?'} ↗]({source_url(req.id)})"
+
+
+def render_word_diff(old: str, new: str):
+    """HTML of both sides of a word diff (removed words struck out left, added words highlighted right)."""
+    left, right = [], []
+    for tag, o, n in word_diff(old, new):
+        o, n = html.escape(o), html.escape(n)
+        if tag == "equal":
+            left.append(o)
+            right.append(n)
+        else:
+            if o:
+                left.append(f"<del>{o}</del>")
+            if n:
+                right.append(f"<ins>{n}</ins>")
+    return "".join(left), "".join(right)
+
+
 # =========================================================
 #  PAGE 1 — REGULATION TEXT
 # =========================================================
@@ -114,12 +224,71 @@ if page.startswith("1️⃣"):
         st.markdown(f"*Date:* {reg.date.date()}")
         st.markdown(f"[Official link]({reg.url})")
 
+        # --- Normalisation (en-têtes, mots coupés, formulaires) ---
+        norm = normalize_regulation(reg)
+        ns = norm.stats
+        st.markdown("<div class='section-title'>Prompt size</div>", unsafe_allow_html=True)
+        st.metric(
+            "Estimated prompt tokens",
+            f"{ns.prompt_tokens:,}",
+            delta=f"-{ns.token_reduction:.0%} vs raw ({ns.original_tokens:,})",
+            delta_color="inverse",
+        )
+        st.caption(
+            f"{ns.header_lines_removed} header lines and {ns.page_numbers_removed} page numbers removed, "
+            f"{ns.words_rejoined} split words rejoined, {ns.boilerplate_sections} form sections omitted."
+        )
+
     with col_text:
+        # --- Source d'une exigence (lien "jump to source" des pages 2 et 3) ---
+        source_req = store.requirements.get(source_req_id) if source_req_id else None
+        if source_req is not None:
+            loc = locate_requirement(source_req, reg)
+            st.markdown(
+                f"<div class='section-title'>Source of {html.escape(source_req.id)}</div>",
+                unsafe_allow_html=True,
+            )
+            if loc is None:
+                st.warning("The raw text of this requirement could not be found in the regulation.")
+            else:
+                index = source_index(reg)
+                para = index.paragraph(loc.paragraph) if loc.paragraph else None
+                if para is not None:
+                    st.markdown(
+                        " › ".join(f"**{p.label}** {html.escape(p.title[:40])}" for p in index.breadcrumb(para))
+                    )
+                    start, end = para.start, para.end
+                else:
+                    start, end = max(0, loc.start - 500), loc.end + 500
+                text = index.norm.text
+                ms, me = max(start, loc.start), min(end, loc.end)
+                st.markdown(
+                    "<div class='diff-box'>"
+                    + html.escape(text[start:ms])
+                    + "<mark>" + html.escape(text[ms:me]) + "</mark>"
+                    + html.escape(text[me:end])
+                    + "</div>",
+                    unsafe_allow_html=True,
+                )
+                st.caption(
+                    f"Characters {loc.original_start:,}–{loc.original_end:,} of the regulation text · "
+                    f"match {loc.score:.0%}"
+                )
+            if st.button("✖ Close source view"):
+                del st.query_params["src"]
+                st.rerun()
+
         st.markdown(
             "<div class='section-title'>Full regulatory text used in the tool</div>",
             unsafe_allow_html=True,
         )
-        st.info(reg.text)
+        view_mode = st.radio(
+            "Text", ["Normalized (sent to the LLM)", "Raw PDF extraction"], horizontal=True
+        )
+        if view_mode.startswith("Normalized"):
+            st.info(norm.prompt.text)
+        else:
+            st.info(reg.text)
 
 
 # =========================================================
@@ -162,18 +331,24 @@ elif page.startswith("2️⃣"):
     st.markdown("<div class='section-title'>📄 Extracted requirements (UNECE R67)</div>", unsafe_allow_html=True)
 
     if reqs_for_r67:
-        df = pd.DataFrame(
-            [
+        rows = []
+        for r in reqs_for_r67:
+            loc = locate_requirement(r, reg)
+            rows.append(
                 {
                     "ID": r.id,
+                    "Paragraph": loc.paragraph if loc else "",
+                    "Source": source_url(r.id) if loc else None,
                     "Raw text": r.text_raw,
                     "Engineering formulation": r.text_engineering,
                     "Created at": r.created_at,
                 }
-                for r in reqs_for_r67
-            ]
+            )
+        st.dataframe(
+            pd.DataFrame(rows),
+            use_container_width=True,
+            column_config={"Source": st.column_config.LinkColumn("Source", display_text="jump to source ↗")},
         )
-        st.dataframe(df, use_container_width=True)
     else:
         st.info("No requirements have been extracted yet. Click the button above to run the AI extraction.")
 
@@ -202,15 +377,48 @@ elif page.startswith("3️⃣"):
         # --- Requirement details ---
         st.markdown("<div class='section-title'>Selected requirement</div>", unsafe_allow_html=True)
         st.write(f"*ID:* {req.id}")
+        link = source_link(req)
+        if link:
+            st.markdown(f"*Source:* {link}")
         st.write(f"*Raw text:* {req.text_raw}")
         st.write(f"*Engineering formulation:* {req.text_engineering}")
 
+        # --- Inference mode (rules first, LLM only when unsure) ---
+        with st.expander("⚙ Inference mode", expanded=False):
+            tiered = st.checkbox(
+                "Tiered: keyword rules first, escalate to the LLM only below the confidence threshold",
+                value=DEFAULT_INFERENCE.tiered,
+            )
+            threshold = st.slider("Confidence threshold", 0.0, 1.0, DEFAULT_INFERENCE.threshold, 0.05)
+            models = st.text_input(
+                "Escalation models (in order, comma-separated)",
+                value=", ".join(DEFAULT_INFERENCE.escalation_models),
+            )
+            inference = InferenceConfig(
+                tiered=tiered,
+                threshold=threshold,
+                escalation_models=tuple(m.strip() for m in models.split(",") if m.strip()),
+            )
+
+            report = tier_stats.report()
+            if report:
+                st.caption("Per-tier hit rates (this process)")
+                st.dataframe(pd.DataFrame(report), use_container_width=True)
+
         # --- Compute / refresh impact ---
-        if st.button("🔍 Compute / refresh impact for this requirement"):
-            st.info("[IMPACT] Calling Mistral/Ollama to infer impacted components & tests…")
-            impact = infer_impact_for_requirement(req)
-            store.save_impact(impact)
-            st.success("Impact updated ✔")
+        col_refresh, col_force = st.columns([3, 1])
+        with col_refresh:
+            refresh_clicked = st.button("🔍 Compute / refresh impact for this requirement")
+        with col_force:
+            force_refresh = st.checkbox("Force LLM call", value=False)
+
+        if refresh_clicked:
+            with st.spinner("[IMPACT] Calling Mistral/Ollama to infer impacted components & tests…"):
+                impact, recomputed = refresh_impact(req, store, force=force_refresh, config=inference)
+            if recomputed:
+                st.success("Impact updated ✔")
+            else:
+                st.info("Impact already up to date (same requirement text, prompt, keyword tables and inference mode) ✔")
 
         impact = store.get_impact(req.id)
 
@@ -247,6 +455,8 @@ elif page.startswith("3️⃣"):
                     st.write("—")
 
             st.markdown("*Criticality:* " + impact.criticality)
+            if impact.tier:
+                st.caption(f"Inferred by: {impact.tier}")
             if impact.validation_actions:
                 st.markdown("*Suggested V&V actions:*")
                 for a in impact.validation_actions:
@@ -254,6 +464,25 @@ elif page.startswith("3️⃣"):
         else:
             st.info("No impact has been computed yet for this requirement.")
 
+        # --- Stale impacts (prompt / keyword tables / text changed) ---
+        stale = list_stale_impacts(store, inference)
+        if stale:
+            with st.expander(f"⚠ {len(stale)} stale impact(s) to recompute", expanded=False):
+                st.dataframe(
+                    pd.DataFrame(
+                        [{"Requirement": rid, "Changed": ", ".join(reasons)} for rid, reasons in stale]
+                    ),
+                    use_container_width=True,
+                )
+                if st.button("♻ Recompute stale impacts only"):
+                    bar = st.progress(0.0)
+                    done = recompute_stale_impacts(
+                        store,
+                        progress=lambda i, n, rid: bar.progress(i / n, text=rid),
+                        config=inference,
+                    )
+                    st.success(f"{len(done)} impact(s) recomputed ✔")
+
         # --- Global synthesis table ---
         st.markdown("---")
         st.markdown("<div class='section-title'>Global synthesis of known impacts</div>", unsafe_allow_html=True)
@@ -288,10 +517,44 @@ elif page.startswith("4️⃣"):
         unsafe_allow_html=True,
     )
 
-    history = store.list_history()
+    # --- Filters (queried from the persistent event log, page by page) ---
+    col_req, col_type, col_size = st.columns([2, 1, 1])
+    with col_req:
+        hist_req = st.text_input("Requirement ID (optional)", value="").strip()
+    with col_type:
+        hist_type = st.selectbox("Change type", ["", "created", "revised", "updated", "impact", "imported"])
+    with col_size:
+        page_size = st.selectbox("Rows per page", [50, 100, 500], index=1)
+
+    counts = store.history_change_counts()
+    total_events = sum(counts.values())
+
+    # Sans filtre par exigence, le total vient des compteurs : une seule requête
+    history = None
+    if hist_req:
+        history, total = store.query_history(
+            requirement_id=hist_req, change_type=hist_type or None, limit=page_size,
+        )
+    else:
+        total = counts.get(hist_type, 0) if hist_type else total_events
+    page_no = 1
+    if total > page_size:
+        page_no = st.number_input(
+            f"Page (1 – {(total - 1) // page_size + 1}, newest first)",
+            min_value=1, max_value=(total - 1) // page_size + 1, value=1, step=1,
+        )
+    if history is None or page_no > 1:
+        history, total = store.query_history(
+            requirement_id=hist_req or None,
+            change_type=hist_type or None,
+            limit=page_size,
+            offset=(page_no - 1) * page_size,
+        )
+
     if not history:
         st.info("No history entries yet.")
     else:
+        st.caption(f"{total} matching events · {total_events} events in the traceability log")
         df_hist = pd.DataFrame(
             [
                 {
@@ -304,7 +567,43 @@ elif page.startswith("4️⃣"):
                 for h in history
             ]
         )
-        st.dataframe(df_hist.sort_values("Timestamp"), use_container_width=True)
+        st.dataframe(df_hist, use_container_width=True)
+
+    if counts:
+        st.markdown("#### Change distribution")
+        st.bar_chart(pd.DataFrame({"Events": counts}))
+
+    # --- Versions d'une exigence : diff côte à côte ---
+    st.markdown("<div class='section-title'>Requirement versions</div>", unsafe_allow_html=True)
+    revised_ids = store.revised_requirement_ids()
+    if not revised_ids:
+        st.info("No requirement has been reworded yet (re-extracting a requirement with a new wording creates a new version).")
+    else:
+        default_idx = revised_ids.index(hist_req) if hist_req in revised_ids else 0
+        ver_req = st.selectbox("Requirement", revised_ids, index=default_idx)
+        versions = store.requirement_versions(ver_req)
+        col_old, col_new = st.columns(2)
+        with col_old:
+            v_old = st.selectbox("Version (left)", versions, index=len(versions) - 2)
+        with col_new:
+            v_new = st.selectbox("Version (right)", versions, index=len(versions) - 1)
+
+        old_req = store.requirement_at(ver_req, v_old)
+        new_req = store.requirement_at(ver_req, v_new)
+        for label, attr in (("Raw text", "text_raw"), ("Engineering formulation", "text_engineering")):
+            st.markdown(f"**{label}**")
+            left, right = render_word_diff(getattr(old_req, attr), getattr(new_req, attr))
+            col_old, col_new = st.columns(2)
+            with col_old:
+                st.markdown(f"<div class='diff-box'>{left}</div>", unsafe_allow_html=True)
+            with col_new:
+                st.markdown(f"<div class='diff-box'>{right}</div>", unsafe_allow_html=True)
+
+        rev_stats = store.view().revisions.stats()
+        st.caption(
+            f"{rev_stats['revisions']} older versions stored as deltas: "
+            f"{rev_stats['delta_chars']:,} chars instead of {rev_stats['full_copy_chars']:,} for full copies."
+        )
 
     st.markdown("---")
     st.caption(
@@ -426,4 +725,234 @@ elif page.startswith("5️⃣"):
                 "Compliance rate (%)": [eu_rate, in_rate, jp_rate],
             }
         ).set_index("Market")
-        st.bar_chart(kpi_df)
\ No newline at end of file
+        st.bar_chart(kpi_df)
+
+
+# =========================================================
+#  PAGE 6 — COMPONENT-CENTRIC VIEW (GRAPH INDEX)
+# =========================================================
+elif page.startswith("6️⃣"):
+    st.markdown(
+        "<div class='main-title'>6️⃣ Component view — reverse traceability & change impact</div>",
+        unsafe_allow_html=True,
+    )
+
+    st.write(
+        "Start from a component, test or document and navigate back to the R67 requirements "
+        "it is linked to, and to everything a change on it would propagate to."
+    )
+
+    # Vue figée pour tout le rendu de la page (lectures sans verrou)
+    view = store.view()
+    graph = view.graph
+    kind_labels = {"Component": "component", "Test": "test", "Document": "document"}
+    kind_label = st.radio("Start from", list(kind_labels.keys()), horizontal=True)
+    kind = kind_labels[kind_label]
+
+    items = graph.artifacts(kind)
+    if not items:
+        st.warning("No impacts computed yet. Please compute impacts on page 3 first.")
+    else:
+        item_id = st.selectbox(
+            f"Select a {kind}",
+            items,
+            format_func=lambda i: f"{i}  ({graph.degree(kind, i)} requirements)",
+        )
+
+        # --- Directly linked requirements ---
+        st.markdown("<div class='section-title'>Linked requirements</div>", unsafe_allow_html=True)
+        rows = []
+        for req_id in sorted(graph.requirements_for(kind, item_id)):
+            r = view.requirements.get(req_id)
+            imp = view.impacts.get(req_id)
+            rows.append(
+                {
+                    "Requirement": req_id,
+                    "Criticality": imp.criticality if imp else "",
+                    "Engineering formulation": r.text_engineering if r else "",
+                }
+            )
+        st.dataframe(pd.DataFrame(rows), use_container_width=True)
+
+        col_c, col_t, col_d = st.columns(3)
+        for col, target, caption in (
+            (col_c, "component", "Components sharing these requirements"),
+            (col_t, "test", "Tests to re-run"),
+            (col_d, "document", "Documents to update"),
+        ):
+            with col:
+                st.caption(caption)
+                related = graph.related(kind, item_id, target)
+                if related:
+                    for other, n in sorted(related.items(), key=lambda kv: (-kv[1], kv[0])):
+                        st.write(f"- {other} ({n})")
+                else:
+                    st.write("—")
+
+        # --- Transitive propagation ---
+        st.markdown("<div class='section-title'>Transitive change impact</div>", unsafe_allow_html=True)
+        depth = st.slider("Propagation depth (hops through shared requirements)", 1, 4, 2)
+        impact_by_kind = graph.change_impact(kind, item_id, max_depth=depth)
+
+        k1, k2, k3, k4 = st.columns(4)
+        k1.metric("Requirements", len(impact_by_kind["requirement"]))
+        k2.metric("Components", len(impact_by_kind["component"]))
+        k3.metric("Tests", len(impact_by_kind["test"]))
+        k4.metric("Documents", len(impact_by_kind["document"]))
+
+        prop_rows = [
+            {"Kind": k, "ID": node_id, "Depth": d}
+            for k, nodes in impact_by_kind.items()
+            for node_id, d in nodes.items()
+        ]
+        if prop_rows:
+            st.dataframe(
+                pd.DataFrame(prop_rows).sort_values(["Depth", "Kind", "ID"]),
+                use_container_width=True,
+            )
+
+
+# =========================================================
+#  PAGE 7 — TEST CAMPAIGN PLANNER
+# =========================================================
+elif page.startswith("7️⃣"):
+    st.markdown(
+        "<div class='main-title'>7️⃣ Test campaign planner — minimal set of tests</div>",
+        unsafe_allow_html=True,
+    )
+
+    st.write(
+        "Builds the requirement × test coverage matrix from all computed impacts and selects a "
+        "near-minimal campaign (greedy weighted set cover): each test is planned once and closes "
+        "as many requirements as possible for its cost."
+    )
+
+    matrix = build_coverage_matrix(store.impacts.values())
+    if not matrix.tests:
+        st.warning("No tests in the computed impacts yet. Please compute impacts on page 3 first.")
+    else:
+        # --- Optional per-test costs ---
+        st.markdown("<div class='section-title'>Test costs (optional)</div>", unsafe_allow_html=True)
+        cost_df = st.data_editor(
+            pd.DataFrame(
+                [
+                    {"Test": t, "Requirements": bits.bit_count(), "Cost": 1.0}
+                    for t, bits in sorted(matrix.tests.items())
+                ]
+            ),
+            disabled=["Test", "Requirements"],
+            use_container_width=True,
+            key="test_costs",
+        )
+        costs = {row["Test"]: float(row["Cost"]) for _, row in cost_df.iterrows()}
+
+        campaign = plan_test_campaign(matrix, costs)
+
+        k1, k2, k3, k4 = st.columns(4)
+        k1.metric("Tests in campaign", len(campaign.steps))
+        k2.metric("Total cost", f"{campaign.total_cost:g}")
+        k3.metric("Requirements covered", f"{campaign.covered} / {campaign.coverable}")
+        k4.metric("Runs if planned per requirement", campaign.naive_runs)
+
+        st.markdown("<div class='section-title'>Campaign (execution order)</div>", unsafe_allow_html=True)
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {
+                        "Step": i,
+                        "Test": step.test,
+                        "Cost": step.cost,
+                        "Closes": len(step.newly_covered),
+                        "Cumulative coverage": step.total_covered,
+                        "Requirements closed": ", ".join(step.newly_covered),
+                    }
+                    for i, step in enumerate(campaign.steps, start=1)
+                ]
+            ),
+            use_container_width=True,
+        )
+
+        st.markdown("#### Coverage progression")
+        st.line_chart(
+            pd.DataFrame(
+                {"Covered requirements": [step.total_covered for step in campaign.steps]},
+                index=[step.test for step in campaign.steps],
+            )
+        )
+
+        if campaign.untested:
+            st.warning(
+                f"{len(campaign.untested)} requirement(s) have no associated test: "
+                + ", ".join(campaign.untested)
+            )
+
+
+# =========================================================
+#  PAGE 8 — SNAPSHOTS (PARQUET EXPORT / IMPORT)
+# =========================================================
+elif page.startswith("8️⃣"):
+    st.markdown(
+        "<div class='main-title'>8️⃣ Snapshots — share a processed dataset</div>",
+        unsafe_allow_html=True,
+    )
+
+    st.write(
+        "Export the regulations, requirements, impacts and history to a Parquet snapshot that "
+        "another engineer can open without re-running the LLM pipeline."
+    )
+
+    # --- Export ---
+    st.markdown("<div class='section-title'>Export current store</div>", unsafe_allow_html=True)
+    export_dir = st.text_input("Snapshot directory", value="snapshots/r67")
+    if st.button("💾 Export snapshot"):
+        with st.spinner("Writing Parquet files…"):
+            manifest = export_snapshot(store, export_dir)
+        st.success(f"Snapshot written to {export_dir} ✔")
+        st.json(manifest["rows"])
+
+    # --- Open (lazy) ---
+    st.markdown("<div class='section-title'>Open a snapshot</div>", unsafe_allow_html=True)
+    open_dir = st.text_input("Snapshot to open", value=export_dir)
+    if st.button("📂 Open snapshot"):
+        st.session_state["snapshot_dir"] = open_dir
+
+    snap_dir = st.session_state.get("snapshot_dir")
+    if snap_dir:
+        try:
+            snap = open_snapshot(snap_dir)
+        except (OSError, ValueError, RuntimeError) as e:
+            st.error(f"Cannot open snapshot: {e}")
+        else:
+            st.caption(f"{snap_dir} — created {snap.manifest['created_at']}")
+            k1, k2, k3 = st.columns(3)
+            k1.metric("Requirements", snap.num_rows("requirements"))
+            k2.metric("Impacts", snap.num_rows("impacts"))
+            k3.metric("History events", snap.num_rows("history"))
+
+            # KPIs computed on Arrow columns, no dataclass materialized
+            summary = snap.compliance_summary()
+            st.markdown("#### Compliance rate per market (from snapshot)")
+            st.bar_chart(
+                pd.DataFrame(
+                    {
+                        "Market": ["EU", "India", "Japan"],
+                        "Compliance rate (%)": [summary[m]["rate"] for m in ("eu", "india", "japan")],
+                    }
+                ).set_index("Market")
+            )
+
+            if snap.num_rows("impacts"):
+                st.markdown("#### Criticality distribution")
+                st.bar_chart(pd.DataFrame({"Impacts": snap.value_counts("impacts", "criticality")}))
+
+            st.markdown("#### Requirements preview")
+            st.dataframe(
+                snap.frame("requirements", ["id", "text_engineering", "compliance_eu"], limit=200),
+                use_container_width=True,
+            )
+
+            st.warning("Loading replaces the requirements and impacts of the working store.")
+            if st.button("⬇ Load snapshot into the working store"):
+                with st.spinner("Materializing requirements and impacts…"):
+                    snap.load_into_store(store)
+                st.success(f"{len(store.requirements)} requirements and {len(store.impacts)} impacts loaded ✔")
@@ -0,0 +1,205 @@
+# campaign_planner.py
+"""
+Test-campaign planner built from the requirement × test coverage matrix.
+
+Each test is a bitset (Python int) over the requirements that list it in
+their RequirementImpact. A greedy weighted set cover then picks the test
+with the best "newly covered requirements / cost" ratio until every
+requirement with at least one test is covered, so the same pressure / leak
+/ fire tests are planned once instead of once per requirement.
+
+Greedy set cover is within ln(n) of the optimum; the lazy evaluation
+(gains only ever decrease) keeps it fast on 100k requirements × thousands
+of tests.
+"""
+import argparse
+import heapq
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from models import RequirementImpact
+
+
+@dataclass
+class CoverageMatrix:
+    requirement_ids: List[str]               # bit i <-> requirement_ids[i]
+    tests: Dict[str, int]                    # test id -> bitset of requirements
+    untested: List[str] = field(default_factory=list)   # requirements with no test at all
+
+    @property
+    def all_bits(self) -> int:
+        return (1 << len(self.requirement_ids)) - 1
+
+    def requirements_in(self, bits: int) -> List[str]:
+        ids = self.requirement_ids
+        out = []
+        while bits:
+            low = bits & -bits
+            out.append(ids[low.bit_length() - 1])
+            bits ^= low
+        return out
+
+
+@dataclass
+class CampaignStep:
+    test: str
+    cost: float
+    newly_covered: List[str]       # requirements this test closes
+    total_covered: int             # cumulative coverage after this step
+
+
+@dataclass
+class TestCampaign:
+    steps: List[CampaignStep]
+    total_cost: float
+    covered: int
+    coverable: int
+    untested: List[str]
+    naive_runs: int                # one run per (requirement, test) pair, as before
+
+    @property
+    def tests(self) -> List[str]:
+        return [s.test for s in self.steps]
+
+
+# =====================
+#  Matrice de couverture
+# =====================
+
+def build_coverage_matrix(impacts: Iterable[RequirementImpact]) -> CoverageMatrix:
+    """Bitset requirement × test matrix from stored impacts."""
+    requirement_ids: List[str] = []
+    untested: List[str] = []
+    rows: Dict[str, List[int]] = {}
+
+    for impact in impacts:
+        tests = set(impact.tests or [])
+        if not tests:
+            untested.append(impact.requirement_id)
+            continue
+        idx = len(requirement_ids)
+        requirement_ids.append(impact.requirement_id)
+        for t in tests:
+            rows.setdefault(t, []).append(idx)
+
+    # Construction via bytearray : OR-er des bits un à un dans un int
+    # recopierait tout le bitset à chaque bit.
+    nbytes = (len(requirement_ids) + 7) // 8
+    tests_bits: Dict[str, int] = {}
+    for t, indices in rows.items():
+        buf = bytearray(nbytes)
+        for i in indices:
+            buf[i >> 3] |= 1 << (i & 7)
+        tests_bits[t] = int.from_bytes(buf, "little")
+
+    return CoverageMatrix(requirement_ids, tests_bits, untested)
+
+
+# =====================
+#  Set cover glouton
+# =====================
+
+def plan_test_campaign(
+    matrix: CoverageMatrix,
+    costs: Optional[Dict[str, float]] = None,
+    default_cost: float = 1.0,
+    naive_runs: Optional[int] = None,
+) -> TestCampaign:
+    """
+    Greedy weighted set cover (lazy evaluation). Tests missing from `costs`
+    cost `default_cost`; a cost <= 0 is treated as a very cheap test.
+    """
+    costs = costs or {}
+
+    def cost_of(test: str) -> float:
+        return max(costs.get(test, default_cost), 1e-9)
+
+    # Tas max sur gain / coût ; les gains ne font que baisser, donc une
+    # entrée dont le gain recalculé reste en tête est forcément la meilleure.
+    heap: List[Tuple[float, str, int]] = []
+    for test, bits in matrix.tests.items():
+        gain = bits.bit_count()
+        if gain:
+            heap.append((-gain / cost_of(test), test, gain))
+    heapq.heapify(heap)
+
+    covered = 0
+    target = matrix.all_bits
+    steps: List[CampaignStep] = []
+    total_cost = 0.0
+
+    while heap and covered != target:
+        neg_ratio, test, _ = heapq.heappop(heap)
+        new_bits = matrix.tests[test] & ~covered
+        gain = new_bits.bit_count()
+        if not gain:
+            continue
+        ratio = gain / cost_of(test)
+        if heap and -heap[0][0] > ratio:
+            heapq.heappush(heap, (-ratio, test, gain))
+            continue
+
+        covered |= new_bits
+        total_cost += cost_of(test)
+        steps.append(
+            CampaignStep(
+                test=test,
+                cost=cost_of(test),
+                newly_covered=matrix.requirements_in(new_bits),
+                total_covered=covered.bit_count(),
+            )
+        )
+
+    if naive_runs is None:
+        naive_runs = sum(bits.bit_count() for bits in matrix.tests.values())
+
+    return TestCampaign(
+        steps=steps,
+        total_cost=total_cost,
+        covered=covered.bit_count(),
+        coverable=len(matrix.requirement_ids),
+        untested=list(matrix.untested),
+        naive_runs=naive_runs,
+    )
+
+
+# ============================
+#  Benchmark
+# ============================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Greedy test-campaign planner benchmark")
+    parser.add_argument("--requirements", type=int, default=100_000)
+    parser.add_argument("--tests", type=int, default=3_000)
+    parser.add_argument("--tests-per-requirement", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    test_ids = [f"TEST_{i:05d}" for i in range(args.tests)]
+    # Quelques essais génériques (pression, fuite, feu…) très partagés
+    weights = [1.0 / (i + 1) ** 0.8 for i in range(args.tests)]
+    impacts = [
+        RequirementImpact(
+            requirement_id=f"R67-{i}",
+            components=[],
+            tests=list(set(rng.choices(test_ids, weights, k=args.tests_per_requirement))),
+            documents=[],
+            criticality="MEDIUM",
+            validation_actions=[],
+        )
+        for i in range(args.requirements)
+    ]
+    costs = {t: rng.choice([1.0, 2.0, 5.0]) for t in test_ids}
+
+    t0 = time.perf_counter()
+    matrix = build_coverage_matrix(impacts)
+    t1 = time.perf_counter()
+    campaign = plan_test_campaign(matrix, costs)
+    t2 = time.perf_counter()
+
+    print(f"matrix   : {len(matrix.requirement_ids)} requirements × {len(matrix.tests)} tests in {t1 - t0:.2f}s")
+    print(f"campaign : {len(campaign.steps)} tests, cost {campaign.total_cost:.0f}, "
+          f"{campaign.covered}/{campaign.coverable} covered in {t2 - t1:.2f}s")
+    print(f"naive    : {campaign.naive_runs} requirement-level test runs")
@@ -1,20 +1,285 @@
+import atexit
+import os
+import threading
+from bisect import bisect_left, insort
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, replace
 from datetime import datetime
-from typing import Dict, List, Optional
+from operator import attrgetter
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
 
+from event_log import EventLog
+from graph_index import ImpactGraphIndex
 from models import Regulation, Requirement, RequirementImpact, RequirementHistoryItem
+from persistent_map import MapDraft, PersistentMap
+from revision_store import RevisionStore, next_version, summarize_change
 
 R67_TEXT_PATH = "r67_full.txt"
 
+# Append-only traceability log ("" disables persistence)
+EVENT_LOG_DIR = os.environ.get("R67_EVENT_LOG_DIR", "traceability_log")
+
+
+def _requirement_from_dict(d: Dict[str, Any]) -> Requirement:
+    d = dict(d)
+    d["created_at"] = datetime.fromisoformat(d["created_at"])
+    return Requirement(**d)
+
+
+def _history_item_from_event(event: Dict[str, Any]) -> RequirementHistoryItem:
+    return RequirementHistoryItem(
+        timestamp=datetime.fromisoformat(event["ts"]),
+        requirement_id=event["requirement_id"],
+        version=event["version"],
+        change_type=event["change_type"],
+        diff_summary=event["summary"],
+    )
+
+
+# =====================
+#  Vues immuables (lecteurs)
+# =====================
+
+@dataclass(frozen=True)
+class StoreView:
+    """
+    Immutable snapshot of the store published after each write.
+
+    Readers (Streamlit sessions, HTTP API threads) grab the current view
+    without any lock and keep working on it while a writer prepares the
+    next one. Requirements, impacts, graph and revisions are persistent
+    structures (persistent_map.py): a write copies only what it touches
+    and shares the rest with the previous view, and a published view is
+    never modified. The Requirement / RequirementImpact objects are
+    replaced, never edited in place.
+
+    requirements_by_date is kept sorted by the writer (only the changed
+    requirements are moved), so readers never sort.
+    """
+    revision: int
+    requirements: Mapping[str, Requirement]
+    impacts: Mapping[str, RequirementImpact]
+    graph: ImpactGraphIndex
+    revisions: RevisionStore
+    requirements_by_date: List[Requirement]  # (created_at, id) ; ne pas modifier
+    # Historique en mémoire, seulement sans journal (sinon il est lu dans le journal)
+    _history: List[RequirementHistoryItem]   # append-only, shared between views
+    history_len: int
+
+    @property
+    def history(self) -> List[RequirementHistoryItem]:
+        return self._history[:self.history_len]
+
+
+_date_key = attrgetter("created_at", "id")
+_MISSING = object()
+
+# Au-delà, un tri complet coûte moins que des insertions une à une
+RESORT_MIN_CHANGES = 64
+
+
+class _TrackedDraft(MapDraft):
+    """MapDraft that remembers the base value of every key it changes."""
+
+    def __init__(self, base: PersistentMap) -> None:
+        super().__init__(base)
+        self._base = base
+        self.changed: Dict[Any, Any] = {}
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        if key not in self.changed:
+            self.changed[key] = self._base.get(key, _MISSING)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key: Any) -> None:
+        if key not in self.changed:
+            self.changed[key] = self._base.get(key, _MISSING)
+        super().__delitem__(key)
+
+
+def _by_date_after(by_date: List[Requirement], changed: Dict[str, Any],
+                   requirements: Mapping[str, Requirement]) -> List[Requirement]:
+    """New sorted list: the changed requirements are moved, the rest is copied as is."""
+    if len(changed) > RESORT_MIN_CHANGES + len(by_date) // 32:
+        return sorted(requirements.values(), key=_date_key)
+    by_date = list(by_date)
+    for req_id, old in changed.items():
+        if old is not _MISSING:
+            del by_date[bisect_left(by_date, _date_key(old), key=_date_key)]
+        new = requirements.get(req_id)
+        if new is not None:
+            insort(by_date, new, key=_date_key)
+    return by_date
+
+
+class _Draft:
+    """
+    Working copy of a view: each structure becomes an editable draft on
+    its first write in the transaction (copy-on-write, sharing the
+    unchanged parts with the base view).
+    """
+
+    def __init__(self, base: StoreView) -> None:
+        self.base = base
+        self._requirements: Optional[MapDraft] = None
+        self._impacts: Optional[MapDraft] = None
+        self._graph: Optional[ImpactGraphIndex] = None
+        self._revisions: Optional[RevisionStore] = None
+
+    @property
+    def requirements(self) -> MapDraft:
+        if self._requirements is None:
+            self._requirements = _TrackedDraft(self.base.requirements)
+        return self._requirements
+
+    @requirements.setter
+    def requirements(self, value: Mapping[str, Requirement]) -> None:
+        self._requirements = PersistentMap.from_items(value.items()).draft()
+
+    @property
+    def impacts(self) -> MapDraft:
+        if self._impacts is None:
+            self._impacts = self.base.impacts.draft()
+        return self._impacts
+
+    @impacts.setter
+    def impacts(self, value: Mapping[str, RequirementImpact]) -> None:
+        self._impacts = PersistentMap.from_items(value.items()).draft()
+
+    @property
+    def graph(self) -> ImpactGraphIndex:
+        if self._graph is None:
+            self._graph = self.base.graph.draft()
+        return self._graph
+
+    @graph.setter
+    def graph(self, value: ImpactGraphIndex) -> None:
+        self._graph = value
+
+    @property
+    def revisions(self) -> RevisionStore:
+        if self._revisions is None:
+            self._revisions = self.base.revisions.copy()
+        return self._revisions
+
+    @revisions.setter
+    def revisions(self, value: RevisionStore) -> None:
+        self._revisions = value
+
+    @property
+    def touched(self) -> bool:
+        return any(x is not None for x in (self._requirements, self._impacts, self._graph, self._revisions))
+
+    def publish(self, history: List[RequirementHistoryItem]) -> StoreView:
+        base = self.base
+        requirements, by_date = base.requirements, base.requirements_by_date
+        if self._requirements is not None:
+            requirements = self._requirements.freeze()
+            changed = getattr(self._requirements, "changed", None)
+            if changed is None:     # remplacement complet (setter)
+                by_date = sorted(requirements.values(), key=_date_key)
+            elif changed:
+                by_date = _by_date_after(by_date, changed, requirements)
+        return StoreView(
+            revision=base.revision + 1,
+            requirements=requirements,
+            requirements_by_date=by_date,
+            impacts=self._impacts.freeze() if self._impacts is not None else base.impacts,
+            graph=self._graph.freeze() if self._graph is not None else base.graph,
+            revisions=self._revisions if self._revisions is not None else base.revisions,
+            _history=history,
+            history_len=len(history),
+        )
+
 
 class InMemoryStore:
+    """
+    Single writer, many readers.
+
+    Every mutation runs under one write lock and publishes a new StoreView
+    when it ends; a batch (add_requirements of a whole extraction, a log
+    replay, a snapshot import) is published once, atomically. Readers never
+    take the lock: they read the last published view, so a long batch write
+    never blocks a page render or an API request.
+
+    Single-item writes cost O(log-ish N), not O(N) (persistent maps); use
+    the batch methods (add_requirements, save_impacts) to publish many
+    items in one transaction.
+    """
+
     def __init__(self) -> None:
         self.regulations: Dict[str, Regulation] = {}
-        self.requirements: Dict[str, Requirement] = {}
-        self.impacts: Dict[str, RequirementImpact] = {}
-        self.history: List[RequirementHistoryItem] = []
+        self._history: List[RequirementHistoryItem] = []
+
+        self._write_lock = threading.RLock()
+        self._draft: Optional[_Draft] = None
+        self._view = StoreView(
+            revision=0,
+            requirements=PersistentMap(),
+            impacts=PersistentMap(),
+            graph=ImpactGraphIndex(),
+            revisions=RevisionStore(),
+            requirements_by_date=[],
+            _history=self._history,
+            history_len=0,
+        )
+
+        # Persistent traceability log, see attach_event_log()
+        self.event_log: Optional[EventLog] = None
 
         self._load_r67_from_file()
 
+    # --- Views ---
+    def view(self) -> StoreView:
+        """Current snapshot; use one view per page / request for consistent reads."""
+        return self._view
+
+    # Raccourcis de lecture sur la vue courante (dicts en lecture seule)
+    @property
+    def revision(self) -> int:
+        # Incremented on every published write; lets readers (HTTP API,
+        # caches) detect that the store content changed without re-reading it.
+        return self._view.revision
+
+    @property
+    def requirements(self) -> Mapping[str, Requirement]:
+        return self._view.requirements
+
+    @property
+    def impacts(self) -> Mapping[str, RequirementImpact]:
+        return self._view.impacts
+
+    @property
+    def history(self) -> List[RequirementHistoryItem]:
+        return self._view.history
+
+    @property
+    def graph(self) -> ImpactGraphIndex:
+        # Requirement <-> component / test / document index, kept in sync with impacts
+        return self._view.graph
+
+    @contextmanager
+    def _write(self) -> Iterator[_Draft]:
+        """Write transaction; nested calls join the outer one, published once at the end."""
+        with self._write_lock:
+            if self._draft is not None:
+                yield self._draft
+                return
+            if self.event_log is not None and self.event_log.read_only:
+                raise RuntimeError("Store is read-only (event log opened read-only)")
+            self._draft = _Draft(self._view)
+            try:
+                yield self._draft
+            finally:
+                # Publié même sur exception : les événements déjà écrits dans
+                # le journal doivent être visibles.
+                self._view = self._draft.publish(self._history)
+                self._draft = None
+
+    def _current(self):
+        """Draft inside a write transaction, last published view otherwise."""
+        return self._draft if self._draft is not None else self._view
+
     def _load_r67_from_file(self) -> None:
         try:
             with open(R67_TEXT_PATH, "r", encoding="utf-8") as f:
@@ -41,54 +306,394 @@ class InMemoryStore:
 
     # --- Requirements ---
     def add_requirements(self, reqs: List[Requirement]) -> None:
-        for r in reqs:
-            self.requirements[r.id] = r
-            self.history.append(
-                RequirementHistoryItem(
-                    timestamp=datetime.utcnow(),
-                    requirement_id=r.id,
-                    version=r.version,
-                    change_type="created",
-                    diff_summary="Automatically created",
-                )
-            )
+        """
+        Upsert. A new ID is created; an existing ID whose wording changed
+        becomes a new version (the previous wording is kept as a delta, see
+        revision_store.py); an unchanged one is left as is.
+        """
+        with self._write() as draft:
+            for r in reqs:
+                previous = draft.requirements.get(r.id)
+                if previous is None:
+                    draft.requirements[r.id] = r
+                    self._record(
+                        RequirementHistoryItem(
+                            timestamp=datetime.utcnow(),
+                            requirement_id=r.id,
+                            version=r.version,
+                            change_type="created",
+                            diff_summary="Automatically created",
+                        ),
+                        "requirement_created",
+                        asdict(r),
+                    )
+                    continue
+
+                if previous.text_raw == r.text_raw and previous.text_engineering == r.text_engineering:
+                    continue
+                self._revise(draft, previous, r)
+
+    def _revise(self, draft: "_Draft", previous: Requirement, r: Requirement) -> Requirement:
+        # Même exigence, nouvelle formulation : date de création et
+        # conformité saisies restent celles de l'exigence existante.
+        updated = replace(
+            r,
+            version=next_version(previous.version),
+            created_at=previous.created_at,
+            compliance_eu=r.compliance_eu if r.compliance_eu is not None else previous.compliance_eu,
+            compliance_india=r.compliance_india if r.compliance_india is not None else previous.compliance_india,
+            compliance_japan=r.compliance_japan if r.compliance_japan is not None else previous.compliance_japan,
+        )
+        timestamp = datetime.utcnow()
+        summary = summarize_change(previous, updated)
+        draft.revisions.record(previous, updated, timestamp, summary)
+        draft.requirements[r.id] = updated
+        self._record(
+            RequirementHistoryItem(
+                timestamp=timestamp,
+                requirement_id=r.id,
+                version=updated.version,
+                change_type="revised",
+                diff_summary=summary,
+            ),
+            "requirement_updated",
+            asdict(updated),
+        )
+        return updated
 
     def list_requirements(self) -> List[Requirement]:
-        return sorted(self.requirements.values(), key=lambda r: r.created_at)
+        return list(self._view.requirements_by_date)
 
     def get_requirements_for_regulation(self, reg_id: str) -> List[Requirement]:
-        return [r for r in self.requirements.values() if r.regulation_id == reg_id]
+        return [r for r in self._view.requirements_by_date if r.regulation_id == reg_id]
+
+    # --- Versions ---
+    def requirement_versions(self, req_id: str) -> List[str]:
+        """Versions of a requirement, oldest first ([] if unknown)."""
+        view = self._view
+        current = view.requirements.get(req_id)
+        return view.revisions.versions(current) if current else []
+
+    def requirement_at(self, req_id: str, version: str) -> Optional[Requirement]:
+        """The requirement as it was worded in `version` (rebuilt from deltas)."""
+        view = self._view
+        current = view.requirements.get(req_id)
+        if current is None:
+            return None
+        texts = view.revisions.texts_at(current, version)
+        if texts is None:
+            return None
+        return replace(current, version=version, text_raw=texts[0], text_engineering=texts[1])
+
+    def revised_requirement_ids(self) -> List[str]:
+        view = self._view
+        return sorted(
+            r.id for r in view.requirements.values() if len(view.revisions.versions(r)) > 1
+        )
 
     # --- Impact ---
     def save_impact(self, impact: RequirementImpact) -> None:
-        self.impacts[impact.requirement_id] = impact
+        self.save_impacts([impact])
+
+    def save_impacts(self, impacts: List[RequirementImpact]) -> None:
+        """Saves a batch of impacts in one transaction (published once)."""
+        with self._write() as draft:
+            for impact in impacts:
+                draft.impacts[impact.requirement_id] = impact
+                draft.graph.update(impact)
+                req = draft.requirements.get(impact.requirement_id)
+                self._record(
+                    RequirementHistoryItem(
+                        timestamp=datetime.utcnow(),
+                        requirement_id=impact.requirement_id,
+                        version=req.version if req else "",
+                        change_type="impact",
+                        diff_summary=(
+                            f"Impact computed: {impact.criticality}, "
+                            f"{len(impact.components)} components, {len(impact.tests)} tests"
+                        ),
+                    ),
+                    "impact_saved",
+                    asdict(impact),
+                )
 
     def get_impact(self, req_id: str) -> Optional[RequirementImpact]:
-        return self.impacts.get(req_id)
+        return self._view.impacts.get(req_id)
 
     # --- Compliance update ---
     def update_compliance(self, req_id: str, eu, india, japan):
-        req = self.requirements.get(req_id)
-        if not req:
-            return
+        with self._write() as draft:
+            req = draft.requirements.get(req_id)
+            if not req:
+                return
 
-        req.compliance_eu = eu
-        req.compliance_india = india
-        req.compliance_japan = japan
+            # Nouvel objet plutôt que mutation : les vues publiées le partagent
+            draft.requirements[req_id] = replace(
+                req, compliance_eu=eu, compliance_india=india, compliance_japan=japan
+            )
 
-        self.history.append(
-            RequirementHistoryItem(
-                timestamp=datetime.utcnow(),
-                requirement_id=req_id,
-                version=req.version,
-                change_type="updated",
-                diff_summary=f"Compliance updated: EU={eu}, IN={india}, JP={japan}",
+            self._record(
+                RequirementHistoryItem(
+                    timestamp=datetime.utcnow(),
+                    requirement_id=req_id,
+                    version=req.version,
+                    change_type="updated",
+                    diff_summary=f"Compliance updated: EU={eu}, IN={india}, JP={japan}",
+                ),
+                "compliance_updated",
+                {"eu": eu, "india": india, "japan": japan},
             )
-        )
 
     # --- History ---
+    def _record(self, item: RequirementHistoryItem, event_type: str, data: Dict[str, Any]) -> None:
+        """Called by writers only (write lock held)."""
+        if self.event_log is None:
+            # Sans journal, seule trace de l'historique ; avec, il y est lu (query_history)
+            self._history.append(item)
+            return
+        self.event_log.append(
+            event_type,
+            item.requirement_id,
+            data,
+            change_type=item.change_type,
+            version=item.version,
+            summary=item.diff_summary,
+            timestamp=item.timestamp,
+        )
+        if self.event_log.snapshot_due:
+            self.snapshot()
+
     def list_history(self) -> List[RequirementHistoryItem]:
-        return sorted(self.history, key=lambda h: h.timestamp)
+        """In-memory history, kept only when no event log is attached (use query_history)."""
+        return sorted(self._view.history, key=lambda h: h.timestamp)
+
+    def query_history(
+        self,
+        requirement_id: Optional[str] = None,
+        change_type: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 100,
+        offset: int = 0,
+        newest_first: bool = True,
+    ) -> Tuple[List[RequirementHistoryItem], int]:
+        """
+        One page of history + total count. Streams the event log when one is
+        attached, so the whole trail is never loaded in memory.
+        """
+        if self.event_log is not None:
+            self.refresh_from_log()
+            events, total = self.event_log.query(
+                requirement_id, change_type, since, until, limit, offset, newest_first
+            )
+            return [_history_item_from_event(e) for e in events], total
+
+        items = [
+            h for h in self.list_history()
+            if (not requirement_id or h.requirement_id == requirement_id)
+            and (not change_type or h.change_type == change_type)
+            and (not since or h.timestamp >= since)
+            and (not until or h.timestamp <= until)
+        ]
+        if newest_first:
+            items.reverse()
+        return items[offset:offset + limit], len(items)
+
+    def history_change_counts(self) -> Dict[str, int]:
+        if self.event_log is not None:
+            self.refresh_from_log()
+            return self.event_log.count_by_change_type()
+        counts: Dict[str, int] = {}
+        for h in self.history:
+            counts[h.change_type] = counts.get(h.change_type, 0) + 1
+        return counts
+
+
+    # --- Event log (persistence) ---
+    def attach_event_log(self, log: EventLog) -> int:
+        """Rebuilds requirements / impacts from snapshot + log tail, then logs every change."""
+        with self._write():
+            # Attaché avant le rejeu : _replay_import lit les imports copiés dans le journal
+            self.event_log = log
+            try:
+                replayed = log.recover(self._load_state, self._apply_event)
+            except BaseException:
+                self.event_log = None
+                raise
+        return replayed
+
+    def refresh_from_log(self) -> int:
+        """
+        Read-only log (standalone API server): applies the events the writer
+        process appended since the last call and publishes a new view.
+        No-op (and no new revision) when nothing was appended.
+        """
+        log = self.event_log
+        if log is None or not log.read_only or not log.has_new_events():
+            return 0
+        with self._write_lock:
+            self._draft = _Draft(self._view)
+            try:
+                return log.catch_up(self._apply_event)
+            finally:
+                # Publié même sur exception : les événements appliqués sont consommés
+                if self._draft.touched:
+                    self._view = self._draft.publish(self._history)
+                self._draft = None
+
+    def snapshot(self) -> None:
+        if self.event_log is None or self.event_log.read_only:
+            return
+        # Sous le verrou d'écriture : l'état et last_seq doivent correspondre
+        with self._write_lock:
+            current = self._current()
+            seq, counts = self.event_log.position()
+            state = {
+                "requirements": [asdict(r) for r in current.requirements.values()],
+                "impacts": [asdict(i) for i in current.impacts.values()],
+                "revisions": current.revisions.to_state(),
+            }
+        self.event_log.write_snapshot(seq, state, counts)
+
+    def import_state(self, requirements: List[Requirement], impacts: List[RequirementImpact],
+                     source: str = "", regulations: Optional[List[Regulation]] = None,
+                     checksum: str = "",
+                     history: Optional[Iterable[RequirementHistoryItem]] = None) -> None:
+        """
+        Replaces requirements / impacts in bulk (e.g. a shared Parquet snapshot)
+        and adds its regulations. Logged as a single "imported" event followed
+        by a log snapshot, rather than one event per requirement. Readers see
+        the old state until the new one is complete. Revision deltas are
+        dropped: they are relative to wordings the import replaces.
+
+        `source` + `checksum` make the event replayable: if the process stops
+        before the log snapshot is written, recovery re-reads the source
+        (a relative source is resolved against the log directory).
+        `history` is added to the in-memory history; it is not logged, so it
+        must be None when an event log is attached.
+        """
+        if history is not None and self.event_log is not None:
+            raise ValueError("Imported history is not written to the event log")
+        with self._write() as draft:
+            self._replace_state(draft, requirements, impacts, regulations)
+            if history is not None:
+                self._history.extend(history)
+            self._record(
+                RequirementHistoryItem(
+                    timestamp=datetime.utcnow(),
+                    requirement_id="*",
+                    version="",
+                    change_type="imported",
+                    diff_summary=(
+                        f"Snapshot imported from {source or 'unknown source'}: "
+                        f"{len(draft.requirements)} requirements, {len(draft.impacts)} impacts"
+                    ),
+                ),
+                "snapshot_imported",
+                {
+                    "source": source,
+                    "checksum": checksum,
+                    "requirements": len(draft.requirements),
+                    "impacts": len(draft.impacts),
+                },
+            )
+            self.snapshot()
+
+    def _replace_state(self, draft: _Draft, requirements: List[Requirement],
+                       impacts: List[RequirementImpact], regulations: Optional[List[Regulation]]) -> None:
+        """Write lock held."""
+        draft.requirements = {r.id: r for r in requirements}
+        draft.impacts = {i.requirement_id: i for i in impacts}
+        draft.graph = ImpactGraphIndex()
+        draft.graph.rebuild(draft.impacts.values())
+        draft.revisions = RevisionStore()
+        if regulations:
+            # Nouveau dict, jamais modifié en place : les lecteurs n'ont pas de verrou
+            self.regulations = {**self.regulations, **{r.id: r for r in regulations}}
+
+    def _replay_import(self, data: Dict[str, Any]) -> None:
+        """
+        Replays a "snapshot_imported" event. Only reached when the log
+        snapshot written right after the import is missing (crash, or
+        recovery from the older backup snapshot).
+        """
+        from snapshot_io import open_snapshot   # pyarrow : seulement si nécessaire
+
+        source = data.get("source") or ""
+        if source and not os.path.isabs(source):
+            # Copie dans le journal (imports/<checksum>), voir SnapshotReader.load_into_store
+            source = os.path.join(self.event_log.directory, source)
+        try:
+            reader = open_snapshot(source)
+            matches = bool(data.get("checksum")) and reader.checksum() == data["checksum"]
+        except (OSError, ValueError, RuntimeError) as e:
+            raise RuntimeError(f"Cannot replay the snapshot import from '{source}': {e}") from e
+        if not matches:
+            raise RuntimeError(
+                f"Cannot replay the snapshot import from '{source}': it changed since the import "
+                "(or the event predates checksums); restore it or the log snapshot that follows it"
+            )
+        print(f"[LOG] Import rejoué depuis {source}")
+        self._replace_state(
+            self._draft, list(reader.iter_requirements()), list(reader.iter_impacts()), reader.regulations()
+        )
+
+    # Rejeu du journal : appelés par recover(), dans la transaction d'attach_event_log()
+    def _load_state(self, state: Dict[str, Any]) -> None:
+        draft = self._draft
+        draft.requirements = {d["id"]: _requirement_from_dict(d) for d in state["requirements"]}
+        draft.impacts = {d["requirement_id"]: RequirementImpact(**d) for d in state["impacts"]}
+        draft.graph = ImpactGraphIndex()
+        draft.graph.rebuild(draft.impacts.values())
+        draft.revisions = RevisionStore.from_state(state.get("revisions", {}), draft.requirements)
+
+    def _apply_event(self, event: Dict[str, Any]) -> None:
+        draft = self._draft
+        kind = event["type"]
+        data = event["data"]
+        if kind in ("requirement_created", "requirement_updated"):
+            req = _requirement_from_dict(data)
+            previous = draft.requirements.get(req.id)
+            if kind == "requirement_updated" and previous is not None:
+                draft.revisions.record(previous, req, datetime.fromisoformat(event["ts"]), event["summary"])
+            draft.requirements[req.id] = req
+        elif kind == "compliance_updated":
+            req = draft.requirements.get(event["requirement_id"])
+            if req:
+                draft.requirements[req.id] = replace(
+                    req,
+                    compliance_eu=data["eu"],
+                    compliance_india=data["india"],
+                    compliance_japan=data["japan"],
+                )
+        elif kind == "impact_saved":
+            impact = RequirementImpact(**data)
+            draft.impacts[impact.requirement_id] = impact
+            draft.graph.update(impact)
+        elif kind == "snapshot_imported":
+            self._replay_import(data)
+
+
+store = InMemoryStore()
+_open_log_lock = threading.Lock()
 
 
-store = InMemoryStore()
\ No newline at end of file
+def open_event_log(directory: str = EVENT_LOG_DIR, read_only: bool = False) -> Optional[EventLog]:
+    """
+    Attaches the traceability log to the global store, once per process.
+    Called explicitly at startup (importing this module opens nothing):
+    the app is the single writer (EventLogLocked if another process
+    writes to the same directory); the standalone API server opens it
+    read-only. Returns None when persistence is disabled (directory "").
+    """
+    if not directory:
+        return None
+    with _open_log_lock:
+        if store.event_log is not None:
+            return store.event_log
+        log = EventLog(directory, read_only=read_only)
+        replayed = store.attach_event_log(log)
+        atexit.register(log.close)
+        print(f"[INFO] Traceability log {directory}{' (read-only)' if read_only else ''}: "
+              f"{replayed} events replayed, {len(store.requirements)} requirements restored")
+        return log
@@ -0,0 +1,870 @@
+# event_log.py
+"""
+Append-only, checksummed event log for requirement traceability.
+
+Every create / update / compliance / impact event is appended as one line:
+
+    <crc32 hex> <compact json>\n
+
+Layout of the log directory:
+
+    events-<first seq>.log          live segments (the last one is active)
+    snapshot-<seq>.json             store state after event <seq>
+    archive/events-<seq>.log.gz     sealed segments already covered by a snapshot
+    imports/<checksum>/             Parquet snapshots loaded by the store (snapshot_io.py),
+                                    kept to replay their "snapshot_imported" event
+
+- Group commit: append() only buffers; a writer thread writes and fsyncs
+  whole batches (one fsync per commit window, not per event).
+- Snapshots + compaction: once a snapshot covers a sealed segment, the
+  segment is gzip-archived. Startup replay only reads snapshot + tail, but
+  archived events stay queryable for audits.
+- Recovery falls back to the previous snapshot if the newest one is
+  unreadable, replaying the archived segments it does not cover, and
+  refuses to start (EventLogGap) if events are missing in between.
+- One writer per directory: the writer holds an exclusive lock on
+  writer.lock (fcntl, where available) and a second writer fails with
+  EventLogLocked. Other processes (standalone API server) open the log
+  with read_only=True: they replay it but never truncate or append.
+- Counts per change type are kept up to date on append and saved in the
+  snapshot header. Unfiltered pages are read by seq range through a
+  sparse seq -> byte offset index (one entry every INDEX_EVERY lines per
+  segment); filtered queries stream the segments line by line, memory
+  bounded by the requested page.
+"""
+import argparse
+import bisect
+import gzip
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+import zlib
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou inter-processus
+    fcntl = None
+
+SEGMENT_PREFIX = "events-"
+SEGMENT_SUFFIX = ".log"
+ARCHIVE_SUFFIX = ".log.gz"
+SNAPSHOT_PREFIX = "snapshot-"
+SNAPSHOT_SUFFIX = ".json"
+LOCK_NAME = "writer.lock"
+
+# Index clairsemé seq -> offset : une entrée toutes les N lignes d'un segment
+INDEX_EVERY = 1024
+
+_CHANGE_TYPE_RE = re.compile(rb'"change_type":"([^"]*)"')
+
+# Décodeur réutilisé : évite la détection d'encodage de json.loads(bytes),
+# sensible sur un replay de plusieurs millions de lignes.
+_decoder = json.JSONDecoder()
+
+
+# =====================
+#  Petites fonctions
+# =====================
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False,
+                      default=_json_default).encode("utf-8")
+
+
+def encode_event(event: Dict[str, Any]) -> bytes:
+    body = _dumps(event)
+    return b"%08x " % zlib.crc32(body) + body + b"\n"
+
+
+def decode_event(line: bytes) -> Optional[Dict[str, Any]]:
+    """Returns None for a torn or corrupted line."""
+    if len(line) < 11 or line[8:9] != b" " or not line.endswith(b"\n"):
+        return None
+    body = line[9:-1]
+    try:
+        crc = int(line[:8], 16)
+    except ValueError:
+        return None
+    if zlib.crc32(body) != crc:
+        return None
+    return _decoder.decode(body.decode("utf-8"))
+
+
+def _line_seq(line: bytes) -> Optional[int]:
+    """seq of an encoded line without decoding it (b'<crc> {"seq":N,...')."""
+    if not line.startswith(b'{"seq":', 9):
+        return None
+    try:
+        return int(line[16:line.find(b",", 16)])
+    except ValueError:
+        return None
+
+
+def _seq_from_name(name: str, prefix: str, suffix: str) -> Optional[int]:
+    if not (name.startswith(prefix) and name.endswith(suffix)):
+        return None
+    try:
+        return int(name[len(prefix):-len(suffix)])
+    except ValueError:
+        return None
+
+
+def _fsync_dir(path: str) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+# ============================
+#  Event log
+# ============================
+
+class EventLogGap(RuntimeError):
+    """Events are missing between the snapshot and the log tail."""
+
+
+class EventLogLocked(RuntimeError):
+    """Another process already writes to this log directory."""
+
+
+class EventLog:
+    def __init__(
+        self,
+        directory: str,
+        commit_interval: float = 0.05,
+        max_batch: int = 4096,
+        segment_max_bytes: int = 64 * 1024 * 1024,
+        snapshot_every: int = 100_000,
+        fsync: bool = True,
+        read_only: bool = False,
+    ) -> None:
+        self.directory = directory
+        self.archive_dir = os.path.join(directory, "archive")
+        self.commit_interval = commit_interval
+        self.max_batch = max_batch
+        self.segment_max_bytes = segment_max_bytes
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.read_only = read_only
+
+        self._lock_file = None
+        if not read_only:
+            os.makedirs(self.archive_dir, exist_ok=True)
+            self._acquire_writer_lock()
+
+        self._cond = threading.Condition()
+        self._file_lock = threading.Lock()
+        self._pending: List[Tuple[int, bytes]] = []
+        self._next_seq = 1
+        self._durable_seq = 0
+        self._since_snapshot = 0
+        self._closed = False
+        self._write_error: Optional[BaseException] = None
+
+        self._active = None
+        self._active_path = ""
+        self._active_first = 0
+        self._active_bytes = 0
+        self._writer: Optional[threading.Thread] = None
+
+        # Nombre d'événements par change_type (sauvé dans l'en-tête des snapshots)
+        self._counts: Counter = Counter()
+        # premier seq du segment -> [(seq, offset)] ; complété par l'écrivain
+        # (list.append, atomique sous le GIL) et lu sans verrou
+        self._seg_index: Dict[int, List[Tuple[int, int]]] = {}
+        # Lecture seule : (premier seq du segment, offset) juste après le dernier événement lu
+        self._tail: Tuple[int, int] = (0, 0)
+
+        self.last_snapshot_seq = 0
+        self.stats = {"events": 0, "batches": 0, "fsyncs": 0}
+
+    def _acquire_writer_lock(self) -> None:
+        if fcntl is None:
+            print("[LOG] Pas de fcntl : un seul processus doit écrire dans", self.directory)
+            return
+        f = open(os.path.join(self.directory, LOCK_NAME), "a+")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            raise EventLogLocked(
+                f"{self.directory} is already open for writing by another process "
+                f"(open it with read_only=True to read it)"
+            )
+        self._lock_file = f
+
+    # --- Properties ---
+    @property
+    def last_seq(self) -> int:
+        with self._cond:
+            return self._next_seq - 1
+
+    @property
+    def snapshot_due(self) -> bool:
+        return self.snapshot_every > 0 and self._since_snapshot >= self.snapshot_every
+
+    # --- Files ---
+    def _listdir(self) -> List[str]:
+        # Lecture seule : un répertoire pas encore créé par l'écrivain est un journal vide
+        if self.read_only and not os.path.isdir(self.directory):
+            return []
+        return os.listdir(self.directory)
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        segs = []
+        for name in self._listdir():
+            seq = _seq_from_name(name, SEGMENT_PREFIX, SEGMENT_SUFFIX)
+            if seq is not None:
+                segs.append((seq, os.path.join(self.directory, name)))
+        return sorted(segs)
+
+    def _archived(self) -> List[Tuple[int, str]]:
+        segs = []
+        if not os.path.isdir(self.archive_dir):
+            return segs
+        for name in os.listdir(self.archive_dir):
+            seq = _seq_from_name(name, SEGMENT_PREFIX, ARCHIVE_SUFFIX)
+            if seq is not None:
+                segs.append((seq, os.path.join(self.archive_dir, name)))
+        return sorted(segs)
+
+    def _snapshots(self) -> List[Tuple[int, str]]:
+        snaps = []
+        for name in self._listdir():
+            seq = _seq_from_name(name, SNAPSHOT_PREFIX, SNAPSHOT_SUFFIX)
+            if seq is not None:
+                snaps.append((seq, os.path.join(self.directory, name)))
+        return sorted(snaps)
+
+    def _segment_path(self, first_seq: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{first_seq:012d}{SEGMENT_SUFFIX}")
+
+    def _open_active(self, path: str) -> None:
+        self._active = open(path, "ab")
+        self._active_path = path
+        self._active_first = _seq_from_name(os.path.basename(path), SEGMENT_PREFIX, SEGMENT_SUFFIX)
+        self._active_bytes = self._active.tell()
+
+    def _open_segment(self, path: str, archived: bool):
+        if not archived:
+            try:
+                return open(path, "rb")
+            except FileNotFoundError:
+                # Archivé entre-temps (compaction)
+                path = os.path.join(self.archive_dir, os.path.basename(path) + ".gz")
+        return gzip.open(path, "rb")
+
+    def _roll(self, first_seq: int) -> None:
+        """Seals the active segment and starts a new one (caller holds _file_lock)."""
+        if self._active is not None:
+            self._active.close()
+        self._open_active(self._segment_path(first_seq))
+        _fsync_dir(self.directory)
+
+    # --- Recovery ---
+    def _replay_segments(self) -> List[Tuple[int, str, bool]]:
+        """
+        (first seq, path, archived?) of every segment, oldest first. A
+        segment present in both places (crash during compaction) is read
+        from the live copy.
+        """
+        live = self._segments()
+        live_firsts = {first for first, _ in live}
+        segs = [(first, path, True) for first, path in self._archived() if first not in live_firsts]
+        segs += [(first, path, False) for first, path in live]
+        return sorted(segs)
+
+    def recover(
+        self,
+        load_snapshot: Callable[[Dict[str, Any]], None],
+        apply_event: Callable[[Dict[str, Any]], None],
+    ) -> int:
+        """
+        Loads the newest valid snapshot, replays the events after it and
+        opens the log for appending. Returns the number of replayed events.
+
+        If the newest snapshot is unreadable, an older one is used and the
+        archived segments it does not cover are replayed too. Raises
+        EventLogGap if the events after the snapshot are not contiguous
+        (missing segment, corrupted line): starting on partial data would
+        silently lose changes.
+
+        Read-only: the log is replayed as it is (a partial last line is the
+        writer's batch in progress) and nothing is truncated or opened for
+        appending; catch_up() then follows what the writer appends. A
+        directory the writer has not created yet is an empty log.
+        """
+        snap_seq = 0
+        counts = None
+        for seq, path in reversed(self._snapshots()):
+            snapshot = self._read_snapshot(path)
+            if snapshot is not None:
+                header, state = snapshot
+                load_snapshot(state)
+                snap_seq = seq
+                counts = header.get("counts")
+                break
+            print(f"[LOG] Snapshot illisible ignoré : {path}")
+        self.last_snapshot_seq = snap_seq
+        # Snapshot sans compteurs (ancien format) : un seul parcours, au démarrage
+        self._counts = Counter(counts) if counts is not None else self._scan_counts(snap_seq)
+
+        replayed = 0
+        last_seq = snap_seq
+        segs = self._replay_segments()
+        for i, (first, path, archived) in enumerate(segs):
+            is_last = i == len(segs) - 1
+            if not is_last and segs[i + 1][0] <= snap_seq + 1:
+                continue  # entièrement couvert par le snapshot
+
+            if not archived and not os.path.exists(path):
+                # Archivé par le processus écrivain pendant la lecture
+                path, archived = os.path.join(self.archive_dir, os.path.basename(path) + ".gz"), True
+            offset = 0
+            entries: List[Tuple[int, int]] = []
+            with (gzip.open(path, "rb") if archived else open(path, "rb")) as f:
+                for n, line in enumerate(f):
+                    event = decode_event(line)
+                    if event is None:
+                        # Écriture interrompue (crash) : seule la fin du dernier segment
+                        # peut être abîmée ; une ligne valide après elle = corruption
+                        if is_last and not archived and all(decode_event(rest) is None for rest in f):
+                            if not self.read_only:
+                                print(f"[LOG] Fin de log tronquée à l'offset {offset} : {path}")
+                            break
+                        raise EventLogGap(f"Corrupted event after seq {last_seq} (offset {offset}) in {path}")
+                    seq = event["seq"]
+                    if n % INDEX_EVERY == 0:
+                        entries.append((seq, offset))
+                    offset += len(line)
+                    if seq <= last_seq:
+                        continue    # déjà couvert par le snapshot
+                    if seq != last_seq + 1:
+                        raise EventLogGap(
+                            f"Missing events {last_seq + 1}..{seq - 1} before {path} "
+                            f"(snapshot at seq {snap_seq})"
+                        )
+                    apply_event(event)
+                    self._counts[event["change_type"]] += 1
+                    replayed += 1
+                    last_seq = seq
+            self._seg_index[first] = entries
+            if is_last:
+                self._tail = (first, offset)
+            if is_last and not archived and not self.read_only and offset < os.path.getsize(path):
+                with open(path, "r+b") as f:
+                    f.truncate(offset)
+
+        self._next_seq = last_seq + 1
+        self._durable_seq = last_seq
+        self._since_snapshot = last_seq - snap_seq
+        if self.read_only:
+            return replayed
+
+        live = self._segments()
+        if live and os.path.getsize(live[-1][1]) < self.segment_max_bytes:
+            self._open_active(live[-1][1])
+        else:
+            self._open_active(self._segment_path(self._next_seq))
+
+        self._writer = threading.Thread(target=self._writer_loop, name="event-log-writer", daemon=True)
+        self._writer.start()
+        return replayed
+
+    # --- Append / group commit ---
+    def append(
+        self,
+        event_type: str,
+        requirement_id: str,
+        data: Dict[str, Any],
+        change_type: str = "",
+        version: str = "",
+        summary: str = "",
+        timestamp: Optional[datetime] = None,
+        sync: bool = False,
+    ) -> int:
+        """
+        Buffers one event and returns its sequence number. The event is
+        durable once the writer commits its batch; sync=True waits for that.
+        """
+        if self.read_only:
+            raise RuntimeError(f"Event log {self.directory} is open read-only")
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Event log is closed")
+            if self._write_error is not None:
+                # Sinon l'événement resterait en mémoire et serait perdu sans bruit
+                raise RuntimeError("Event log writer failed") from self._write_error
+            seq = self._next_seq
+            self._next_seq += 1
+            event = {
+                "seq": seq,
+                "ts": (timestamp or datetime.utcnow()).isoformat(),
+                "type": event_type,
+                "requirement_id": requirement_id,
+                "change_type": change_type,
+                "version": version,
+                "summary": summary,
+                "data": data,
+            }
+            self._pending.append((seq, encode_event(event)))
+            self._counts[change_type] += 1
+            self._since_snapshot += 1
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch:
+                self._cond.notify_all()
+        if sync:
+            self.wait_durable(seq)
+        return seq
+
+    def wait_durable(self, seq: int) -> None:
+        with self._cond:
+            while self._durable_seq < seq:
+                if self._write_error is not None:
+                    raise RuntimeError("Event log writer failed") from self._write_error
+                if self._writer is None or not self._writer.is_alive():
+                    raise RuntimeError("Event log writer is not running")
+                self._cond.wait(0.5)
+
+    def flush(self) -> int:
+        """Waits until every appended event is on disk. Returns the last seq."""
+        seq = self.last_seq
+        if seq and not self.read_only:
+            self.wait_durable(seq)
+        return seq
+
+    def _writer_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                # Fenêtre de group commit : on laisse les autres appels rejoindre le lot.
+                deadline = time.monotonic() + self.commit_interval
+                while not self._closed and len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending
+                self._pending = []
+                if not batch and self._closed:
+                    return
+
+            try:
+                self._write_batch(batch)
+            except BaseException as e:
+                print("[LOG] Écriture du journal impossible :", e)
+                with self._cond:
+                    self._write_error = e
+                    self._cond.notify_all()
+                return
+
+            with self._cond:
+                self._durable_seq = batch[-1][0]
+                self.stats["events"] += len(batch)
+                self.stats["batches"] += 1
+                if self.fsync:
+                    self.stats["fsyncs"] += 1
+                self._cond.notify_all()
+
+    def _write_batch(self, batch: List[Tuple[int, bytes]]) -> None:
+        data = b"".join(line for _, line in batch)
+        with self._file_lock:
+            if self._active_bytes and self._active_bytes + len(data) > self.segment_max_bytes:
+                self._roll(batch[0][0])
+            entries = self._seg_index.setdefault(self._active_first, [])
+            next_mark = entries[-1][0] + INDEX_EVERY if entries else batch[0][0]
+            offset = self._active_bytes
+            for seq, line in batch:
+                if seq >= next_mark:
+                    entries.append((seq, offset))
+                    next_mark = seq + INDEX_EVERY
+                offset += len(line)
+            self._active.write(data)
+            self._active.flush()
+            if self.fsync:
+                os.fsync(self._active.fileno())
+            self._active_bytes += len(data)
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._writer is not None:
+            self._writer.join()
+        with self._file_lock:
+            if self._active is not None:
+                self._active.close()
+                self._active = None
+        if self._lock_file is not None:
+            self._lock_file.close()     # libère le verrou d'écriture
+            self._lock_file = None
+
+    # --- Snapshots / compaction ---
+    def _read_snapshot(self, path: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """(header, state) of a snapshot file, or None if unreadable."""
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        if zlib.crc32(body) != header.get("crc"):
+            return None
+        return header, json.loads(body)
+
+    def position(self) -> Tuple[int, Dict[str, int]]:
+        """(last seq, counts per change type), consistent with each other."""
+        with self._cond:
+            return self._next_seq - 1, dict(self._counts)
+
+    def write_snapshot(self, seq: int, state: Dict[str, Any],
+                       counts: Optional[Dict[str, int]] = None) -> str:
+        """
+        Persists the store state as of event <seq>, then archives the sealed
+        segments it covers. The caller must make sure no event > seq is
+        reflected in <state>; `counts` comes from position() taken with <seq>
+        (default: the current counts, right if nothing was appended since).
+        """
+        self.wait_durable(seq)
+        body = _dumps(state)
+        header = _dumps({
+            "seq": seq,
+            "crc": zlib.crc32(body),
+            "created": datetime.utcnow(),
+            "counts": counts if counts is not None else self.position()[1],
+        })
+
+        path = os.path.join(self.directory, f"{SNAPSHOT_PREFIX}{seq:012d}{SNAPSHOT_SUFFIX}")
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(header + b"\n" + body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        _fsync_dir(self.directory)
+
+        with self._cond:
+            self.last_snapshot_seq = seq
+            self._since_snapshot = self._next_seq - 1 - seq
+
+        # On garde le snapshot précédent en secours.
+        for _, old in self._snapshots()[:-2]:
+            os.remove(old)
+
+        self.compact(seq)
+        return path
+
+    def compact(self, upto_seq: int) -> int:
+        """Gzip-archives sealed segments whose events are all <= upto_seq."""
+        with self._file_lock:
+            segs = [(s, p) for s, p in self._segments() if p != self._active_path]
+            active_first = _seq_from_name(os.path.basename(self._active_path), SEGMENT_PREFIX, SEGMENT_SUFFIX)
+
+        bounds = [s for s, _ in segs] + [active_first]
+        archived = 0
+        for (first, path), next_first in zip(segs, bounds[1:]):
+            if next_first - 1 > upto_seq:
+                break
+            target = os.path.join(self.archive_dir, os.path.basename(path) + ".gz")
+            with open(path, "rb") as src, gzip.open(target + ".tmp", "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.replace(target + ".tmp", target)
+            os.remove(path)
+            archived += 1
+        if archived:
+            _fsync_dir(self.archive_dir)
+            _fsync_dir(self.directory)
+        return archived
+
+    # --- Index seq -> offset ---
+    def _segment_index(self, first: int, path: str, archived: bool) -> List[Tuple[int, int]]:
+        """Sparse (seq, offset) entries of a segment, built on first use for old segments."""
+        entries = self._seg_index.get(first)
+        if entries is not None:
+            return entries
+        entries = []
+        offset = 0
+        with self._open_segment(path, archived) as f:
+            for n, line in enumerate(f):
+                if n % INDEX_EVERY == 0:
+                    seq = _line_seq(line)
+                    if seq is None:
+                        break
+                    entries.append((seq, offset))
+                offset += len(line)
+        self._seg_index[first] = entries
+        return entries
+
+    def _read_range(self, lo: int, hi: int) -> List[bytes]:
+        """Raw lines of events lo..hi (inclusive), in seq order."""
+        segs = self._replay_segments()
+        i = max(0, bisect.bisect_right([first for first, _, _ in segs], lo) - 1)
+        lines: List[bytes] = []
+        for first, path, archived in segs[i:]:
+            if first > hi:
+                break
+            entries = self._segment_index(first, path, archived)
+            k = bisect.bisect_right(entries, (lo, sys.maxsize)) - 1
+            with self._open_segment(path, archived) as f:
+                if k >= 0:
+                    f.seek(entries[k][1])
+                for line in f:
+                    seq = _line_seq(line)
+                    if seq is None or seq < lo:
+                        continue
+                    if seq > hi:
+                        return lines
+                    lines.append(line)
+        return lines
+
+    # --- Lecture seule : suivi de l'écrivain ---
+    def has_new_events(self) -> bool:
+        """Read-only: cheap check (file sizes) before catch_up()."""
+        segs = self._segments()
+        if not segs:
+            return False
+        first, offset = self._tail
+        last_first, last_path = segs[-1]
+        if last_first != first:
+            return True
+        try:
+            return os.path.getsize(last_path) > offset
+        except FileNotFoundError:
+            return True     # archivé entre-temps : un segment plus récent existe
+
+    def catch_up(self, apply_event: Callable[[Dict[str, Any]], None]) -> int:
+        """
+        Read-only: applies the events the writer process appended since
+        recover() or the previous call, in seq order, and returns how many.
+        Stops before a partial line (batch being written). Raises
+        EventLogGap if events are missing.
+        """
+        if not self.read_only:
+            return 0
+        applied = 0
+        with self._cond:
+            tail_first, tail_offset = self._tail
+            for first, path, archived in self._replay_segments():
+                if first < tail_first:
+                    continue
+                offset = tail_offset if first == tail_first else 0
+                with self._open_segment(path, archived) as f:
+                    if offset:
+                        f.seek(offset)
+                    for line in f:
+                        event = decode_event(line) if line.endswith(b"\n") else None
+                        if event is None:
+                            return applied      # fin en cours d'écriture
+                        offset += len(line)
+                        seq = event["seq"]
+                        if seq >= self._next_seq:
+                            if seq != self._next_seq:
+                                raise EventLogGap(f"Missing events {self._next_seq}..{seq - 1} in {path}")
+                            apply_event(event)
+                            self._counts[event["change_type"]] += 1
+                            self._next_seq = seq + 1
+                            applied += 1
+                        self._tail = (first, offset)
+        return applied
+
+    def _scan_counts(self, upto_seq: int) -> Counter:
+        counts: Counter = Counter()
+        if upto_seq <= 0:
+            return counts
+        for line in self._iter_lines():
+            seq = _line_seq(line)
+            if seq is None:
+                continue
+            if seq > upto_seq:
+                break
+            m = _CHANGE_TYPE_RE.search(line)
+            if m:
+                counts[m.group(1).decode("utf-8")] += 1
+        return counts
+
+    # --- Queries (streaming) ---
+    def _iter_lines(self) -> Iterator[bytes]:
+        for _, path in self._archived():
+            with gzip.open(path, "rb") as f:
+                yield from f
+        for _, path in self._segments():
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                continue  # archivé entre-temps : déjà lu ou relu via l'archive
+            with f:
+                yield from f
+
+    def _matching_lines(
+        self,
+        requirement_id: Optional[str] = None,
+        change_type: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> Iterator[bytes]:
+        req_needle = b'"requirement_id":' + _dumps(requirement_id) if requirement_id else None
+        type_needle = b'"change_type":' + _dumps(change_type) if change_type else None
+        need_decode = since is not None or until is not None
+
+        for line in self._iter_lines():
+            # Pré-filtre sur les octets bruts : on ne parse que les candidats.
+            if req_needle and req_needle not in line:
+                continue
+            if type_needle and type_needle not in line:
+                continue
+            if req_needle or type_needle or need_decode:
+                event = decode_event(line)
+                if event is None:
+                    continue
+                if requirement_id and event["requirement_id"] != requirement_id:
+                    continue
+                if change_type and event["change_type"] != change_type:
+                    continue
+                if need_decode:
+                    ts = datetime.fromisoformat(event["ts"])
+                    if (since and ts < since) or (until and ts > until):
+                        continue
+            yield line
+
+    def iter_events(self, **filters: Any) -> Iterator[Dict[str, Any]]:
+        for line in self._matching_lines(**filters):
+            event = decode_event(line)
+            if event is not None:
+                yield event
+
+    def query(
+        self,
+        requirement_id: Optional[str] = None,
+        change_type: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 100,
+        offset: int = 0,
+        newest_first: bool = True,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        One page of events plus the total number of matches. Without
+        filters the page is read by seq range (index lookup, no scan);
+        otherwise the segments are streamed and only the raw lines of the
+        requested window are kept in memory.
+        """
+        self.flush()
+
+        if not (requirement_id or change_type or since or until):
+            # Les seq sont contigus depuis 1 (vérifié par recover)
+            total = self.last_seq
+            if newest_first:
+                hi = total - offset
+                lo = max(1, hi - limit + 1)
+            else:
+                lo = offset + 1
+                hi = min(total, offset + limit)
+            lines = self._read_range(lo, hi) if limit > 0 and lo <= hi else []
+            if newest_first:
+                lines.reverse()
+            return [e for e in (decode_event(line) for line in lines) if e is not None], total
+
+        matches = self._matching_lines(requirement_id, change_type, since, until)
+
+        total = 0
+        if newest_first:
+            window: deque = deque(maxlen=offset + limit)
+            for line in matches:
+                window.append(line)
+                total += 1
+            page = list(reversed(window))[offset:offset + limit]
+        else:
+            page = []
+            for line in matches:
+                if offset <= total < offset + limit:
+                    page.append(line)
+                total += 1
+
+        events = [e for e in (decode_event(line) for line in page) if e is not None]
+        return events, total
+
+    def count_by_change_type(self) -> Dict[str, int]:
+        """Running counts (no scan), including events not yet flushed."""
+        return self.position()[1]
+
+
+# ============================
+#  Benchmark
+# ============================
+
+if __name__ == "__main__":
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Append / replay benchmark for the event log")
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--requirements", type=int, default=5_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log = EventLog(tmp, snapshot_every=0)
+        log.recover(lambda s: None, lambda e: None)
+
+        t0 = time.perf_counter()
+        for i in range(args.events):
+            rid = f"R67-{i % args.requirements}"
+            log.append(
+                "compliance_updated", rid,
+                {"eu": "OK", "india": None, "japan": "NOK"},
+                change_type="updated", version="1.0",
+                summary="Compliance updated: EU=OK, IN=None, JP=NOK",
+            )
+        log.flush()
+        t_append = time.perf_counter() - t0
+        print(f"append : {args.events} events in {t_append:.2f}s "
+              f"({log.stats['batches']} group commits / fsyncs)")
+        log.close()
+
+        log = EventLog(tmp, snapshot_every=0)
+        seen = [0]
+
+        def _apply(event: Dict[str, Any]) -> None:
+            seen[0] += 1
+
+        t0 = time.perf_counter()
+        log.recover(lambda s: None, _apply)
+        print(f"replay : {seen[0]} events in {time.perf_counter() - t0:.2f}s")
+
+        t0 = time.perf_counter()
+        events, total = log.query(requirement_id="R67-42", limit=20)
+        print(f"query  : {total} matches for R67-42, page of {len(events)} "
+              f"in {time.perf_counter() - t0:.2f}s")
+
+        t0 = time.perf_counter()
+        events, total = log.query(limit=50)
+        print(f"tail   : last {len(events)} of {total} events in {time.perf_counter() - t0:.2f}s")
+
+        t0 = time.perf_counter()
+        events, total = log.query(limit=50, offset=total // 2)
+        print(f"page   : {len(events)} events at offset {total // 2} in {time.perf_counter() - t0:.3f}s")
+
+        t0 = time.perf_counter()
+        counts = log.count_by_change_type()
+        print(f"counts : {counts} in {time.perf_counter() - t0:.4f}s")
+        log.close()
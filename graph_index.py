@@ -0,0 +1,196 @@
+# graph_index.py
+"""
+Requirement ↔ component ↔ test ↔ document graph built from RequirementImpact.
+
+The index is maintained incrementally on every save_impact(): only the
+edges of the updated requirement are diffed, so reverse lookups
+("which requirements touch LPG_MULTIVALVE?") cost O(degree) instead of a
+scan over every impact.
+
+Concurrency: the index is persistent (persistent_map.py). The store's
+writer edits a draft() and publishes freeze() with the next StoreView;
+a published index is never modified, so readers query it without locks
+or defensive copies.
+"""
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Set, Tuple
+
+from models import RequirementImpact
+from persistent_map import MapDraft, PersistentMap
+
+REQUIREMENT = "requirement"
+COMPONENT = "component"
+TEST = "test"
+DOCUMENT = "document"
+
+# Champ de RequirementImpact correspondant à chaque type d'artefact
+ARTIFACT_FIELDS = {
+    COMPONENT: "components",
+    TEST: "tests",
+    DOCUMENT: "documents",
+}
+
+Node = Tuple[str, str]  # (kind, id)
+
+
+class ImpactGraphIndex:
+    def __init__(self) -> None:
+        # requirement -> frozenset d'artefacts, par type
+        self._forward: Dict[str, Mapping[str, FrozenSet[str]]] = {k: PersistentMap() for k in ARTIFACT_FIELDS}
+        # artefact -> requirements (PersistentMap utilisée comme ensemble), par type
+        self._reverse: Dict[str, Mapping[str, Mapping[str, bool]]] = {k: PersistentMap() for k in ARTIFACT_FIELDS}
+        # (type, artefact) dont l'ensemble inverse est un brouillon
+        self._drafted: Set[Tuple[str, str]] = set()
+
+    # --- Versions ---
+    def draft(self) -> "ImpactGraphIndex":
+        """Editable copy sharing every unchanged part with this (frozen) index."""
+        copy = ImpactGraphIndex()
+        copy._forward = dict(self._forward)
+        copy._reverse = dict(self._reverse)
+        return copy
+
+    def freeze(self) -> "ImpactGraphIndex":
+        """Turns pending edits into immutable maps; returns self, to be published."""
+        for kind, item in self._drafted:
+            reverse = self._reverse[kind]
+            reqs = reverse.get(item)
+            if isinstance(reqs, MapDraft):
+                frozen = reqs.freeze()
+                if frozen:
+                    reverse[item] = frozen
+                else:
+                    del reverse[item]
+        self._drafted = set()
+        for maps in (self._forward, self._reverse):
+            for kind, m in maps.items():
+                if isinstance(m, MapDraft):
+                    maps[kind] = m.freeze()
+        return self
+
+    @staticmethod
+    def _editable(maps: Dict[str, Mapping], kind: str) -> MapDraft:
+        m = maps[kind]
+        if not isinstance(m, MapDraft):
+            m = maps[kind] = m.draft()
+        return m
+
+    # --- Maintenance ---
+    def update(self, impact: RequirementImpact) -> None:
+        """Replaces the edges of one requirement (diff of old vs new)."""
+        req_id = impact.requirement_id
+        for kind, attr in ARTIFACT_FIELDS.items():
+            new = frozenset(getattr(impact, attr) or [])
+            old = self._forward[kind].get(req_id, frozenset())
+            if new == old:
+                continue
+            reverse = self._editable(self._reverse, kind)
+            for item in old - new:
+                reqs = reverse.get(item)
+                if reqs is not None:
+                    self._editable_reqs(reverse, kind, item, reqs).pop(req_id, None)
+            for item in new - old:
+                reqs = reverse.get(item)
+                self._editable_reqs(reverse, kind, item, reqs)[req_id] = True
+            forward = self._editable(self._forward, kind)
+            if new:
+                forward[req_id] = new
+            else:
+                forward.pop(req_id, None)
+
+    def _editable_reqs(self, reverse: MapDraft, kind: str, item: str,
+                       reqs: Optional[Mapping[str, bool]]) -> MapDraft:
+        if not isinstance(reqs, MapDraft):
+            reqs = (reqs if reqs is not None else PersistentMap()).draft()
+            reverse[item] = reqs
+            self._drafted.add((kind, item))
+        return reqs
+
+    def remove(self, req_id: str) -> None:
+        self.update(RequirementImpact(req_id, [], [], [], "", []))
+
+    def rebuild(self, impacts: Iterable[RequirementImpact]) -> None:
+        self._forward = {k: PersistentMap() for k in ARTIFACT_FIELDS}
+        self._reverse = {k: PersistentMap() for k in ARTIFACT_FIELDS}
+        self._drafted = set()
+        for impact in impacts:
+            self.update(impact)
+
+    # --- Lookups (O(degree)) ---
+    def artifacts(self, kind: str) -> List[str]:
+        return sorted(self._reverse[kind])
+
+    def requirements_for(self, kind: str, item_id: str) -> Set[str]:
+        """Requirements linked to a component / test / document."""
+        return set(self._reverse[kind].get(item_id, ()))
+
+    def artifacts_for(self, req_id: str, kind: str) -> Set[str]:
+        """Components / tests / documents linked to a requirement."""
+        return set(self._forward[kind].get(req_id, ()))
+
+    def degree(self, kind: str, item_id: str) -> int:
+        return len(self._reverse[kind].get(item_id, ()))
+
+    def related(self, kind: str, item_id: str, target_kind: str) -> Dict[str, int]:
+        """
+        Artefacts of target_kind sharing at least one requirement with item_id,
+        with the number of shared requirements
+        (e.g. tests to re-run if a component changes).
+        """
+        counts: Dict[str, int] = {}
+        for req_id in self._reverse[kind].get(item_id, ()):
+            for other in self._forward[target_kind].get(req_id, ()):
+                counts[other] = counts.get(other, 0) + 1
+        if kind == target_kind:
+            counts.pop(item_id, None)
+        return counts
+
+    # --- Propagation ---
+    def neighbours(self, node: Node) -> Iterable[Node]:
+        kind, node_id = node
+        if kind == REQUIREMENT:
+            for k in ARTIFACT_FIELDS:
+                for item in self._forward[k].get(node_id, ()):
+                    yield (k, item)
+        else:
+            for req_id in self._reverse[kind].get(node_id, ()):
+                yield (REQUIREMENT, req_id)
+
+    def propagate(self, kind: str, item_id: str, max_depth: int = 2,
+                  follow: Optional[Set[str]] = None) -> Dict[Node, int]:
+        """
+        Transitive change impact: breadth-first walk from a changed node.
+        One "depth" is one hop through a requirement
+        (component -> requirement -> tests/documents/other components).
+        Only nodes of the kinds in `follow` are expanded further
+        (default: components, i.e. a changed part drags in the parts that
+        share requirements with it, but a test does not).
+
+        Returns {node: hop distance}.
+        """
+        follow = follow if follow is not None else {COMPONENT}
+        start = (kind, item_id)
+        dist: Dict[Node, int] = {start: 0}
+        queue = deque([start])
+
+        while queue:
+            node = queue.popleft()
+            d = dist[node]
+            if node[0] != REQUIREMENT:
+                if d >= max_depth * 2 or (node != start and node[0] not in follow):
+                    continue
+            for nb in self.neighbours(node):
+                if nb not in dist:
+                    dist[nb] = d + 1
+                    queue.append(nb)
+
+        del dist[start]
+        # distance en "sauts d'exigence" : artefact direct = 1, exigence = 1
+        return {node: (d + 1) // 2 for node, d in dist.items()}
+
+    def change_impact(self, kind: str, item_id: str, max_depth: int = 2) -> Dict[str, Dict[str, int]]:
+        """propagate() grouped by kind: {kind: {id: depth}}."""
+        grouped: Dict[str, Dict[str, int]] = {k: {} for k in (REQUIREMENT, *ARTIFACT_FIELDS)}
+        for (k, node_id), depth in self.propagate(kind, item_id, max_depth).items():
+            grouped[k][node_id] = depth
+        return grouped
@@ -1,17 +1,16 @@
 # impact_engine.py
+import hashlib
 import json
-from typing import List
-
-import requests
-
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from llm_cassette import CassetteMiss
+from llm_governor import BATCH, llm_priority
 from models import Requirement, RequirementImpact
-
-
-# ==========================
-#  Config Ollama / Mistral
-# ==========================
-OLLAMA_URL = "http://localhost:11434/api/generate"
-MODEL_NAME = "mistral"  # ou "mistral:7b" selon ce que tu as pull
+from ollama_runtime import MODEL_NAME, OllamaError, generate
 
 
 # =========
@@ -79,6 +78,164 @@ DOC_KEYWORDS = {
     "label": ["DOC_LABELING"],
 }
 
+# Mots-clés de criticité, par ordre de priorité (le premier niveau trouvé l'emporte)
+CRITICALITY_KEYWORDS = {
+    "HIGH": ["leak", "leakage", "fire", "explosion", "crash", "safety", "hazard"],
+    "MEDIUM": ["pressure", "temperature", "durability", "fatigue"],
+    "LOW": ["documentation", "manual", "marking", "label", "labeling"],
+}
+
+# Composants qui ne disent rien de l'architecture impactée
+GENERIC_COMPONENTS = {"LPG_SYSTEM", "UNSPECIFIED_COMPONENT"}
+
+
+# ============================
+#  Mode d'inférence
+# ============================
+
+@dataclass(frozen=True)
+class InferenceConfig:
+    """
+    tiered=False : Mistral pour chaque exigence, complété par les mots-clés.
+    tiered=True  : règles d'abord ; seules les exigences dont la confiance
+                   est < threshold passent aux modèles de escalation_models,
+                   dans l'ordre (ex. un petit modèle puis Mistral).
+    """
+    tiered: bool = False
+    threshold: float = 0.8
+    escalation_models: Tuple[str, ...] = (MODEL_NAME,)
+
+    def pipeline_id(self) -> str:
+        # Sans le seuil : un changement de seuil n'invalide que les impacts
+        # dont le palier change (voir stale_reasons)
+        if not self.tiered:
+            return MODEL_NAME
+        return "tiered:" + ">".join(self.escalation_models)
+
+
+DEFAULT_INFERENCE = InferenceConfig(
+    tiered=os.environ.get("R67_IMPACT_TIERED", "0") == "1",
+    threshold=float(os.environ.get("R67_IMPACT_THRESHOLD", "0.8")),
+    escalation_models=tuple(
+        m.strip() for m in os.environ.get("R67_IMPACT_ESCALATION", MODEL_NAME).split(",") if m.strip()
+    ),
+)
+
+
+# ============================
+#  Prompt
+# ============================
+
+IMPACT_PROMPT_TEMPLATE = """
+You are a systems engineer for an automotive OEM (Renault).
+You must analyse one regulatory requirement from UNECE R67 and map it to
+vehicle architecture and verification activities.
+
+Requirement (raw + engineering form):
+
+RAW:
+\"\"\"{text_raw}\"\"\"
+
+ENGINEERING:
+\"\"\"{text_engineering}\"\"\"
+
+Return ONLY ONE JSON object with the structure:
+
+{{
+  "components": ["LPG_TANK", "LPG_VALVE", ...],   // short component ids
+  "tests": ["TEST_PRESSURE", "TEST_LEAK", ...],   // short test ids
+  "documents": ["DOC_R67_COMPLIANCE", ...],       // short doc ids
+  "criticality": "HIGH" | "MEDIUM" | "LOW",
+  "validation_actions": [
+      "Sentence 1 describing what validation must be done.",
+      "Sentence 2 ..."
+  ]
+}}
+
+Rules:
+- Use HIGH criticality for safety-related requirements (fire, leakage, crash, explosion...).
+- Use MEDIUM for performance / robustness requirements (pressure, temperature, durability...).
+- Use LOW for documentation / labeling / traceability only.
+- Always return valid JSON, no explanation outside the JSON.
+"""
+
+
+# ============================
+#  Empreinte (mémoïsation)
+# ============================
+
+def _short_hash(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()[:16]
+
+
+def _rule_tables_hash() -> str:
+    tables = {
+        "components": COMPONENT_KEYWORDS,
+        "tests": TEST_KEYWORDS,
+        "documents": DOC_KEYWORDS,
+        "criticality": CRITICALITY_KEYWORDS,
+    }
+    return _short_hash(json.dumps(tables, sort_keys=True))
+
+
+def impact_fingerprint_parts(req: Requirement, config: Optional[InferenceConfig] = None) -> Dict[str, str]:
+    """
+    Ce dont dépend le résultat de infer_impact().
+    Les tables et le template sont relus à chaque appel : une modification
+    à chaud (ou un rechargement du module) rend les impacts existants obsolètes.
+    """
+    config = config or DEFAULT_INFERENCE
+    return {
+        "text": _short_hash(req.text_raw + "\x1f" + req.text_engineering),
+        "prompt": _short_hash(IMPACT_PROMPT_TEMPLATE),
+        "rules": _rule_tables_hash(),
+        "model": config.pipeline_id(),
+    }
+
+
+LLM_FAILED_MARKER = "llm=failed"
+
+
+def _format_fingerprint(parts: Dict[str, str]) -> str:
+    return ";".join(f"{k}={v}" for k, v in parts.items())
+
+
+def _parse_fingerprint(fingerprint: str) -> Dict[str, str]:
+    parts = {}
+    for item in fingerprint.split(";"):
+        if "=" in item:
+            k, v = item.split("=", 1)
+            parts[k] = v
+    return parts
+
+
+def impact_fingerprint(req: Requirement, config: Optional[InferenceConfig] = None,
+                       llm_failed: bool = False) -> str:
+    """
+    llm_failed=True : le LLM devait répondre mais n'a rien rendu d'exploitable
+    (Ollama arrêté, JSON invalide) ; le repli mots-clés / règles est marqué
+    pour rester obsolète jusqu'à ce qu'un appel aboutisse.
+    """
+    fingerprint = _format_fingerprint(impact_fingerprint_parts(req, config))
+    return fingerprint + ";" + LLM_FAILED_MARKER if llm_failed else fingerprint
+
+
+def stale_reasons(req: Requirement, impact: RequirementImpact,
+                  config: Optional[InferenceConfig] = None) -> List[str]:
+    """Liste des éléments qui ont changé depuis le calcul de l'impact ([] = à jour)."""
+    if not impact.fingerprint:
+        return ["unversioned"]
+    config = config or DEFAULT_INFERENCE
+    old = _parse_fingerprint(impact.fingerprint)
+    current = impact_fingerprint_parts(req, config)
+    reasons = [k for k, v in current.items() if old.get(k) != v]
+    if old.get("llm") == "failed":
+        reasons.append("llm-failed")
+    if config.tiered and impact.rules_confidence is not None and \
+            (impact.tier == "rules") != (impact.rules_confidence >= config.threshold):
+        reasons.append("threshold")
+    return reasons
+
 
 # =====================
 #  Petites fonctions
@@ -88,21 +245,39 @@ def _infer_criticality(text: str) -> str:
     """
     Détermine une criticité simple à partir de mots-clés.
     """
-    t = text.lower()
-
-    safety_words = ["leak", "leakage", "fire", "explosion", "crash", "safety", "hazard"]
-    if any(w in t for w in safety_words):
-        return "HIGH"
-
-    perf_words = ["pressure", "temperature", "durability", "fatigue"]
-    if any(w in t for w in perf_words):
-        return "MEDIUM"
+    levels = _criticality_levels(text.lower())
+    return levels[0] if levels else "MEDIUM"
+
+
+def _criticality_levels(text_lower: str) -> List[str]:
+    """Tous les niveaux dont au moins un mot-clé apparaît, par priorité."""
+    return [
+        level for level, words in CRITICALITY_KEYWORDS.items()
+        if any(w in text_lower for w in words)
+    ]
+
+
+def _keyword_artifacts(text_lower: str,
+                       components: Optional[List[str]] = None,
+                       tests: Optional[List[str]] = None,
+                       documents: Optional[List[str]] = None) -> Tuple[List[str], List[str], List[str]]:
+    """Complète les listes avec les tables de mots-clés (sans doublons, ordre conservé)."""
+    components = list(components or [])
+    tests = list(tests or [])
+    documents = list(documents or [])
+
+    for table, found in ((COMPONENT_KEYWORDS, components), (TEST_KEYWORDS, tests), (DOC_KEYWORDS, documents)):
+        for kw, ids in table.items():
+            if kw in text_lower:
+                for i in ids:
+                    if i not in found:
+                        found.append(i)
 
-    doc_words = ["documentation", "manual", "marking", "label", "labeling"]
-    if any(w in t for w in doc_words):
-        return "LOW"
+    # Si vraiment aucun composant détecté mais qu'on parle du système
+    if not components and ("system" in text_lower or "vehicle" in text_lower):
+        components.append("UNSPECIFIED_COMPONENT")
 
-    return "MEDIUM"
+    return components, tests, documents
 
 
 def _build_validation_actions(components: List[str], tests: List[str], criticality: str) -> List[str]:
@@ -141,7 +316,7 @@ def _build_validation_actions(components: List[str], tests: List[str], criticali
 #  Appel Ollama / Mistral
 # ============================
 
-def _call_ollama_for_impact(prompt: str) -> dict:
+def _call_ollama_for_impact(prompt: str, model: Optional[str] = None) -> dict:
     """
     Appelle Mistral via Ollama pour analyser l'impact d'une exigence.
 
@@ -154,24 +329,19 @@ def _call_ollama_for_impact(prompt: str) -> dict:
       "validation_actions": [...]
     }
     """
-    payload = {
-        "model": MODEL_NAME,
-        "prompt": prompt,
-        "stream": False,
-    }
-
+    # timeout = appel HTTP seul ; l'attente dans la file globale n'est pas comptée
     try:
-        resp = requests.post(OLLAMA_URL, json=payload, timeout=120)
+        data = generate(prompt, task="impact", timeout=120, model=model)
+    except OllamaError as e:
+        print("[Ollama] Réponse inattendue :", e)
+        return {}
+    except CassetteMiss:
+        # Rejeu incomplet : ne pas retomber en silence sur les règles
+        raise
     except Exception as e:
         print("[Ollama] Erreur de connexion :", e)
         return {}
 
-    if resp.status_code != 200:
-        print("[Ollama] Code HTTP inattendu :", resp.status_code)
-        print(resp.text)
-        return {}
-
-    data = resp.json()
     raw_text = data.get("response", "")
 
     # Essayer d’isoler le JSON (au cas où Mistral parle autour)
@@ -196,105 +366,274 @@ def _call_ollama_for_impact(prompt: str) -> dict:
 #  Fonction principale
 # ============================
 
+def _complete_impact(req: Requirement, llm_result: dict, tier: str,
+                     config: Optional[InferenceConfig] = None, llm_failed: bool = False,
+                     rules_confidence: Optional[float] = None) -> RequirementImpact:
+    """Complète la réponse du LLM (éventuellement vide) avec les mots-clés."""
+    text_lower = (req.text_engineering or req.text_raw or "").lower()
+
+    components, tests, documents = _keyword_artifacts(
+        text_lower,
+        llm_result.get("components"),
+        llm_result.get("tests"),
+        llm_result.get("documents"),
+    )
+
+    # Criticité si absente
+    criticality = llm_result.get("criticality") or _infer_criticality(text_lower)
+
+    # Actions de validation si absentes
+    validation_actions = llm_result.get("validation_actions") or \
+        _build_validation_actions(components, tests, criticality)
+
+    return RequirementImpact(
+        requirement_id=req.id,
+        components=components,
+        tests=tests,
+        documents=documents,
+        criticality=criticality,
+        validation_actions=validation_actions,
+        fingerprint=impact_fingerprint(req, config, llm_failed),
+        tier=tier,
+        rules_confidence=rules_confidence,
+    )
+
+
+def _llm_impact_result(req: Requirement, model: Optional[str] = None) -> dict:
+    prompt = IMPACT_PROMPT_TEMPLATE.format(
+        text_raw=req.text_raw,
+        text_engineering=req.text_engineering,
+    )
+    print(f"[IMPACT] Appel {model or MODEL_NAME}/Ollama pour l'exigence {req.id}...")
+    return _call_ollama_for_impact(prompt, model)
+
+
 def infer_impact_for_requirement(req: Requirement) -> RequirementImpact:
     """
     Déduit l’impact d’une exigence R67 en combinant :
     - ce que propose Mistral (Ollama)
     - un fallback simple à base de mots-clés
     """
-    base_text = req.text_engineering or req.text_raw or ""
-    text_lower = base_text.lower()
+    start = time.perf_counter()
+    llm_result = _llm_impact_result(req)
+    tier = f"llm:{MODEL_NAME}" if llm_result else "keywords"
+    tier_stats.record(tier, True, time.perf_counter() - start)
+    return _complete_impact(req, llm_result or {}, tier, InferenceConfig(tiered=False),
+                            llm_failed=not llm_result)
 
-    # -------- 1) Demander une analyse à Mistral -------- #
-    prompt = f"""
-You are a systems engineer for an automotive OEM (Renault).
-You must analyse one regulatory requirement from UNECE R67 and map it to
-vehicle architecture and verification activities.
-
-Requirement (raw + engineering form):
-
-RAW:
-\"\"\"{req.text_raw}\"\"\"
 
-ENGINEERING:
-\"\"\"{req.text_engineering}\"\"\"
-
-Return ONLY ONE JSON object with the structure:
-
-{{
-  "components": ["LPG_TANK", "LPG_VALVE", ...],   // short component ids
-  "tests": ["TEST_PRESSURE", "TEST_LEAK", ...],   // short test ids
-  "documents": ["DOC_R67_COMPLIANCE", ...],       // short doc ids
-  "criticality": "HIGH" | "MEDIUM" | "LOW",
-  "validation_actions": [
-      "Sentence 1 describing what validation must be done.",
-      "Sentence 2 ..."
-  ]
-}}
-
-Rules:
-- Use HIGH criticality for safety-related requirements (fire, leakage, crash, explosion...).
-- Use MEDIUM for performance / robustness requirements (pressure, temperature, durability...).
-- Use LOW for documentation / labeling / traceability only.
-- Always return valid JSON, no explanation outside the JSON.
-"""
-    print(f"[IMPACT] Appel Mistral/Ollama pour l'exigence {req.id}...")
-    llm_result = _call_ollama_for_impact(prompt)
-
-    components: List[str] = []
-    tests: List[str] = []
-    documents: List[str] = []
-    criticality: str = ""
-    validation_actions: List[str] = []
-
-    if llm_result:
-        components = llm_result.get("components") or []
-        tests = llm_result.get("tests") or []
-        documents = llm_result.get("documents") or []
-        criticality = llm_result.get("criticality") or ""
-        validation_actions = llm_result.get("validation_actions") or []
-
-    # -------- 2) Fallback dictionnaire si c'est vide / incomplet -------- #
-
-    # Composants via mots-clés
-    for kw, comps in COMPONENT_KEYWORDS.items():
-        if kw in text_lower:
-            for c in comps:
-                if c not in components:
-                    components.append(c)
-
-    # Tests via mots-clés
-    for kw, ts in TEST_KEYWORDS.items():
-        if kw in text_lower:
-            for t in ts:
-                if t not in tests:
-                    tests.append(t)
-
-    # Documents via mots-clés
-    for kw, docs in DOC_KEYWORDS.items():
-        if kw in text_lower:
-            for d in docs:
-                if d not in documents:
-                    documents.append(d)
+# ============================
+#  Inférence par paliers
+# ============================
 
-    # Si vraiment aucun composant détecté mais qu'on parle du système
-    if not components and ("system" in text_lower or "vehicle" in text_lower):
-        components.append("UNSPECIFIED_COMPONENT")
+def rule_based_impact(req: Requirement) -> Tuple[RequirementImpact, float, List[str]]:
+    """
+    Palier 0 : impact à partir des seules tables de mots-clés, avec un score
+    de confiance dans [0, 1] et les raisons qui le font baisser.
 
-    # Criticité si absente
-    if not criticality:
-        criticality = _infer_criticality(text_lower)
+    - criticité (0.40) : un seul niveau détecté ; des signaux mixtes dont
+      « sécurité » restent assez sûrs (HIGH l'emporte), sinon ambigu
+    - composants (0.35) : au moins un composant précis, pas seulement LPG_SYSTEM
+    - vérification (0.25) : des essais (ou des documents pour une exigence LOW)
+    """
+    text_lower = (req.text_engineering or req.text_raw or "").lower()
+    components, tests, documents = _keyword_artifacts(text_lower)
+    levels = _criticality_levels(text_lower)
+    criticality = levels[0] if levels else "MEDIUM"
+
+    score = 0.0
+    reasons: List[str] = []
+
+    if len(levels) == 1:
+        score += 0.40
+    elif levels and levels[0] == "HIGH":
+        score += 0.30
+        reasons.append("mixed criticality signals")
+    elif levels:
+        score += 0.15
+        reasons.append("ambiguous criticality")
+    else:
+        reasons.append("no criticality keyword")
+
+    specific = [c for c in components if c not in GENERIC_COMPONENTS]
+    if specific:
+        score += 0.35 if len(specific) <= 3 else 0.25
+        if len(specific) > 3:
+            reasons.append("many components matched")
+    elif components:
+        score += 0.10
+        reasons.append("only generic component")
+    else:
+        reasons.append("no component keyword")
 
-    # Actions de validation si absentes
-    if not validation_actions:
-        validation_actions = _build_validation_actions(components, tests, criticality)
+    if (documents if criticality == "LOW" else tests):
+        score += 0.25
+    else:
+        reasons.append("no document keyword" if criticality == "LOW" else "no test keyword")
 
-    # -------- 3) Construction de l'objet RequirementImpact -------- #
-    return RequirementImpact(
+    impact = RequirementImpact(
         requirement_id=req.id,
         components=components,
         tests=tests,
         documents=documents,
         criticality=criticality,
-        validation_actions=validation_actions,
-    )
\ No newline at end of file
+        validation_actions=_build_validation_actions(components, tests, criticality),
+        tier="rules",
+        rules_confidence=round(score, 2),
+    )
+    return impact, impact.rules_confidence, reasons
+
+
+def _accept_llm_result(result: dict, last: bool) -> bool:
+    """Un petit modèle doit rendre une réponse exploitable pour être retenu."""
+    if not result:
+        return False
+    if last:
+        return True
+    return result.get("criticality") in ("HIGH", "MEDIUM", "LOW") and \
+        bool(result.get("components") or result.get("tests"))
+
+
+def infer_impact_tiered(req: Requirement, config: Optional[InferenceConfig] = None) -> RequirementImpact:
+    """
+    Règles d'abord ; escalade vers les LLM seulement si la confiance des
+    règles est inférieure au seuil. Si aucun LLM ne répond, on garde le
+    résultat des règles.
+    """
+    config = config or DEFAULT_INFERENCE
+    start = time.perf_counter()
+    rules_impact, confidence, _ = rule_based_impact(req)
+    accepted = confidence >= config.threshold
+    tier_stats.record("rules", accepted, time.perf_counter() - start)
+    if accepted:
+        rules_impact.fingerprint = impact_fingerprint(req, config)
+        return rules_impact
+
+    models = config.escalation_models or (MODEL_NAME,)
+    for i, model in enumerate(models):
+        start = time.perf_counter()
+        result = _llm_impact_result(req, model)
+        accepted = _accept_llm_result(result, last=i == len(models) - 1)
+        tier_stats.record(f"llm:{model}", accepted, time.perf_counter() - start)
+        if accepted:
+            return _complete_impact(req, result, f"llm:{model}", config, rules_confidence=confidence)
+
+    tier_stats.record("rules-fallback", True, 0.0)
+    rules_impact.tier = "rules-fallback"
+    rules_impact.fingerprint = impact_fingerprint(req, config, llm_failed=True)
+    return rules_impact
+
+
+def infer_impact(req: Requirement, config: Optional[InferenceConfig] = None) -> RequirementImpact:
+    config = config or DEFAULT_INFERENCE
+    if config.tiered:
+        return infer_impact_tiered(req, config)
+    return infer_impact_for_requirement(req)
+
+
+# ============================
+#  Statistiques par palier
+# ============================
+
+@dataclass
+class TierStats:
+    attempts: Dict[str, int] = field(default_factory=dict)
+    hits: Dict[str, int] = field(default_factory=dict)
+    seconds: Dict[str, float] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, tier: str, accepted: bool, seconds: float) -> None:
+        with self._lock:
+            self.attempts[tier] = self.attempts.get(tier, 0) + 1
+            self.seconds[tier] = self.seconds.get(tier, 0.0) + seconds
+            if accepted:
+                self.hits[tier] = self.hits.get(tier, 0) + 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.attempts.clear()
+            self.hits.clear()
+            self.seconds.clear()
+
+    def report(self) -> List[Dict[str, object]]:
+        """
+        Une ligne par palier : tentatives, réponses retenues, taux de réussite
+        du palier, part des exigences résolues et temps moyen.
+        """
+        with self._lock:
+            total = sum(self.hits.values())
+            rows = []
+            for tier, attempts in self.attempts.items():
+                hits = self.hits.get(tier, 0)
+                rows.append({
+                    "tier": tier,
+                    "attempts": attempts,
+                    "hits": hits,
+                    "hit_rate": round(hits / attempts, 3) if attempts else 0.0,
+                    "share_of_requirements": round(hits / total, 3) if total else 0.0,
+                    "avg_seconds": round(self.seconds.get(tier, 0.0) / attempts, 4) if attempts else 0.0,
+                })
+            return rows
+
+
+tier_stats = TierStats()
+
+
+# ============================
+#  Rafraîchissement mémoïsé
+# ============================
+
+def refresh_impact(req: Requirement, store, force: bool = False,
+                   config: Optional[InferenceConfig] = None) -> Tuple[RequirementImpact, bool]:
+    """
+    Recalcule l'impact seulement si l'empreinte a changé.
+    Renvoie (impact, recalculé ?).
+    """
+    existing = store.get_impact(req.id)
+    if existing is not None and not force and not stale_reasons(req, existing, config):
+        return existing, False
+
+    impact = infer_impact(req, config)
+    store.save_impact(impact)
+    return impact, True
+
+
+def list_stale_impacts(store, config: Optional[InferenceConfig] = None) -> List[Tuple[str, List[str]]]:
+    """
+    Impacts dont l'empreinte ne correspond plus (texte, prompt, tables de
+    mots-clés ou modèle modifiés), avec la raison : [(requirement_id, reasons)].
+    """
+    stale = []
+    for req in store.list_requirements():
+        impact = store.get_impact(req.id)
+        if impact is None:
+            continue
+        reasons = stale_reasons(req, impact, config)
+        if reasons:
+            stale.append((req.id, reasons))
+    return stale
+
+
+RECOMPUTE_SAVE_BATCH = 20
+
+
+def recompute_stale_impacts(store, progress: Optional[Callable[[int, int, str], None]] = None,
+                            config: Optional[InferenceConfig] = None) -> List[str]:
+    """
+    Job batch : recalcule uniquement les impacts obsolètes. Renvoie les IDs traités.
+    Les appels LLM passent en priorité batch : les clics des autres sessions
+    sont servis avant.
+    """
+    stale_ids = [req_id for req_id, _ in list_stale_impacts(store, config)]
+    pending: List[RequirementImpact] = []
+    with llm_priority(BATCH):
+        for i, req_id in enumerate(stale_ids, start=1):
+            req = store.requirements[req_id]
+            pending.append(infer_impact(req, config))
+            # Enregistrés par lots : une transaction du store par lot, pas par impact
+            if len(pending) >= RECOMPUTE_SAVE_BATCH or i == len(stale_ids):
+                store.save_impacts(pending)
+                pending = []
+            if progress:
+                progress(i, len(stale_ids), req_id)
+    return stale_ids
\ No newline at end of file
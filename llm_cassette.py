@@ -0,0 +1,264 @@
+# llm_cassette.py
+"""
+Record / replay of LLM calls ("cassettes").
+
+Every Ollama call goes through ollama_runtime.generate(), which consults
+the active cassette:
+
+- live   : plain Ollama calls (default);
+- record : calls Ollama and appends each request / response pair, with
+           its timing, to the cassette file;
+- replay : serves responses from the cassette without Ollama, optionally
+           sleeping the recorded duration (scaled) to simulate latency.
+
+A cassette is a JSON-lines file, one interaction per line. Interactions
+are matched on (model, prompt, task options); machine-specific options
+(num_thread) and keep_alive are left out of the match. Identical requests
+recorded several times are replayed in recording order.
+
+Configuration (environment):
+    R67_LLM_MODE            live | record | replay
+    R67_LLM_CASSETTE        cassette file (default cassettes/r67.jsonl)
+    R67_LLM_REPLAY_LATENCY  0 = instant (default), 1 = recorded timing, 0.1 = 10 %…
+
+End-to-end regression run (extraction + impacts of R67 in a fresh store):
+    python llm_cassette.py run --mode record
+    python llm_cassette.py run --mode replay
+    python llm_cassette.py info
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+MODES = ("live", "record", "replay")
+
+CASSETTE_MODE = os.environ.get("R67_LLM_MODE", "live").lower()
+CASSETTE_PATH = os.environ.get("R67_LLM_CASSETTE", os.path.join("cassettes", "r67.jsonl"))
+REPLAY_LATENCY = float(os.environ.get("R67_LLM_REPLAY_LATENCY", "0"))
+
+# Options dépendant de la machine, pas de la réponse attendue
+UNMATCHED_OPTIONS = ("num_thread",)
+
+
+class CassetteMiss(RuntimeError):
+    """Replay mode: no recorded interaction for this request."""
+
+
+def request_key(payload: Dict[str, Any]) -> str:
+    options = {
+        k: v for k, v in (payload.get("options") or {}).items() if k not in UNMATCHED_OPTIONS
+    }
+    canonical = json.dumps(
+        {"model": payload.get("model"), "prompt": payload.get("prompt"), "options": options},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    def __init__(self, path: str, mode: str, latency_scale: float = 0.0) -> None:
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Cassette mode must be 'record' or 'replay', got {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        # clé -> interactions enregistrées, et curseur de rejeu par clé
+        self._interactions: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._cursor: Dict[str, int] = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+        if mode == "replay":
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Cassette not found: {path} (record it first with R67_LLM_MODE=record)")
+            self._load()
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._interactions.values())
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                interaction = json.loads(line)
+                self._interactions[interaction["key"]].append(interaction)
+
+    # --- Record ---
+    def record(self, task: str, payload: Dict[str, Any], status_code: int,
+               body: Any, elapsed: float) -> None:
+        """Appends one interaction (body = Ollama JSON, or error text if status != 200)."""
+        interaction = {
+            "key": request_key(payload),
+            "task": task,
+            "recorded_at": datetime.utcnow().isoformat(),
+            "elapsed_s": round(elapsed, 4),
+            "request": payload,
+            "status": status_code,
+            "response": body,
+        }
+        line = json.dumps(interaction, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._interactions[interaction["key"]].append(interaction)
+            self.recorded += 1
+
+    # --- Replay ---
+    def replay(self, task: str, payload: Dict[str, Any]) -> Tuple[int, Any, float]:
+        """
+        (status, body, recorded elapsed seconds) of the next matching
+        interaction; sleeps the simulated latency before returning.
+        """
+        key = request_key(payload)
+        with self._lock:
+            recorded = self._interactions.get(key)
+            if not recorded:
+                self.misses += 1
+                raise CassetteMiss(
+                    f"No recorded '{task}' call for this request in {self.path} "
+                    f"(model={payload.get('model')}, prompt of {len(payload.get('prompt') or '')} chars)"
+                )
+            i = self._cursor[key]
+            # Au-delà des enregistrements : on rejoue le dernier
+            interaction = recorded[min(i, len(recorded) - 1)]
+            self._cursor[key] = i + 1
+            self.hits += 1
+
+        elapsed = float(interaction.get("elapsed_s") or 0.0)
+        if self.latency_scale > 0 and elapsed > 0:
+            time.sleep(elapsed * self.latency_scale)
+        return interaction["status"], interaction["response"], elapsed
+
+    def summary(self) -> Dict[str, Any]:
+        tasks: Dict[str, int] = defaultdict(int)
+        seconds = 0.0
+        for interactions in self._interactions.values():
+            for it in interactions:
+                tasks[it.get("task", "?")] += 1
+                seconds += float(it.get("elapsed_s") or 0.0)
+        return {
+            "path": self.path,
+            "mode": self.mode,
+            "interactions": len(self),
+            "distinct_requests": len(self._interactions),
+            "by_task": dict(tasks),
+            "recorded_seconds": round(seconds, 2),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# ============================
+#  Cassette active (processus)
+# ============================
+
+_active: Optional[Cassette] = None
+_active_lock = threading.Lock()
+_configured = False
+
+
+def configure(mode: str, path: Optional[str] = None, latency_scale: Optional[float] = None) -> Optional[Cassette]:
+    """Switches the process-wide mode; returns the active cassette (None in live mode)."""
+    global _active, _configured
+    mode = mode.lower()
+    if mode not in MODES:
+        raise ValueError(f"R67_LLM_MODE must be one of {MODES}, got {mode!r}")
+    with _active_lock:
+        _configured = True
+        if mode == "live":
+            _active = None
+        else:
+            _active = Cassette(
+                path or CASSETTE_PATH,
+                mode,
+                REPLAY_LATENCY if latency_scale is None else latency_scale,
+            )
+            print(f"[INFO] LLM {mode} mode, cassette {_active.path} ({len(_active)} interactions)")
+        return _active
+
+
+def active_cassette() -> Optional[Cassette]:
+    """Cassette used by ollama_runtime.generate(); configured from the environment on first use."""
+    if not _configured:
+        configure(CASSETTE_MODE)
+    return _active
+
+
+# ============================
+#  Rejeu de bout en bout
+# ============================
+
+def _run_pipeline() -> Dict[str, Any]:
+    """Extraction + impact of every extracted requirement, in a fresh store."""
+    from data_store import InMemoryStore
+    from impact_engine import infer_impact
+    from nlp_extractor import extract_requirements_from_text
+
+    store = InMemoryStore()
+    t0 = time.perf_counter()
+    reqs = extract_requirements_from_text(store.get_r67(), start_index=1)
+    store.add_requirements(reqs)
+    t1 = time.perf_counter()
+    store.save_impacts([infer_impact(req) for req in store.list_requirements()])
+    t2 = time.perf_counter()
+
+    criticality: Dict[str, int] = defaultdict(int)
+    for impact in store.impacts.values():
+        criticality[impact.criticality] += 1
+    return {
+        "requirements": len(store.requirements),
+        "impacts": len(store.impacts),
+        "criticality": dict(criticality),
+        "extraction_s": round(t1 - t0, 2),
+        "impacts_s": round(t2 - t1, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LLM cassettes: record / replay the extraction + impact pipeline")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="run the pipeline end to end")
+    run.add_argument("--mode", choices=MODES, default="replay")
+    run.add_argument("--cassette", default=CASSETTE_PATH)
+    run.add_argument("--latency", type=float, default=REPLAY_LATENCY,
+                     help="replay latency scale (0 = instant, 1 = recorded timing)")
+
+    info = sub.add_parser("info", help="summary of a cassette")
+    info.add_argument("--cassette", default=CASSETTE_PATH)
+
+    args = parser.parse_args()
+
+    if args.command == "info":
+        print(json.dumps(Cassette(args.cassette, "replay").summary(), indent=2))
+    else:
+        if args.mode == "record" and os.path.exists(args.cassette):
+            print(f"[INFO] Appending to existing cassette {args.cassette}")
+        # ollama_runtime importe le module "llm_cassette", pas ce __main__
+        import llm_cassette
+
+        cassette = llm_cassette.configure(args.mode, args.cassette, args.latency)
+        result = _run_pipeline()
+        if cassette is not None:
+            result["cassette"] = cassette.summary()
+        print(json.dumps(result, indent=2))
+        if cassette is not None and cassette.misses:
+            print(f"[ERREUR] {cassette.misses} requête(s) absente(s) de la cassette : rejeu incomplet")
+            raise SystemExit(1)
@@ -0,0 +1,257 @@
+# llm_governor.py
+"""
+Process-wide scheduler in front of the local Ollama instance.
+
+Every LLM call (ollama_runtime.generate) goes through the governor:
+
+- max in-flight : at most R67_OLLAMA_MAX_IN_FLIGHT upstream calls at once
+                  (defaults to OLLAMA_NUM_PARALLEL, else 1); the others
+                  wait here instead of piling up in Ollama and timing out;
+- priorities    : "interactive" calls (a user waiting on a button) are
+                  dispatched before "batch" calls (recompute jobs);
+- fairness      : within a priority class, the session served least
+                  recently goes first, so one session's batch cannot starve
+                  the others;
+- single-flight : a call identical to one already queued or running
+                  (same model, prompt and task options) does not reach
+                  Ollama: it waits for that call and shares its result or
+                  its error. A batch call joined by an interactive one is
+                  promoted to interactive.
+
+Priority and session are taken from the calling context:
+
+    with llm_priority(BATCH):
+        ...                         # every generate() in here is batch
+
+    set_session(session_id)         # once per Streamlit script run
+
+Simulation (fake upstream, no Ollama needed):
+    python llm_governor.py --sessions 6 --duration 10 --max-in-flight 1
+"""
+import argparse
+import contextvars
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = {INTERACTIVE: 0, BATCH: 1}
+
+DEFAULT_SESSION = "process"
+
+# Ollama ne traite que OLLAMA_NUM_PARALLEL requêtes à la fois par modèle :
+# au-delà, elles attendent chez lui sans priorité ni partage.
+MAX_IN_FLIGHT = int(
+    os.environ.get("R67_OLLAMA_MAX_IN_FLIGHT") or os.environ.get("OLLAMA_NUM_PARALLEL") or "1"
+)
+
+_priority: contextvars.ContextVar = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+_session: contextvars.ContextVar = contextvars.ContextVar("llm_session", default=DEFAULT_SESSION)
+
+
+@contextmanager
+def llm_priority(priority: str) -> Iterator[None]:
+    """Priority class of the LLM calls made in this block (and this thread)."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"LLM priority must be one of {tuple(PRIORITIES)}, got {priority!r}")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def set_session(session_id: str) -> None:
+    """Session charged for the LLM calls of the current thread (fair queuing)."""
+    _session.set(session_id or DEFAULT_SESSION)
+
+
+@dataclass
+class _Flight:
+    key: str
+    priority: int
+    session: str
+    seq: int
+    enqueued: float
+    waiters: int = 1
+    granted: threading.Event = field(default_factory=threading.Event)
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Any = None
+    error: Optional[BaseException] = None
+
+
+class LlmGovernor:
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT) -> None:
+        self.max_in_flight = max(1, max_in_flight)
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}      # clé -> appel en attente ou en cours
+        self._waiting: List[_Flight] = []
+        self._running = 0
+        self._seq = 0
+        # session -> numéro du dernier appel servi (file équitable)
+        self._served: Dict[str, int] = {}
+        self._dispatched = 0
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self.wait_seconds: Dict[str, float] = {p: 0.0 for p in PRIORITIES}
+        self.dispatched_by_priority: Dict[str, int] = {p: 0 for p in PRIORITIES}
+
+    # --- Appel ---
+    def call(self, key: str, fn: Callable[[], Any], priority: Optional[str] = None,
+             session: Optional[str] = None) -> Any:
+        """
+        Runs fn() when a slot is free and returns its result, or the
+        result of the identical call (same key) already in flight. The
+        result is shared between coalesced callers: treat it as read-only.
+        """
+        rank = PRIORITIES[priority or _priority.get()]
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                flight.priority = min(flight.priority, rank)
+                self.coalesced += 1
+                leader = False
+            else:
+                self._seq += 1
+                flight = _Flight(key, rank, session or _session.get(), self._seq, time.perf_counter())
+                self._flights[key] = flight
+                self._waiting.append(flight)
+                leader = True
+                self._dispatch()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        flight.granted.wait()
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+                del self._flights[key]
+                self._dispatch()
+            flight.done.set()
+        return flight.result
+
+    def _dispatch(self) -> None:
+        """Grants free slots (lock held): priority, then least recently served session, then arrival."""
+        while self._waiting and self._running < self.max_in_flight:
+            nxt = min(self._waiting, key=lambda f: (f.priority, self._served.get(f.session, 0), f.seq))
+            self._waiting.remove(nxt)
+            self._dispatched += 1
+            self._served[nxt.session] = self._dispatched
+            self._running += 1
+            self.upstream_calls += 1
+            name = _priority_name(nxt.priority)
+            self.wait_seconds[name] += time.perf_counter() - nxt.enqueued
+            self.dispatched_by_priority[name] += 1
+            nxt.granted.set()
+        if not self._waiting and not self._running:
+            # Au repos : plus rien à départager
+            self._served.clear()
+
+    # --- État ---
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            waiting = {p: 0 for p in PRIORITIES}
+            for f in self._waiting:
+                waiting[_priority_name(f.priority)] += 1
+            return {
+                "max_in_flight": self.max_in_flight,
+                "running": self._running,
+                "waiting": waiting,
+                "sessions_waiting": len({f.session for f in self._waiting}),
+                "upstream_calls": self.upstream_calls,
+                "coalesced": self.coalesced,
+                "avg_wait_s": {
+                    p: round(self.wait_seconds[p] / n, 3) if n else 0.0
+                    for p, n in self.dispatched_by_priority.items()
+                },
+            }
+
+
+def _priority_name(rank: int) -> str:
+    return next(name for name, r in PRIORITIES.items() if r == rank)
+
+
+governor = LlmGovernor()
+
+
+# ============================
+#  Simulation
+# ============================
+
+def _simulate(args: argparse.Namespace) -> Dict[str, Any]:
+    """Sessions clicking (interactive) + one batch job per session, against a fake Ollama."""
+    gov = LlmGovernor(args.max_in_flight)
+    rng = random.Random(0)
+    prompts = [f"impact prompt {i}" for i in range(args.distinct_prompts)]
+    waits: Dict[str, List[float]] = {INTERACTIVE: [], BATCH: []}
+    waits_lock = threading.Lock()
+    stop = threading.Event()
+
+    def upstream() -> Dict[str, Any]:
+        time.sleep(args.call_seconds)
+        return {"response": "{}"}
+
+    def worker(session: str, priority: str, pause: float, seed: int) -> None:
+        local = random.Random(seed)
+        set_session(session)
+        with llm_priority(priority):
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                gov.call(local.choice(prompts), upstream)
+                with waits_lock:
+                    waits[priority].append(time.perf_counter() - t0)
+                time.sleep(local.uniform(0, pause))
+
+    threads = []
+    for s in range(args.sessions):
+        threads.append(threading.Thread(target=worker, args=(f"s{s}", INTERACTIVE, args.think, rng.random()), daemon=True))
+        if s < args.batch_sessions:
+            threads.append(threading.Thread(target=worker, args=(f"s{s}", BATCH, 0.0, rng.random()), daemon=True))
+    for t in threads:
+        t.start()
+    time.sleep(args.duration)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    requests_made = sum(len(v) for v in waits.values())
+    result = gov.status()
+    result["requests"] = requests_made
+    for priority, values in waits.items():
+        values.sort()
+        if values:
+            result[f"{priority}_latency_s"] = {
+                "n": len(values),
+                "p50": round(values[len(values) // 2], 3),
+                "p99": round(values[min(len(values) - 1, int(len(values) * 0.99))], 3),
+            }
+    return result
+
+
+if __name__ == "__main__":
+    import json
+
+    parser = argparse.ArgumentParser(description="Simulate concurrent sessions behind the LLM governor")
+    parser.add_argument("--sessions", type=int, default=6)
+    parser.add_argument("--batch-sessions", type=int, default=2, help="sessions also running a batch job")
+    parser.add_argument("--max-in-flight", type=int, default=1)
+    parser.add_argument("--call-seconds", type=float, default=0.05, help="fake upstream call duration")
+    parser.add_argument("--think", type=float, default=0.5, help="max pause between interactive clicks")
+    parser.add_argument("--distinct-prompts", type=int, default=40)
+    parser.add_argument("--duration", type=float, default=10.0)
+    print(json.dumps(_simulate(parser.parse_args()), indent=2))
@@ -0,0 +1,205 @@
+# load_test_api.py
+"""
+Load test for the read-only API (api_server.py).
+
+Fires requests at a fixed target rate from a pool of worker threads (one
+keep-alive connection each) and reports throughput and p50 / p90 / p99
+latency.
+
+Against a running server:
+    python load_test_api.py --url http://127.0.0.1:8765 --rps 300 --duration 20
+
+Self-contained (starts an in-process server over a synthetic store):
+    python load_test_api.py --self-host --seed 5000 --rps 300
+"""
+import argparse
+import http.client
+import random
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from models import Requirement, RequirementImpact
+
+# Mix of typical PLM connector queries.
+DEFAULT_PATHS = [
+    "/requirements?limit=50",
+    "/requirements?q=valve&limit=20",
+    "/impacts?component=LPG_TANK",
+    "/impacts?test=TEST_LEAK&limit=50",
+    "/history?limit=100",
+    "/compliance?market=eu&status=NOK",
+    "/compliance?limit=10",
+]
+
+
+def _seed_store(store, n: int) -> None:
+    """Fills a store with n synthetic requirements + impacts."""
+    components = ["LPG_TANK", "LPG_VALVE", "LPG_MULTIVALVE", "LPG_PIPE", "LPG_PRESSURE_REGULATOR"]
+    tests = ["TEST_PRESSURE", "TEST_LEAK", "TEST_FIRE", "TEST_THERMAL", "TEST_DURABILITY"]
+    base = datetime(2024, 1, 1)
+    rng = random.Random(0)
+
+    reqs = [
+        Requirement(
+            id=f"R67-{i}",
+            regulation_id="UNECE-R67",
+            country="UNECE",
+            version="1.0",
+            text_raw=f"The {rng.choice(['tank', 'valve', 'pipe'])} shall withstand test {i}.",
+            text_engineering=f"The LPG system shall satisfy requirement {i}.",
+            created_at=base + timedelta(seconds=i),
+            compliance_eu=rng.choice([None, "OK", "NOK", "NA"]),
+        )
+        for i in range(1, n + 1)
+    ]
+    store.add_requirements(reqs)
+    store.save_impacts([
+        RequirementImpact(
+            requirement_id=r.id,
+            components=rng.sample(components, 2),
+            tests=rng.sample(tests, 2),
+            documents=["DOC_CONFORMITY_REPORT"],
+            criticality=rng.choice(["HIGH", "MEDIUM", "LOW"]),
+            validation_actions=[],
+        )
+        for r in reqs
+    ])
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+
+class _Worker(threading.Thread):
+    def __init__(self, host: str, port: int, paths: List[str], interval: float,
+                 deadline: float, revalidate: bool) -> None:
+        super().__init__(daemon=True)
+        self.host = host
+        self.port = port
+        self.paths = paths
+        self.interval = interval
+        self.deadline = deadline
+        self.revalidate = revalidate
+        self.latencies: List[float] = []
+        self.statuses: List[int] = []
+        self.errors = 0
+        self._etags = {}
+
+    def _connect(self) -> http.client.HTTPConnection:
+        return http.client.HTTPConnection(self.host, self.port, timeout=10)
+
+    def run(self) -> None:
+        conn = self._connect()
+        rng = random.Random(id(self))
+        next_at = time.perf_counter() + rng.random() * self.interval
+
+        while True:
+            now = time.perf_counter()
+            if now >= self.deadline:
+                break
+            if next_at > now:
+                time.sleep(next_at - now)
+            next_at += self.interval
+
+            path = rng.choice(self.paths)
+            headers = {"Accept-Encoding": "gzip"}
+            if self.revalidate and path in self._etags:
+                headers["If-None-Match"] = self._etags[path]
+
+            start = time.perf_counter()
+            try:
+                conn.request("GET", path, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+            except (OSError, http.client.HTTPException):
+                self.errors += 1
+                conn.close()
+                conn = self._connect()
+                continue
+            self.latencies.append(time.perf_counter() - start)
+            self.statuses.append(resp.status)
+            etag = resp.getheader("ETag")
+            if etag:
+                self._etags[path] = etag
+
+        conn.close()
+
+
+def run_load_test(url: str, rps: float, duration: float, workers: int,
+                  revalidate: bool = True, paths: Optional[List[str]] = None) -> Tuple[dict, List[float]]:
+    parts = urlsplit(url)
+    host = parts.hostname or "127.0.0.1"
+    port = parts.port or 80
+    paths = paths or DEFAULT_PATHS
+
+    interval = workers / rps
+    deadline = time.perf_counter() + duration
+    pool = [_Worker(host, port, paths, interval, deadline, revalidate) for _ in range(workers)]
+
+    t0 = time.perf_counter()
+    for w in pool:
+        w.start()
+    for w in pool:
+        w.join()
+    elapsed = time.perf_counter() - t0
+
+    latencies = sorted(l for w in pool for l in w.latencies)
+    statuses = [s for w in pool for s in w.statuses]
+    report = {
+        "requests": len(latencies),
+        "errors": sum(w.errors for w in pool),
+        "achieved_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "not_modified": sum(1 for s in statuses if s == 304),
+        "non_2xx_3xx": sum(1 for s in statuses if s >= 400),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "p90_ms": round(_percentile(latencies, 90) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+    }
+    return report, latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test for the R67 read-only API")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--rps", type=float, default=300.0, help="target request rate")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds")
+    parser.add_argument("--workers", type=int, default=32, help="concurrent connections")
+    parser.add_argument("--no-revalidate", action="store_true",
+                        help="never send If-None-Match (measure full responses only)")
+    parser.add_argument("--self-host", action="store_true",
+                        help="start an in-process server over a synthetic store")
+    parser.add_argument("--seed", type=int, default=2000,
+                        help="synthetic requirements for --self-host")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if args.self_host:
+        from api_server import make_server
+        from data_store import InMemoryStore
+
+        local_store = InMemoryStore()
+        _seed_store(local_store, args.seed)
+        server = make_server(local_store, "127.0.0.1", 0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        print(f"[INFO] In-process API with {args.seed} requirements on {url}")
+
+    print(f"[INFO] {args.rps:.0f} req/s for {args.duration:.0f}s with {args.workers} connections…")
+    report, _ = run_load_test(url, args.rps, args.duration, args.workers,
+                              revalidate=not args.no_revalidate)
+
+    for key, value in report.items():
+        print(f"{key:>14}: {value}")
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
@@ -39,11 +39,22 @@ class RequirementImpact:
     criticality: str
     validation_actions: List[str]
 
+    # Hash of everything the result depends on (requirement text, prompt,
+    # keyword tables, model) — see impact_engine.impact_fingerprint()
+    fingerprint: str = ""
+
+    # Which inference tier produced it: "rules", "llm:<model>", "rules-fallback", "keywords"
+    tier: str = ""
+
+    # Tiered mode: confidence of the rules tier, compared with the current
+    # threshold to tell whether a threshold change flips the tier (None otherwise)
+    rules_confidence: Optional[float] = None
+
 
 @dataclass
 class RequirementHistoryItem:
     timestamp: datetime
     requirement_id: str
     version: str
-    change_type: str    # "created", "updated"
+    change_type: str    # "created", "revised" (new wording), "updated" (compliance), "impact", "imported"
     diff_summary: str
\ No newline at end of file
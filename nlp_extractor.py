@@ -1,38 +1,19 @@
 import json
-import requests
 from typing import List
 from datetime import datetime
 from models import Requirement, Regulation
-
-OLLAMA_URL = "http://localhost:11434/api/generate"
-MODEL_NAME = "mistral"
+from ollama_runtime import generate, prompt_budget
+from text_normalizer import estimate_tokens, normalize_regulation, split_for_prompt
 
 
 def call_ollama(prompt: str) -> str:
-    """Envoi d’un prompt à Ollama (Mistral) via HTTP."""
-    payload = {
-        "model": MODEL_NAME,
-        "prompt": prompt,
-        "stream": False,
-    }
-    response = requests.post(OLLAMA_URL, json=payload)
-
-    if response.status_code != 200:
-        raise RuntimeError(f"Ollama error: {response.text}")
-
-    data = response.json()
+    """Envoi d’un prompt à Ollama (Mistral) via HTTP, avec les options de la tâche d’extraction."""
+    data = generate(prompt, task="extraction")
     return data.get("response", "")
 
 
-def extract_requirements_from_text(regulation: Regulation, start_index: int = 1) -> List[Requirement]:
-    """Extraction d’exigences orientées ingénierie système depuis UNECE R67."""
-
-    text = regulation.text
-    reg_id = regulation.id
-    country = regulation.country
-
-    # --- PROMPT INGÉNIERIE SYSTÈME ---
-    prompt = f"""
+# --- PROMPT INGÉNIERIE SYSTÈME ---
+PROMPT_TEMPLATE = """
 You are an automotive systems engineer working on regulatory compliance (UNECE R67).
 
 Extract ONLY technical, atomic, verifiable engineering requirements from the regulation text below.
@@ -42,6 +23,7 @@ SOURCE TEXT:
 
 INSTRUCTIONS:
 - Identify only real obligations, not definitions or context.
+- Lines like "[Annex 2B: form omitted]" stand for administrative forms; ignore them.
 - Each requirement must be:
     * Atomic (one obligation per item)
     * Testable (measurable acceptance criteria)
@@ -65,37 +47,65 @@ OUTPUT FORMAT — STRICT JSON ONLY:
 Return ONLY valid JSON with a list of objects.
 """
 
-    print("[INFO] Envoi du texte à Mistral via Ollama…")
-    raw = call_ollama(prompt)
-
-    # --- PARSING JSON ---
-    try:
-        data = json.loads(raw)
-    except Exception:
-        print("[ERREUR] JSON invalide renvoyé par Ollama :")
-        print(raw)
-        return []
-
-    # --- CONVERT JSON → LISTE DE REQUIREMENT ---
-    requirements = []
-
-    for idx, item in enumerate(data, start=start_index):
-
-        # Gestion automatique de l’ID si manquant
-        rid = item.get("id")
-        if not rid or len(rid.strip()) == 0:
-            rid = f"{reg_id}-{idx}"
-
-        requirements.append(
-            Requirement(
-                id=rid,
-                regulation_id=reg_id,
-                country=country,
-                version="1.0",
-                text_raw=item.get("text_raw", "").strip(),
-                text_engineering=item.get("text_engineering", "").strip(),
-                created_at=datetime.utcnow(),
+
+def extract_requirements_from_text(regulation: Regulation, start_index: int = 1) -> List[Requirement]:
+    """
+    Extraction d’exigences orientées ingénierie système depuis UNECE R67.
+
+    Le texte est envoyé par morceaux (sections / paragraphes) qui tiennent
+    dans la fenêtre de contexte avec la sortie ; la numérotation continue
+    d'un morceau à l'autre.
+    """
+
+    # Texte normalisé : sans en-têtes de page, mots recollés, formulaires omis
+    text = normalize_regulation(regulation).prompt.text
+    reg_id = regulation.id
+    country = regulation.country
+
+    overhead = estimate_tokens(PROMPT_TEMPLATE.format(text="", reg_id=reg_id, start_index=start_index))
+    chunks = split_for_prompt(text, prompt_budget("extraction") - overhead)
+
+    requirements: List[Requirement] = []
+    seen_ids = set()
+    next_index = start_index
+
+    for n, chunk in enumerate(chunks, start=1):
+        prompt = PROMPT_TEMPLATE.format(text=chunk, reg_id=reg_id, start_index=next_index)
+
+        print(f"[INFO] Envoi du texte à Mistral via Ollama (partie {n}/{len(chunks)})…")
+        raw = call_ollama(prompt)
+
+        # --- PARSING JSON ---
+        try:
+            data = json.loads(raw)
+        except Exception:
+            print(f"[ERREUR] JSON invalide renvoyé par Ollama (partie {n}/{len(chunks)}) :")
+            print(raw)
+            continue
+
+        # --- CONVERT JSON → LISTE DE REQUIREMENT ---
+        for item in data:
+
+            # Gestion automatique de l’ID si manquant (ou déjà pris par un autre morceau)
+            rid = (item.get("id") or "").strip()
+            if not rid or rid in seen_ids:
+                rid = f"{reg_id}-{next_index}"
+                while rid in seen_ids:
+                    next_index += 1
+                    rid = f"{reg_id}-{next_index}"
+            seen_ids.add(rid)
+            next_index += 1
+
+            requirements.append(
+                Requirement(
+                    id=rid,
+                    regulation_id=reg_id,
+                    country=country,
+                    version="1.0",
+                    text_raw=item.get("text_raw", "").strip(),
+                    text_engineering=item.get("text_engineering", "").strip(),
+                    created_at=datetime.utcnow(),
+                )
             )
-        )
 
-    return requirements
\ No newline at end of file
+    return requirements
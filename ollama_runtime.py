@@ -0,0 +1,281 @@
+# ollama_runtime.py
+"""
+Gestion du runtime Ollama / Mistral partagé par l'extraction et l'analyse d'impact.
+
+- keep_alive envoyé à chaque appel : le modèle reste chargé entre deux clics
+- options par tâche (num_thread, num_predict, temperature) ; num_ctx unique
+  pour toutes les tâches, sinon Ollama recharge le modèle à chaque changement
+- warm-up en arrière-plan au démarrage de l'app
+- mesure des temps de chargement / génération renvoyés par Ollama
+- enregistrement / rejeu des appels (cassettes, voir llm_cassette.py)
+- file d'attente globale : limite d'appels simultanés, priorités, partage
+  des appels identiques en cours (voir llm_governor.py)
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+import requests
+
+from llm_cassette import active_cassette, request_key
+from llm_governor import governor
+from text_normalizer import estimate_tokens
+
+
+# ==========================
+#  Config Ollama / Mistral
+# ==========================
+OLLAMA_BASE_URL = os.environ.get("OLLAMA_HOST", "http://localhost:11434").rstrip("/")
+OLLAMA_URL = f"{OLLAMA_BASE_URL}/api/generate"
+MODEL_NAME = os.environ.get("R67_OLLAMA_MODEL", "mistral")  # ou "mistral:7b" selon ce que tu as pull
+
+# Durée pendant laquelle Ollama garde le modèle en mémoire après un appel
+# ("30m", "2h", "-1" = indéfiniment, "0" = déchargement immédiat).
+# Ollama refuse "-1" / "0" en chaîne : une valeur numérique est envoyée en
+# entier (secondes), une durée ("30m", "-1h") telle quelle.
+def _keep_alive(value: str) -> Any:
+    value = value.strip()
+    return int(value) if value.lstrip("-").isdigit() else value
+
+
+KEEP_ALIVE = _keep_alive(os.environ.get("R67_OLLAMA_KEEP_ALIVE", "30m"))
+
+# Fenêtre de contexte maximale supportée par le modèle (Mistral 7B : 32k).
+MAX_NUM_CTX = int(os.environ.get("R67_OLLAMA_MAX_CTX", "32768"))
+
+# num_ctx commun à toutes les tâches (et au warm-up) : Ollama recharge le
+# modèle dès que num_ctx change, un num_ctx par tâche rechargerait le modèle
+# à chaque alternance extraction / impact. L'extraction découpe le texte
+# pour tenir dans cette fenêtre (voir prompt_budget).
+# Compromis : le cache KV est alloué pour num_ctx entier (Mistral 7B fp16 :
+# ~128 Ko / token, ~4 Go à 32k, ~1 Go à 8k) et le chargement est plus long,
+# alors qu'un prompt d'impact tient en quelques centaines de tokens. Sur une
+# machine juste en mémoire, baisser R67_OLLAMA_NUM_CTX : l'extraction fait
+# alors plus de morceaux, le modèle n'est toujours chargé qu'une fois.
+NUM_CTX = min(int(os.environ.get("R67_OLLAMA_NUM_CTX", "0")) or MAX_NUM_CTX, MAX_NUM_CTX)
+
+NUM_THREAD = int(os.environ.get("R67_OLLAMA_NUM_THREAD", "0")) or max(1, (os.cpu_count() or 2) // 2)
+
+TASK_OPTIONS: Dict[str, Dict[str, Any]] = {
+    # Longue entrée (texte réglementaire, découpé) et longue sortie JSON.
+    "extraction": {
+        "num_ctx": NUM_CTX,
+        "num_predict": min(8192, NUM_CTX // 2),  # la moitié au moins reste au texte
+        "temperature": 0.1,
+        "num_thread": NUM_THREAD,
+    },
+    # Une exigence en entrée, un petit objet JSON en sortie.
+    "impact": {
+        "num_ctx": NUM_CTX,
+        "num_predict": 1024,
+        "temperature": 0.2,
+        "num_thread": NUM_THREAD,
+    },
+}
+
+# Tâche utilisée pour le warm-up (même num_ctx que les autres tâches)
+WARMUP_TASK = "impact"
+
+
+class OllamaError(RuntimeError):
+    pass
+
+
+@dataclass
+class TaskStats:
+    calls: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+    last_seconds: float = 0.0
+    last_load_seconds: float = 0.0
+    last_prompt_tokens: int = 0
+    last_eval_tokens: int = 0
+
+
+@dataclass
+class RuntimeStatus:
+    warmup_state: str = "not started"   # not started / loading / ready / failed
+    warmup_seconds: Optional[float] = None
+    warmup_error: str = ""
+    tasks: Dict[str, TaskStats] = field(default_factory=dict)
+
+
+status = RuntimeStatus()
+_status_lock = threading.Lock()
+_warmup_started = False
+
+
+# =====================
+#  Petites fonctions
+# =====================
+
+def _ns_to_s(value: Any) -> float:
+    return (value or 0) / 1e9
+
+
+def prompt_budget(task: str) -> int:
+    """Tokens (estimate_tokens) disponibles pour le prompt d'une tâche, sortie réservée."""
+    options = TASK_OPTIONS[task]
+    return options["num_ctx"] - options["num_predict"]
+
+
+def options_for(task: str, prompt: str = "") -> Dict[str, Any]:
+    """
+    Options Ollama pour une tâche. Lève OllamaError si le prompt ne tient
+    pas dans num_ctx : Ollama le tronquerait sans rien dire.
+    """
+    options = dict(TASK_OPTIONS[task])
+    needed = estimate_tokens(prompt) if prompt else 0
+    if needed > prompt_budget(task):
+        raise OllamaError(
+            f"Prompt ({needed} tokens estimés) + num_predict={options['num_predict']} "
+            f"> num_ctx={options['num_ctx']} pour la tâche '{task}' : découper l'entrée."
+        )
+    return options
+
+
+def build_payload(task: str, prompt: str, model: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "model": model or MODEL_NAME,
+        "prompt": prompt,
+        "stream": False,
+        "keep_alive": KEEP_ALIVE,
+        "options": options_for(task, prompt),
+    }
+
+
+def _record(task: str, seconds: float, data: Optional[Dict[str, Any]]) -> None:
+    with _status_lock:
+        stats = status.tasks.setdefault(task, TaskStats())
+        stats.calls += 1
+        if data is None:
+            stats.errors += 1
+            return
+        stats.total_seconds += seconds
+        stats.last_seconds = seconds
+        stats.last_load_seconds = _ns_to_s(data.get("load_duration"))
+        stats.last_prompt_tokens = data.get("prompt_eval_count") or 0
+        stats.last_eval_tokens = data.get("eval_count") or 0
+
+
+# ============================
+#  Appel Ollama
+# ============================
+
+def generate(prompt: str, task: str, timeout: Optional[float] = None,
+             model: Optional[str] = None, priority: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Appelle /api/generate avec les options de la tâche et renvoie le JSON
+    complet d'Ollama (champ "response" + métriques de durée).
+    Lève OllamaError si Ollama répond autre chose que 200.
+
+    L'appel passe par la file globale (llm_governor) : `timeout` ne compte
+    que l'appel HTTP, pas l'attente d'un créneau. priority = "interactive"
+    (défaut) ou "batch" ; sinon celle du contexte (llm_priority). Un appel
+    identique déjà en cours est partagé : le dict renvoyé est en lecture seule.
+
+    En mode replay la réponse vient de la cassette (CassetteMiss si la
+    requête n'a pas été enregistrée) ; en mode record elle y est ajoutée.
+    """
+    payload = build_payload(task, prompt, model)
+    return governor.call(
+        request_key(payload),
+        lambda: _generate(task, payload, timeout),
+        priority=priority,
+    )
+
+
+def _generate(task: str, payload: Dict[str, Any], timeout: Optional[float]) -> Dict[str, Any]:
+    cassette = active_cassette()
+    start = time.perf_counter()
+
+    if cassette is not None and cassette.replaying:
+        try:
+            status_code, body, _ = cassette.replay(task, payload)
+        except Exception:
+            _record(task, time.perf_counter() - start, None)
+            raise
+        if status_code != 200:
+            _record(task, time.perf_counter() - start, None)
+            raise OllamaError(f"Ollama error ({status_code}): {body}")
+        _record(task, time.perf_counter() - start, body)
+        return body
+
+    try:
+        resp = requests.post(OLLAMA_URL, json=payload, timeout=timeout)
+    except Exception:
+        _record(task, time.perf_counter() - start, None)
+        raise
+
+    elapsed = time.perf_counter() - start
+    if resp.status_code != 200:
+        _record(task, elapsed, None)
+        if cassette is not None:
+            cassette.record(task, payload, resp.status_code, resp.text, elapsed)
+        raise OllamaError(f"Ollama error ({resp.status_code}): {resp.text}")
+
+    data = resp.json()
+    _record(task, elapsed, data)
+    if cassette is not None:
+        cassette.record(task, payload, resp.status_code, data, elapsed)
+    return data
+
+
+# ============================
+#  Warm-up
+# ============================
+
+def warm_up(task: str = WARMUP_TASK, model: Optional[str] = None, timeout: float = 300) -> None:
+    """
+    Charge le modèle sans rien générer (prompt vide) et le garde
+    en mémoire pour KEEP_ALIVE.
+    """
+    payload = {
+        "model": model or MODEL_NAME,
+        "prompt": "",
+        "stream": False,
+        "keep_alive": KEEP_ALIVE,
+        "options": options_for(task),
+    }
+    cassette = active_cassette()
+    if cassette is not None and cassette.replaying:
+        # Pas d'Ollama en rejeu : rien à charger
+        with _status_lock:
+            status.warmup_state = "ready"
+            status.warmup_seconds = 0.0
+        return
+
+    with _status_lock:
+        status.warmup_state = "loading"
+
+    start = time.perf_counter()
+    try:
+        resp = requests.post(OLLAMA_URL, json=payload, timeout=timeout)
+        if resp.status_code != 200:
+            raise OllamaError(f"Ollama error ({resp.status_code}): {resp.text}")
+        data = resp.json()
+    except Exception as e:
+        print("[Ollama] Warm-up impossible :", e)
+        with _status_lock:
+            status.warmup_state = "failed"
+            status.warmup_error = str(e)
+        return
+
+    elapsed = time.perf_counter() - start
+    load = _ns_to_s(data.get("load_duration")) or elapsed
+    with _status_lock:
+        status.warmup_state = "ready"
+        status.warmup_seconds = load
+    print(f"[INFO] Modèle {payload['model']} chargé en {load:.1f}s (keep_alive={KEEP_ALIVE})")
+
+
+def start_warm_up(task: str = WARMUP_TASK, model: Optional[str] = None) -> None:
+    """Lance warm_up() dans un thread, une seule fois par processus."""
+    global _warmup_started
+    with _status_lock:
+        if _warmup_started:
+            return
+        _warmup_started = True
+    threading.Thread(target=warm_up, args=(task, model), name="ollama-warmup", daemon=True).start()
@@ -0,0 +1,155 @@
+# persistent_map.py
+"""
+Immutable hash map sharing structure between versions.
+
+Used by the store's copy-on-write views (data_store.py), the graph index
+and the revision store: a write transaction must not copy the whole
+requirement / impact dict, and a published view must never change.
+
+Layout: a two-level trie of WIDTH x WIDTH leaf dicts, indexed by the key's
+hash. A new version copies only the path it touches (root tuple, one node
+tuple, one leaf dict), so a single-item write costs O(WIDTH + N / WIDTH²)
+instead of O(N), and every untouched leaf is shared with older versions.
+
+Batch edits go through a MapDraft (mutable): each node / leaf is copied
+once per draft, then edited in place; freeze() returns the new version.
+Iteration order is the hash order, not insertion order.
+"""
+from collections.abc import ItemsView, Mapping, MutableMapping, ValuesView
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+BITS = 5
+WIDTH = 1 << BITS
+_MASK = WIDTH - 1
+
+# Jamais modifiés : un brouillon copie une feuille / un nœud avant d'y écrire
+_EMPTY_LEAF: Dict[Any, Any] = {}
+_EMPTY_NODE: Tuple[Dict[Any, Any], ...] = (_EMPTY_LEAF,) * WIDTH
+_EMPTY_ROOT: Tuple[Tuple[Dict[Any, Any], ...], ...] = (_EMPTY_NODE,) * WIDTH
+
+
+def _slots(key: Any) -> Tuple[int, int]:
+    h = hash(key)
+    return h & _MASK, (h >> BITS) & _MASK
+
+
+def _leaves(root) -> List[Dict[Any, Any]]:
+    return [leaf for node in root if node is not _EMPTY_NODE for leaf in node if leaf]
+
+
+# chain.from_iterable : l'itération élément par élément reste en C
+class _Values(ValuesView):
+    def __iter__(self) -> Iterator[Any]:
+        return chain.from_iterable([leaf.values() for leaf in _leaves(self._mapping._root)])
+
+
+class _Items(ItemsView):
+    def __iter__(self) -> Iterator[Tuple[Any, Any]]:
+        return chain.from_iterable([leaf.items() for leaf in _leaves(self._mapping._root)])
+
+
+class _TrieReads:
+    """Lookups shared by PersistentMap and MapDraft (both expose _root / _len)."""
+
+    # _slots() déroulé : ces lectures sont sur le chemin de chaque requête
+    def __getitem__(self, key: Any) -> Any:
+        h = hash(key)
+        return self._root[h & _MASK][(h >> BITS) & _MASK][key]
+
+    def __contains__(self, key: Any) -> bool:
+        h = hash(key)
+        return key in self._root[h & _MASK][(h >> BITS) & _MASK]
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        h = hash(key)
+        return self._root[h & _MASK][(h >> BITS) & _MASK].get(key, default)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[Any]:
+        return chain.from_iterable(_leaves(self._root))
+
+    def values(self) -> ValuesView:
+        return _Values(self)
+
+    def items(self) -> ItemsView:
+        return _Items(self)
+
+
+class PersistentMap(_TrieReads, Mapping):
+    __slots__ = ("_root", "_len")
+
+    def __init__(self, root=_EMPTY_ROOT, length: int = 0) -> None:
+        self._root = root
+        self._len = length
+
+    @classmethod
+    def from_items(cls, items: Iterable[Tuple[Any, Any]]) -> "PersistentMap":
+        draft = cls().draft()
+        for key, value in items:
+            draft[key] = value
+        return draft.freeze()
+
+    def draft(self) -> "MapDraft":
+        return MapDraft(self)
+
+    # Écritures unitaires (un brouillon d'une opération)
+    def set(self, key: Any, value: Any) -> "PersistentMap":
+        draft = self.draft()
+        draft[key] = value
+        return draft.freeze()
+
+    def discard(self, key: Any) -> "PersistentMap":
+        if key not in self:
+            return self
+        draft = self.draft()
+        del draft[key]
+        return draft.freeze()
+
+    def __repr__(self) -> str:
+        return f"PersistentMap({dict(self.items())!r})"
+
+
+class MapDraft(_TrieReads, MutableMapping):
+    """Mutable working copy of a PersistentMap; the base version is never modified."""
+
+    def __init__(self, base: PersistentMap) -> None:
+        self._root: Optional[List[Any]] = list(base._root)
+        self._len = base._len
+        self._own_nodes: Set[int] = set()
+        self._own_leaves: Set[Tuple[int, int]] = set()
+
+    def _leaf_for_write(self, i: int, j: int) -> Dict[Any, Any]:
+        if self._root is None:
+            raise RuntimeError("MapDraft already frozen")
+        if i not in self._own_nodes:
+            self._root[i] = list(self._root[i])
+            self._own_nodes.add(i)
+        node = self._root[i]
+        if (i, j) not in self._own_leaves:
+            node[j] = dict(node[j])
+            self._own_leaves.add((i, j))
+        return node[j]
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        leaf = self._leaf_for_write(*_slots(key))
+        if key not in leaf:
+            self._len += 1
+        leaf[key] = value
+
+    def __delitem__(self, key: Any) -> None:
+        i, j = _slots(key)
+        if key not in self._root[i][j]:
+            raise KeyError(key)
+        del self._leaf_for_write(i, j)[key]
+        self._len -= 1
+
+    def freeze(self) -> PersistentMap:
+        """New immutable version; the draft cannot be edited afterwards."""
+        root = self._root
+        for i in self._own_nodes:
+            root[i] = tuple(root[i])
+        self._root = None
+        return PersistentMap(tuple(root), self._len)
@@ -0,0 +1,305 @@
+# revision_store.py
+"""
+Delta-encoded revisions of requirement wordings.
+
+Only the current Requirement keeps full texts. Each older revision stores
+a reverse delta that rebuilds its text_raw / text_engineering from the
+next newer version (as in RCS), so memory grows with the size of the
+edits, not with revisions × text length. Reconstructing version k walks
+the deltas from the current text back to k; reconstructed versions are
+cached (a version's text never changes once created). Storage stats are
+running counters kept by record(), never recomputed from the chains.
+
+Delta format (JSON friendly): a list of [start, end] slices copied from
+the newer text and literal strings inserted between them.
+"""
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+
+from models import Requirement
+from persistent_map import PersistentMap
+
+Delta = List[Union[List[int], str]]
+
+RECONSTRUCTION_CACHE_SIZE = 1024
+
+
+# =====================
+#  Deltas
+# =====================
+
+def make_delta(newer: str, older: str) -> Delta:
+    """Delta rebuilding `older` from `newer`."""
+    delta: Delta = []
+    matcher = SequenceMatcher(None, newer, older, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            if delta and isinstance(delta[-1], list) and delta[-1][1] == i1:
+                delta[-1][1] = i2
+            else:
+                delta.append([i1, i2])
+        elif j2 > j1:   # replace / insert ; delete n'ajoute rien
+            if delta and isinstance(delta[-1], str):
+                delta[-1] += older[j1:j2]
+            else:
+                delta.append(older[j1:j2])
+    return delta
+
+
+def apply_delta(newer: str, delta: Delta) -> str:
+    return "".join(newer[op[0]:op[1]] if isinstance(op, list) else op for op in delta)
+
+
+def delta_size(delta: Delta) -> int:
+    """Approximate stored size: literal characters + 8 per copied slice."""
+    return sum(8 if isinstance(op, list) else len(op) for op in delta)
+
+
+def next_version(version: str) -> str:
+    """"1.0" -> "1.1", "2.9" -> "2.10"; unparseable versions get ".1" appended."""
+    m = re.fullmatch(r"(.*?)(\d+)", version or "")
+    if not m:
+        return f"{version or '1'}.1"
+    return f"{m.group(1)}{int(m.group(2)) + 1}"
+
+
+_WORD_RE = re.compile(r"\s+|\w+|[^\w\s]")
+
+
+def word_diff(old: str, new: str) -> List[Tuple[str, str, str]]:
+    """
+    Word-level diff for display: (tag, old fragment, new fragment) with
+    tag in equal / replace / delete / insert.
+    """
+    a = _WORD_RE.findall(old)
+    b = _WORD_RE.findall(new)
+    return [
+        (tag, "".join(a[i1:i2]), "".join(b[j1:j2]))
+        for tag, i1, i2, j1, j2 in SequenceMatcher(None, a, b, autojunk=False).get_opcodes()
+    ]
+
+
+def summarize_change(old: Requirement, new: Requirement) -> str:
+    parts = []
+    for label, attr in (("raw", "text_raw"), ("engineering", "text_engineering")):
+        before, after = getattr(old, attr), getattr(new, attr)
+        if before == after:
+            continue
+        removed = added = 0
+        for tag, o, n in word_diff(before, after):
+            if tag != "equal":
+                removed += len(o.split())
+                added += len(n.split())
+        parts.append(f"{label} +{added}/-{removed} words")
+    return f"Wording updated {old.version} -> {new.version}: " + (", ".join(parts) or "no text change")
+
+
+# =====================
+#  Révisions par exigence
+# =====================
+
+@dataclass(frozen=True)
+class Revision:
+    version: str
+    timestamp: datetime
+    summary: str            # change that led to the NEXT version
+    raw_delta: Delta        # rebuilds this version's text_raw from the next one
+    engineering_delta: Delta
+    full_chars: int = 0     # len(text_raw) + len(text_engineering) of this version
+
+
+@dataclass(frozen=True)
+class RevisionChain:
+    revisions: Tuple[Revision, ...]     # oldest first
+    head_version: str                   # version the newest delta applies to
+
+    @property
+    def versions(self) -> List[str]:
+        return [r.version for r in self.revisions] + [self.head_version]
+
+
+class RevisionStore:
+    """
+    Written by the store's single writer, read without locks. Each store
+    view has its own RevisionStore: the writer edits a copy() (chains are
+    a PersistentMap of immutable tuples, so copying is O(1)) and publishes
+    it with the next view. Reconstruction starts from the requirement of
+    the caller's own view.
+    """
+
+    def __init__(self) -> None:
+        self._chains: PersistentMap = PersistentMap()
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[str, str]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Compteurs pour stats(), tenus à jour par record()
+        self._revisions = 0
+        self._delta_chars = 0
+        self._full_chars = 0
+
+    def copy(self) -> "RevisionStore":
+        """Independent copy; the reconstruction cache is shared (a version's text never changes)."""
+        other = RevisionStore.__new__(RevisionStore)
+        other._chains = self._chains
+        other._cache = self._cache
+        other._cache_lock = self._cache_lock
+        other._revisions = self._revisions
+        other._delta_chars = self._delta_chars
+        other._full_chars = self._full_chars
+        return other
+
+    def _count(self, revisions: Tuple[Revision, ...], sign: int) -> None:
+        self._revisions += sign * len(revisions)
+        for rev in revisions:
+            self._delta_chars += sign * (delta_size(rev.raw_delta) + delta_size(rev.engineering_delta))
+            self._full_chars += sign * rev.full_chars
+
+    # --- Écriture ---
+    def record(self, previous: Requirement, current: Requirement,
+               timestamp: Optional[datetime] = None, summary: str = "") -> bool:
+        """
+        Stores `previous` as a delta against `current`. Returns False (and
+        stores nothing) if the wording did not change or the versions are
+        equal (legacy overwrite without version bump).
+        """
+        if previous.version == current.version:
+            return False
+        if previous.text_raw == current.text_raw and previous.text_engineering == current.text_engineering:
+            return False
+        revision = Revision(
+            version=previous.version,
+            timestamp=timestamp or datetime.utcnow(),
+            summary=summary,
+            raw_delta=make_delta(current.text_raw, previous.text_raw),
+            engineering_delta=make_delta(current.text_engineering, previous.text_engineering),
+            full_chars=len(previous.text_raw) + len(previous.text_engineering),
+        )
+        chain = self._chains.get(current.id)
+        revisions = chain.revisions if chain and chain.head_version == previous.version else ()
+        if chain is not None and not revisions:
+            # Chaîne rompue (version intermédiaire inconnue) : les anciennes révisions sont perdues
+            self._count(chain.revisions, -1)
+        self._count((revision,), 1)
+        self._chains = self._chains.set(current.id, RevisionChain(revisions + (revision,), current.version))
+        return True
+
+    # --- Lecture ---
+    def chain(self, req_id: str) -> Optional[RevisionChain]:
+        return self._chains.get(req_id)
+
+    def versions(self, current: Requirement) -> List[str]:
+        """Versions of a requirement up to `current`, oldest first."""
+        chain = self._chains.get(current.id)
+        if chain is None or current.version not in chain.versions:
+            return [current.version]
+        versions = chain.versions
+        return versions[:versions.index(current.version) + 1]
+
+    def revisions(self, current: Requirement) -> List[Revision]:
+        chain = self._chains.get(current.id)
+        if chain is None or current.version not in chain.versions:
+            return []
+        return list(chain.revisions[:chain.versions.index(current.version)])
+
+    def texts_at(self, current: Requirement, version: str) -> Optional[Tuple[str, str]]:
+        """(text_raw, text_engineering) of `version`, rebuilt from `current`."""
+        if version == current.version:
+            return current.text_raw, current.text_engineering
+        key = (current.id, version)
+        with self._cache_lock:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+                return hit
+
+        chain = self._chains.get(current.id)
+        if chain is None:
+            return None
+        versions = chain.versions
+        if version not in versions or current.version not in versions:
+            return None
+        target, anchor = versions.index(version), versions.index(current.version)
+        if target > anchor:
+            return None
+
+        raw, eng = current.text_raw, current.text_engineering
+        for i in range(anchor - 1, target - 1, -1):
+            rev = chain.revisions[i]
+            raw = apply_delta(raw, rev.raw_delta)
+            eng = apply_delta(eng, rev.engineering_delta)
+
+        with self._cache_lock:
+            self._cache[key] = (raw, eng)
+            while len(self._cache) > RECONSTRUCTION_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return raw, eng
+
+    def stats(self) -> Dict[str, int]:
+        """Stored delta size vs what full copies of every old revision would take (O(1))."""
+        return {
+            "requirements": len(self._chains),
+            "revisions": self._revisions,
+            "delta_chars": self._delta_chars,
+            "full_copy_chars": self._full_chars,
+        }
+
+    # --- Persistance (snapshots du journal) ---
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            req_id: {
+                "head": chain.head_version,
+                "revisions": [
+                    {
+                        "version": r.version,
+                        "timestamp": r.timestamp.isoformat(),
+                        "summary": r.summary,
+                        "raw": r.raw_delta,
+                        "engineering": r.engineering_delta,
+                        "chars": r.full_chars,
+                    }
+                    for r in chain.revisions
+                ],
+            }
+            for req_id, chain in self._chains.items()
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any],
+                   requirements: Optional[Mapping[str, Requirement]] = None) -> "RevisionStore":
+        """
+        `requirements` (current wordings) is only used for snapshots written
+        before the "chars" field: their old versions are rebuilt once to size them.
+        """
+        store = cls()
+        chains = store._chains.draft()
+        for req_id, data in (state or {}).items():
+            sizes = [r.get("chars") for r in data["revisions"]]
+            current = (requirements or {}).get(req_id)
+            if None in sizes and current is not None and current.version == data["head"]:
+                raw, eng = current.text_raw, current.text_engineering
+                for i in range(len(sizes) - 1, -1, -1):
+                    raw = apply_delta(raw, data["revisions"][i]["raw"])
+                    eng = apply_delta(eng, data["revisions"][i]["engineering"])
+                    sizes[i] = len(raw) + len(eng)
+            chain = RevisionChain(
+                tuple(
+                    Revision(
+                        version=r["version"],
+                        timestamp=datetime.fromisoformat(r["timestamp"]),
+                        summary=r["summary"],
+                        raw_delta=r["raw"],
+                        engineering_delta=r["engineering"],
+                        full_chars=size or 0,
+                    )
+                    for r, size in zip(data["revisions"], sizes)
+                ),
+                data["head"],
+            )
+            chains[req_id] = chain
+            store._count(chain.revisions, 1)
+        store._chains = chains.freeze()
+        return store
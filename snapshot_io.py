@@ -0,0 +1,395 @@
+# snapshot_io.py
+"""
+Columnar snapshot export / import (Parquet via Apache Arrow) for the store.
+
+A snapshot is a directory:
+
+    manifest.json          format version, row counts, source revision
+    regulations.parquet
+    requirements.parquet
+    impacts.parquet        components / tests / documents as list<dictionary<string>>
+    history.parquet
+
+Repeated values (IDs, country, criticality, component / test / document
+IDs…) are dictionary-encoded, so a processed R67 dataset can be shared
+without re-running the LLM pipeline. SnapshotReader reads only the columns
+it is asked for: the dashboard computes KPIs on a 1M-requirement snapshot
+without building a single dataclass; load_into_store() materializes
+everything when the data has to be edited.
+"""
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import fields
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from models import Regulation, Requirement, RequirementHistoryItem, RequirementImpact
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow ships with streamlit
+    pa = pc = pq = None
+
+SNAPSHOT_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+HISTORY_BATCH_ROWS = 50_000
+COMPRESSION = "zstd"
+# Copies des snapshots importés, dans le répertoire du journal (rejeu de l'import)
+IMPORTS_DIR = "imports"
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise RuntimeError("pyarrow is required for snapshot export/import (pip install pyarrow)")
+
+
+# ==========================
+#  Schémas
+# ==========================
+
+def _dict_string():
+    return pa.dictionary(pa.int32(), pa.string())
+
+
+def _schemas() -> Dict[str, "pa.Schema"]:
+    return {
+        "regulations": pa.schema([
+            ("id", pa.string()),
+            ("country", pa.string()),
+            ("title", pa.string()),
+            ("version", pa.string()),
+            ("date", pa.timestamp("us")),
+            ("url", pa.string()),
+            ("text", pa.large_string()),
+        ]),
+        "requirements": pa.schema([
+            ("id", pa.string()),
+            ("regulation_id", _dict_string()),
+            ("country", _dict_string()),
+            ("version", _dict_string()),
+            ("text_raw", pa.string()),
+            ("text_engineering", pa.string()),
+            ("created_at", pa.timestamp("us")),
+            ("compliance_eu", _dict_string()),
+            ("compliance_india", _dict_string()),
+            ("compliance_japan", _dict_string()),
+        ]),
+        "impacts": pa.schema([
+            ("requirement_id", pa.string()),
+            ("components", pa.list_(_dict_string())),
+            ("tests", pa.list_(_dict_string())),
+            ("documents", pa.list_(_dict_string())),
+            ("criticality", _dict_string()),
+            ("validation_actions", pa.list_(pa.string())),
+            ("fingerprint", _dict_string()),
+            ("tier", _dict_string()),
+            ("rules_confidence", pa.float64()),
+        ]),
+        "history": pa.schema([
+            ("timestamp", pa.timestamp("us")),
+            ("requirement_id", _dict_string()),
+            ("version", _dict_string()),
+            ("change_type", _dict_string()),
+            ("diff_summary", pa.string()),
+        ]),
+    }
+
+
+# =====================
+#  Petites fonctions
+# =====================
+
+def _dict_array(values: Sequence[Optional[str]]):
+    return pa.array(values, type=pa.string()).dictionary_encode()
+
+
+def _dict_list_array(lists: Iterable[Sequence[str]]):
+    """list<dictionary<string>> : un dictionnaire commun à toutes les lignes."""
+    offsets = [0]
+    flat: List[str] = []
+    for items in lists:
+        flat.extend(items or [])
+        offsets.append(len(flat))
+    values = pa.array(flat, type=pa.string()).dictionary_encode()
+    return pa.ListArray.from_arrays(pa.array(offsets, type=pa.int32()), values)
+
+
+def _string_list_array(lists: Iterable[Sequence[str]]):
+    return pa.array([list(items or []) for items in lists], type=pa.list_(pa.string()))
+
+
+def _write_table(table, path: str) -> None:
+    pq.write_table(table, path, compression=COMPRESSION)
+
+
+# ============================
+#  Export
+# ============================
+
+def _regulations_table(regulations: List[Regulation]):
+    return pa.table({
+        "id": [r.id for r in regulations],
+        "country": [r.country for r in regulations],
+        "title": [r.title for r in regulations],
+        "version": [r.version for r in regulations],
+        "date": pa.array([r.date for r in regulations], type=pa.timestamp("us")),
+        "url": [r.url for r in regulations],
+        "text": pa.array([r.text for r in regulations], type=pa.large_string()),
+    }, schema=_schemas()["regulations"])
+
+
+def _requirements_table(reqs: List[Requirement]):
+    return pa.table({
+        "id": pa.array([r.id for r in reqs], type=pa.string()),
+        "regulation_id": _dict_array([r.regulation_id for r in reqs]),
+        "country": _dict_array([r.country for r in reqs]),
+        "version": _dict_array([r.version for r in reqs]),
+        "text_raw": pa.array([r.text_raw for r in reqs], type=pa.string()),
+        "text_engineering": pa.array([r.text_engineering for r in reqs], type=pa.string()),
+        "created_at": pa.array([r.created_at for r in reqs], type=pa.timestamp("us")),
+        "compliance_eu": _dict_array([r.compliance_eu for r in reqs]),
+        "compliance_india": _dict_array([r.compliance_india for r in reqs]),
+        "compliance_japan": _dict_array([r.compliance_japan for r in reqs]),
+    }, schema=_schemas()["requirements"])
+
+
+def _impacts_table(impacts: List[RequirementImpact]):
+    return pa.table({
+        "requirement_id": pa.array([i.requirement_id for i in impacts], type=pa.string()),
+        "components": _dict_list_array(i.components for i in impacts),
+        "tests": _dict_list_array(i.tests for i in impacts),
+        "documents": _dict_list_array(i.documents for i in impacts),
+        "criticality": _dict_array([i.criticality for i in impacts]),
+        "validation_actions": _string_list_array(i.validation_actions for i in impacts),
+        "fingerprint": _dict_array([i.fingerprint for i in impacts]),
+        "tier": _dict_array([i.tier for i in impacts]),
+        "rules_confidence": pa.array([i.rules_confidence for i in impacts], type=pa.float64()),
+    }, schema=_schemas()["impacts"])
+
+
+def _history_batch(items: List[RequirementHistoryItem]):
+    return pa.table({
+        "timestamp": pa.array([h.timestamp for h in items], type=pa.timestamp("us")),
+        "requirement_id": _dict_array([h.requirement_id for h in items]),
+        "version": _dict_array([h.version for h in items]),
+        "change_type": _dict_array([h.change_type for h in items]),
+        "diff_summary": pa.array([h.diff_summary for h in items], type=pa.string()),
+    }, schema=_schemas()["history"])
+
+
+def _iter_history(store) -> Iterator[RequirementHistoryItem]:
+    """Full trail: streamed from the event log when there is one."""
+    if store.event_log is not None:
+        store.event_log.flush()
+        for event in store.event_log.iter_events():
+            yield RequirementHistoryItem(
+                timestamp=datetime.fromisoformat(event["ts"]),
+                requirement_id=event["requirement_id"],
+                version=event["version"],
+                change_type=event["change_type"],
+                diff_summary=event["summary"],
+            )
+    else:
+        yield from store.list_history()
+
+
+def export_snapshot(store, directory: str, include_history: bool = True) -> Dict[str, Any]:
+    """Writes the whole store to <directory> and returns the manifest."""
+    _require_pyarrow()
+    os.makedirs(directory, exist_ok=True)
+
+    # Une seule vue : requirements, impacts et révision cohérents entre eux
+    view = store.view()
+    reqs = view.requirements_by_date
+    impacts = sorted(view.impacts.values(), key=lambda i: i.requirement_id)
+
+    _write_table(_regulations_table(list(store.regulations.values())), os.path.join(directory, "regulations.parquet"))
+    _write_table(_requirements_table(reqs), os.path.join(directory, "requirements.parquet"))
+    _write_table(_impacts_table(impacts), os.path.join(directory, "impacts.parquet"))
+
+    history_rows = 0
+    history_path = os.path.join(directory, "history.parquet")
+    with pq.ParquetWriter(history_path, _schemas()["history"], compression=COMPRESSION) as writer:
+        batch: List[RequirementHistoryItem] = []
+        for item in (_iter_history(store) if include_history else ()):
+            batch.append(item)
+            if len(batch) >= HISTORY_BATCH_ROWS:
+                writer.write_table(_history_batch(batch))
+                history_rows += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(_history_batch(batch))
+            history_rows += len(batch)
+
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "created_at": datetime.utcnow().isoformat(),
+        "store_revision": view.revision,
+        "rows": {
+            "regulations": len(store.regulations),
+            "requirements": len(reqs),
+            "impacts": len(impacts),
+            "history": history_rows,
+        },
+    }
+    with open(os.path.join(directory, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# ============================
+#  Import (lazy)
+# ============================
+
+class SnapshotReader:
+    """
+    Lazy view over a snapshot directory. Nothing is read until a table is
+    requested, and then only the requested columns (memory-mapped).
+    """
+
+    TABLES = ("regulations", "requirements", "impacts", "history")
+
+    def __init__(self, directory: str) -> None:
+        _require_pyarrow()
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format: {self.manifest.get('format_version')}")
+
+    def _path(self, name: str) -> str:
+        if name not in self.TABLES:
+            raise KeyError(name)
+        return os.path.join(self.directory, f"{name}.parquet")
+
+    def num_rows(self, name: str) -> int:
+        """From the Parquet footer, without reading any data page."""
+        return pq.ParquetFile(self._path(name)).metadata.num_rows
+
+    def table(self, name: str, columns: Optional[List[str]] = None, filters=None):
+        return pq.read_table(self._path(name), columns=columns, filters=filters, memory_map=True)
+
+    def frame(self, name: str, columns: Optional[List[str]] = None, limit: Optional[int] = None):
+        """pandas DataFrame of the projected columns (only the first `limit` rows are read)."""
+        if limit is None:
+            return self.table(name, columns).to_pandas()
+        pf = pq.ParquetFile(self._path(name), memory_map=True)
+        batches = []
+        rows = 0
+        for batch in pf.iter_batches(batch_size=max(1, min(limit, 65_536)), columns=columns):
+            batches.append(batch)
+            rows += batch.num_rows
+            if rows >= limit:
+                break
+        if not batches:
+            return self.table(name, columns).to_pandas()
+        return pa.Table.from_batches(batches).slice(0, limit).to_pandas()
+
+    # --- KPIs directly on Arrow columns ---
+    def compliance_summary(self) -> Dict[str, Dict[str, Any]]:
+        """Same KPI as page 5 (OK / (OK + NOK)) on three dictionary columns."""
+        markets = {"eu": "compliance_eu", "india": "compliance_india", "japan": "compliance_japan"}
+        table = self.table("requirements", list(markets.values()))
+        summary = {}
+        for market, column in markets.items():
+            counts = {v["values"]: v["counts"]
+                      for v in pc.value_counts(table[column].cast(pa.string())).to_pylist()}
+            ok, nok = counts.get("OK", 0), counts.get("NOK", 0)
+            summary[market] = {
+                "rate": round(100.0 * ok / (ok + nok), 1) if (ok + nok) else 0.0,
+                "ok": ok,
+                "nok": nok,
+                "na": counts.get("NA", 0),
+            }
+        return summary
+
+    def value_counts(self, name: str, column: str) -> Dict[str, int]:
+        col = self.table(name, [column])[column]
+        if pa.types.is_list(col.type):
+            col = pc.list_flatten(col)
+        col = col.cast(pa.string())
+        return {v["values"]: v["counts"] for v in pc.value_counts(col).to_pylist()}
+
+    # --- Materialization ---
+    def _iter_dataclasses(self, name: str, cls, batch_size: int) -> Iterator[Any]:
+        # Conversion colonne par colonne (to_pylist par colonne puis zip) :
+        # bien plus rapide que batch.to_pylist(), qui crée un dict par ligne.
+        pf = pq.ParquetFile(self._path(name), memory_map=True)
+        # Colonnes ajoutées depuis (en fin de dataclass) : absentes des anciens
+        # snapshots, elles prennent leur valeur par défaut
+        available = set(pf.schema_arrow.names)
+        names = [f.name for f in fields(cls) if f.name in available]
+        for batch in pf.iter_batches(batch_size=batch_size, columns=names):
+            columns = [batch.column(n).to_pylist() for n in names]
+            for values in zip(*columns):
+                yield cls(*values)
+
+    def iter_requirements(self, batch_size: int = 65_536) -> Iterator[Requirement]:
+        return self._iter_dataclasses("requirements", Requirement, batch_size)
+
+    def iter_impacts(self, batch_size: int = 65_536) -> Iterator[RequirementImpact]:
+        return self._iter_dataclasses("impacts", RequirementImpact, batch_size)
+
+    def iter_history(self, batch_size: int = 65_536) -> Iterator[RequirementHistoryItem]:
+        return self._iter_dataclasses("history", RequirementHistoryItem, batch_size)
+
+    def regulations(self) -> List[Regulation]:
+        return [Regulation(**row) for row in self.table("regulations").to_pylist()]
+
+    def checksum(self) -> str:
+        """sha256 of the manifest and of the tables load_into_store() reads."""
+        digest = hashlib.sha256()
+        for name in (MANIFEST_NAME, "regulations.parquet", "requirements.parquet", "impacts.parquet"):
+            with open(os.path.join(self.directory, name), "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        return digest.hexdigest()
+
+    def copy_to(self, directory: str) -> str:
+        """
+        Copies the snapshot files to <directory> (written under a temporary
+        name, then renamed); an existing copy is kept as is. Returns directory.
+        """
+        if os.path.isdir(directory):
+            return directory
+        tmp = directory + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name in (MANIFEST_NAME, *(f"{t}.parquet" for t in self.TABLES)):
+            if os.path.exists(os.path.join(self.directory, name)):
+                shutil.copyfile(os.path.join(self.directory, name), os.path.join(tmp, name))
+        os.replace(tmp, directory)
+        return directory
+
+    def load_into_store(self, store) -> None:
+        """
+        Materializes regulations, requirements and impacts into the store,
+        in one write transaction. The import itself is logged as one event.
+        With an event log, the snapshot is first copied to
+        <log>/imports/<checksum>/ and the event points there, so replaying
+        it does not depend on this directory staying unchanged. History rows
+        go to the in-memory history only when there is no event log; with
+        one, they stay in the copied snapshot (iter_history).
+        """
+        checksum = self.checksum()
+        source = os.path.abspath(self.directory)
+        log = store.event_log
+        if log is not None and not log.read_only:
+            copy = self.copy_to(os.path.join(log.directory, IMPORTS_DIR, checksum[:16]))
+            source = os.path.relpath(copy, log.directory)   # le journal peut être déplacé
+        store.import_state(
+            list(self.iter_requirements()),
+            list(self.iter_impacts()),
+            source=source,
+            regulations=self.regulations(),
+            checksum=checksum,
+            history=self.iter_history() if log is None and os.path.exists(self._path("history")) else None,
+        )
+
+
+def open_snapshot(directory: str) -> SnapshotReader:
+    return SnapshotReader(directory)
@@ -0,0 +1,301 @@
+# source_index.py
+"""
+Source-offset index: where does a requirement come from in the regulation?
+
+Built once per regulation text (cached) on top of the normalized text
+(text_normalizer.py):
+
+- a paragraph tree ("6.15.1.2", "Annex 8 / 1.5.1.1") with the character
+  span of every paragraph, in the normalized and in the original text;
+- a word-trigram index over the normalized text. A requirement's
+  text_raw is located by looking up its own trigrams and voting for the
+  alignment (document position - query position) they agree on, so an
+  LLM quote that differs in a few words, spacing or line breaks still
+  finds its place. Cost depends on the length of the quote, not of the
+  regulation; the paragraph is then found by bisection.
+"""
+import bisect
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from models import Regulation, Requirement
+from text_normalizer import ANNEX_HEADING_RE, FILLER, NormalizedText, normalize_regulation
+
+NGRAM = 3
+# Trigrammes trop fréquents ("of the container") : pas discriminants
+MAX_POSTINGS = 40
+# Tolérance d'alignement (mots insérés / supprimés par le LLM)
+ALIGN_SLACK = 12
+MIN_SCORE = 0.25
+
+CACHE_SIZE = 8
+
+_PARAGRAPH_RE = re.compile(r"(\d{1,3}(?:\.\d{1,3}){0,6})\.(?:\s|$)")
+_WORD_RE = re.compile(r"\w+")
+
+
+@dataclass
+class Paragraph:
+    number: str                 # "6.15.1.2"
+    section: str                # "" (regulation body) or "Annex 8"
+    title: str                  # first line, number stripped
+    start: int                  # normalized text offsets
+    end: int
+    original_start: int         # Regulation.text offsets
+    original_end: int
+    parent: Optional[int] = None            # index in SourceIndex.paragraphs
+    children: List[int] = field(default_factory=list)
+
+    @property
+    def label(self) -> str:
+        return f"{self.section} / {self.number}" if self.section else self.number
+
+
+@dataclass
+class SourceLocation:
+    requirement_id: str
+    paragraph: Optional[str]    # label, e.g. "17.6.5.2" or "Annex 8 / 1.5.1.1"
+    start: int                  # normalized text offsets of the matched quote
+    end: int
+    original_start: int         # Regulation.text offsets
+    original_end: int
+    score: float                # share of the quote's trigrams found in place
+
+
+# =====================
+#  Arbre des paragraphes
+# =====================
+
+def _annex_key(label: str) -> Tuple[int, str, int]:
+    m = re.match(r"Annex (\d+)([A-Z]?)(?: [–-] Appendix (\d+))?", label)
+    return (int(m.group(1)), m.group(2), int(m.group(3) or 0)) if m else (0, "", 0)
+
+
+def _follows(prev: Optional[Tuple[int, ...]], num: Tuple[int, ...]) -> bool:
+    """
+    Plausible next paragraph number after `prev`: first child, next sibling
+    or next sibling of an ancestor (small gaps allowed for deleted
+    paragraphs). Rejects numbers that are just a wrapped cross-reference
+    ("...according to paragraph\\n17.7.1. below").
+    """
+    if prev is None:
+        return len(num) <= 2
+    if num[:-1] == prev and num[-1] <= 2:
+        return True
+    k = len(num) - 1
+    return k < len(prev) and num[:k] == prev[:k] and prev[k] < num[k] <= prev[k] + 3
+
+
+def _build_paragraphs(norm: NormalizedText) -> List[Paragraph]:
+    text = norm.text
+    paragraphs: List[Paragraph] = []
+    section = ""
+    prev: Optional[Tuple[int, ...]] = None
+
+    for m in re.finditer(r"(?m)^.*$", text):
+        line = m.group()
+        if not line or FILLER in line or norm.is_boilerplate(m.start()):
+            continue
+        annex = ANNEX_HEADING_RE.match(line)
+        if annex:
+            # Les annexes se suivent : une mention "Annex 15" seule sur une
+            # ligne au milieu du texte n'ouvre pas de section.
+            current = _annex_key(section) if section else (0, "", 0)
+            candidate = _annex_key(annex.group(1))
+            if current < candidate and candidate[0] - current[0] <= 2:
+                section, prev = annex.group(1), None
+            continue
+        h = _PARAGRAPH_RE.match(line)
+        if not h:
+            continue
+        num = tuple(int(x) for x in h.group(1).split("."))
+        if not _follows(prev, num):
+            continue
+        prev = num
+        paragraphs.append(
+            Paragraph(
+                number=h.group(1),
+                section=section,
+                title=line[h.end():].strip()[:120],
+                start=m.start(),
+                end=len(text),
+                original_start=0,
+                original_end=0,
+            )
+        )
+
+    # Fin d'un paragraphe = début du suivant ; parent = plus proche préfixe
+    stack: List[int] = []
+    for i, p in enumerate(paragraphs):
+        if i + 1 < len(paragraphs):
+            p.end = paragraphs[i + 1].start
+        p.original_start, p.original_end = norm.original_span(p.start, p.end)
+        depth = p.number.count(".")
+        while stack and (
+            paragraphs[stack[-1]].section != p.section
+            or paragraphs[stack[-1]].number.count(".") >= depth
+        ):
+            stack.pop()
+        if stack:
+            p.parent = stack[-1]
+            paragraphs[stack[-1]].children.append(i)
+        stack.append(i)
+    return paragraphs
+
+
+# =====================
+#  Index
+# =====================
+
+def _words(text: str) -> Tuple[List[str], List[Tuple[int, int]]]:
+    words, spans = [], []
+    for m in _WORD_RE.finditer(text):
+        words.append(m.group().lower())
+        spans.append((m.start(), m.end()))
+    return words, spans
+
+
+class SourceIndex:
+    def __init__(self, regulation: Regulation) -> None:
+        normalized = normalize_regulation(regulation)
+        self.regulation_id = regulation.id
+        self.text_hash = normalized.text_hash
+        self.norm = normalized.normalized
+        self.paragraphs = _build_paragraphs(self.norm)
+        self._starts = [p.start for p in self.paragraphs]
+        self._by_label: Dict[str, int] = {p.label: i for i, p in enumerate(self.paragraphs)}
+
+        words, self._word_spans = _words(self.norm.text)
+        postings: Dict[Tuple[str, ...], List[int]] = defaultdict(list)
+        for i in range(len(words) - NGRAM + 1):
+            postings[tuple(words[i:i + NGRAM])].append(i)
+        self._postings = {g: pos for g, pos in postings.items() if len(pos) <= MAX_POSTINGS}
+
+    # --- Paragraphes ---
+    def paragraph_at(self, pos: int) -> Optional[Paragraph]:
+        """Innermost paragraph containing a normalized offset."""
+        i = bisect.bisect_right(self._starts, pos) - 1
+        return self.paragraphs[i] if i >= 0 else None
+
+    def paragraph(self, label: str) -> Optional[Paragraph]:
+        i = self._by_label.get(label)
+        return self.paragraphs[i] if i is not None else None
+
+    def breadcrumb(self, paragraph: Paragraph) -> List[Paragraph]:
+        """Ancestors, outermost first, ending with the paragraph itself."""
+        chain = [paragraph]
+        while chain[-1].parent is not None:
+            chain.append(self.paragraphs[chain[-1].parent])
+        return chain[::-1]
+
+    # --- Localisation ---
+    def locate_text(self, quote: str) -> Optional[Tuple[int, int, int, float]]:
+        """
+        (start, end, anchor, score) of a quote in the normalized text, or
+        None. `anchor` is the median matched word, used to pick the
+        paragraph (the span may start on a repeated heading).
+        """
+        words, _ = _words(quote)
+        grams = [tuple(words[i:i + NGRAM]) for i in range(len(words) - NGRAM + 1)]
+        if not grams:
+            return None
+
+        hits: List[Tuple[int, int]] = []        # (alignement, position document)
+        for qi, gram in enumerate(grams):
+            for pos in self._postings.get(gram, ()):
+                hits.append((pos - qi, pos))
+        if not hits:
+            return None
+
+        # Alignement le plus soutenu, à ALIGN_SLACK mots près
+        votes = Counter(diag // ALIGN_SLACK for diag, _ in hits)
+        best = max(votes, key=lambda b: votes[b] + votes.get(b - 1, 0) + votes.get(b + 1, 0))
+        lo, hi = (best - 1) * ALIGN_SLACK, (best + 2) * ALIGN_SLACK
+        positions = sorted({pos for diag, pos in hits if lo <= diag < hi})
+
+        # Plus longue suite de positions proches : un titre répété juste
+        # avant le paragraphe ne doit pas tirer le début de la citation.
+        runs: List[List[int]] = [[positions[0]]]
+        for pos in positions[1:]:
+            if pos - runs[-1][-1] > NGRAM + ALIGN_SLACK // 2:
+                runs.append([])
+            runs[-1].append(pos)
+        positions = max(runs, key=len)
+        score = min(1.0, len(positions) / len(grams))
+        if score < MIN_SCORE:
+            return None
+
+        start = self._word_spans[positions[0]][0]
+        end = self._word_spans[min(positions[-1] + NGRAM - 1, len(self._word_spans) - 1)][1]
+        anchor = self._word_spans[positions[len(positions) // 2]][0]
+        return start, end, anchor, score
+
+    def locate(self, req: Requirement) -> Optional[SourceLocation]:
+        found = self.locate_text(req.text_raw)
+        if found is None:
+            return None
+        start, end, anchor, score = found
+        paragraph = self.paragraph_at(anchor)
+        original_start, original_end = self.norm.original_span(start, end)
+        return SourceLocation(
+            requirement_id=req.id,
+            paragraph=paragraph.label if paragraph else None,
+            start=start,
+            end=end,
+            original_start=original_start,
+            original_end=original_end,
+            score=score,
+        )
+
+
+# =====================
+#  Cache
+# =====================
+
+_indexes: "OrderedDict[Tuple[str, str], SourceIndex]" = OrderedDict()
+_locations: "OrderedDict[Tuple[str, str, str], Optional[SourceLocation]]" = OrderedDict()
+_cache_lock = threading.Lock()
+_build_lock = threading.Lock()
+
+LOCATION_CACHE_SIZE = 100_000
+
+
+def source_index(regulation: Regulation) -> SourceIndex:
+    """Index of a regulation (built once per text, cached)."""
+    key = (regulation.id, normalize_regulation(regulation).text_hash)
+    with _cache_lock:
+        hit = _indexes.get(key)
+    if hit is not None:
+        return hit
+    # Une seule construction à la fois (plusieurs sessions Streamlit)
+    with _build_lock:
+        with _cache_lock:
+            hit = _indexes.get(key)
+        if hit is not None:
+            return hit
+        index = SourceIndex(regulation)
+        print(f"[INFO] Source index {regulation.id}: {len(index.paragraphs)} paragraphs, "
+              f"{len(index._postings)} trigrams")
+        with _cache_lock:
+            _indexes[key] = index
+            while len(_indexes) > CACHE_SIZE:
+                _indexes.popitem(last=False)
+    return index
+
+
+def locate_requirement(req: Requirement, regulation: Regulation) -> Optional[SourceLocation]:
+    """Paragraph and span of a requirement's text_raw in its regulation (cached per wording)."""
+    index = source_index(regulation)
+    key = (index.text_hash, req.id, req.text_raw)
+    with _cache_lock:
+        if key in _locations:
+            return _locations[key]
+    location = index.locate(req)
+    with _cache_lock:
+        _locations[key] = location
+        while len(_locations) > LOCATION_CACHE_SIZE:
+            _locations.popitem(last=False)
+    return location
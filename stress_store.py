@@ -0,0 +1,226 @@
+# stress_store.py
+"""
+Concurrency stress test for the store (data_store.InMemoryStore).
+
+Simulates many Streamlit sessions hitting one store: each session thread
+mostly reads (requirement list, impacts, graph lookups, API payloads) and
+sometimes writes (compliance updates, impacts), while a batch writer keeps
+adding large extraction batches. Checks the snapshot guarantees on every
+read and reports read / write latency:
+
+  * a batch is all-or-nothing: a view never holds part of a batch;
+  * a compliance update is atomic: the three markets, always written
+    together with the same value, are never seen half-updated;
+  * the revision seen by a session never goes backwards;
+  * reads never take the write lock, so sessions keep reading while a
+    batch is being written (reads completed during batches are counted).
+
+    python stress_store.py --sessions 32 --seed 20000 --batch 20000 --duration 15
+    python stress_store.py --with-log        # same, with the event log attached
+
+Exits with status 1 if any violation or exception was seen.
+"""
+import argparse
+import random
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+from dataclasses import replace
+from datetime import datetime, timedelta
+from typing import List
+
+from api_server import StoreQueryApi
+from data_store import InMemoryStore
+from event_log import EventLog
+from load_test_api import _percentile, _seed_store
+from models import Requirement, RequirementImpact
+
+STATUSES = [None, "OK", "NOK", "NA"]
+COMPONENTS = ["LPG_TANK", "LPG_VALVE", "LPG_MULTIVALVE", "LPG_PIPE", "LPG_PRESSURE_REGULATOR"]
+API_PATHS = [
+    ("/requirements", "limit=50"),
+    ("/impacts", "component=LPG_TANK&limit=50"),
+    ("/compliance", "market=eu"),
+]
+
+
+class Stats:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.reads: List[float] = []
+        self.writes: List[float] = []
+        self.batches: List[float] = []
+        self.violations: List[str] = []
+        self.errors: List[str] = []
+        self.batch_running = threading.Event()
+        self.reads_during_batch = 0
+
+    def add(self, name: str, value) -> None:
+        with self.lock:
+            getattr(self, name).append(value)
+
+
+def _check_view(view, base_count: int, batch_size: int, last_revision: int) -> List[str]:
+    problems = []
+    if view.revision < last_revision:
+        problems.append(f"revision went backwards: {last_revision} -> {view.revision}")
+    extra = len(view.requirements) - base_count
+    if extra % batch_size:
+        problems.append(f"partial batch visible: {extra} requirements beyond the seed")
+    for r in view.requirements_by_date[:200]:
+        if not (r.compliance_eu == r.compliance_india == r.compliance_japan):
+            problems.append(f"torn compliance update on {r.id}")
+            break
+    return problems
+
+
+def _session(store: InMemoryStore, api: StoreQueryApi, stats: Stats, stop: threading.Event,
+             seed: int, write_ratio: float, base_count: int, batch_size: int) -> None:
+    rng = random.Random(seed)
+    last_revision = 0
+    while not stop.is_set():
+        try:
+            if rng.random() < write_ratio:
+                t0 = time.perf_counter()
+                req_id = f"R67-{rng.randint(1, base_count)}"
+                if rng.random() < 0.5:
+                    status = rng.choice(STATUSES)
+                    store.update_compliance(req_id, status, status, status)
+                else:
+                    store.save_impact(
+                        RequirementImpact(
+                            requirement_id=req_id,
+                            components=rng.sample(COMPONENTS, 2),
+                            tests=["TEST_LEAK"],
+                            documents=[],
+                            criticality=rng.choice(["HIGH", "MEDIUM", "LOW"]),
+                            validation_actions=[],
+                        )
+                    )
+                stats.add("writes", time.perf_counter() - t0)
+                continue
+
+            during_batch = stats.batch_running.is_set()
+            t0 = time.perf_counter()
+            view = store.view()
+            problems = _check_view(view, base_count, batch_size, last_revision)
+            last_revision = view.revision
+            view.graph.related("component", rng.choice(COMPONENTS), "test")
+            view.graph.change_impact("component", rng.choice(COMPONENTS), max_depth=1)
+            req_id = f"R67-{rng.randint(1, base_count)}"
+            view.impacts.get(req_id)
+            path, query = rng.choice(API_PATHS)
+            api.encoded_response(path, query)
+            stats.add("reads", time.perf_counter() - t0)
+            if during_batch and stats.batch_running.is_set():
+                with stats.lock:
+                    stats.reads_during_batch += 1
+            for p in problems:
+                stats.add("violations", p)
+        except Exception:
+            stats.add("errors", traceback.format_exc())
+
+
+def _batch_writer(store: InMemoryStore, stats: Stats, stop: threading.Event, batch_size: int) -> None:
+    base = datetime(2025, 1, 1)
+    n = 0
+    while not stop.is_set():
+        n += 1
+        reqs = [
+            Requirement(
+                id=f"B{n}-{k}",
+                regulation_id="UNECE-R67",
+                country="UNECE",
+                version="1.0",
+                text_raw=f"Batch {n} requirement {k}.",
+                text_engineering=f"Batch {n} requirement {k}.",
+                created_at=base + timedelta(seconds=k),
+            )
+            for k in range(batch_size)
+        ]
+        t0 = time.perf_counter()
+        stats.batch_running.set()
+        try:
+            store.add_requirements(reqs)
+        except Exception:
+            stats.add("errors", traceback.format_exc())
+        finally:
+            stats.batch_running.clear()
+        stats.add("batches", time.perf_counter() - t0)
+
+
+def _fmt_ms(values: List[float]) -> str:
+    if not values:
+        return "n/a"
+    s = sorted(values)
+    return (f"n={len(s)}  p50={_percentile(s, 50) * 1000:.2f}ms  "
+            f"p99={_percentile(s, 99) * 1000:.2f}ms  max={s[-1] * 1000:.2f}ms")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Concurrent sessions stress test for InMemoryStore")
+    parser.add_argument("--sessions", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=20_000, help="requirements in the initial store")
+    parser.add_argument("--batch", type=int, default=20_000, help="requirements per batch write")
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--with-log", action="store_true", help="attach an event log (temp directory)")
+    args = parser.parse_args()
+
+    store = InMemoryStore()
+    log_dir = None
+    if args.with_log:
+        log_dir = tempfile.mkdtemp(prefix="r67_stress_log_")
+        store.attach_event_log(EventLog(log_dir, fsync=False))
+
+    _seed_store(store, args.seed)
+    # Les trois marchés partagent la même valeur (invariant vérifié à la lecture)
+    with store._write() as draft:
+        for r in list(draft.requirements.values()):
+            draft.requirements[r.id] = replace(r, compliance_india=r.compliance_eu,
+                                               compliance_japan=r.compliance_eu)
+    base_count = len(store.requirements)
+
+    api = StoreQueryApi(store)
+    stats = Stats()
+    stop = threading.Event()
+    threads = [
+        threading.Thread(
+            target=_session,
+            args=(store, api, stats, stop, i, args.write_ratio, base_count, args.batch),
+            daemon=True,
+        )
+        for i in range(args.sessions)
+    ]
+    threads.append(threading.Thread(target=_batch_writer, args=(store, stats, stop, args.batch), daemon=True))
+
+    print(f"[INFO] {args.sessions} sessions + 1 batch writer for {args.duration:.0f}s "
+          f"({base_count} seeded requirements, batches of {args.batch})")
+    for t in threads:
+        t.start()
+    time.sleep(args.duration)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    if store.event_log is not None:
+        store.event_log.close()
+        shutil.rmtree(log_dir, ignore_errors=True)
+
+    print(f"reads    : {_fmt_ms(stats.reads)}")
+    print(f"writes   : {_fmt_ms(stats.writes)}")
+    print(f"batches  : {_fmt_ms(stats.batches)}")
+    print(f"reads completed while a batch was being written: {stats.reads_during_batch}")
+    print(f"revision : {store.revision}, {len(store.requirements)} requirements")
+    print(f"violations: {len(stats.violations)}  errors: {len(stats.errors)}")
+    for v in stats.violations[:5]:
+        print(f"  - {v}")
+    for e in stats.errors[:3]:
+        print(e)
+    return 1 if stats.violations or stats.errors else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,5 @@
+# Modules à plat à la racine du dépôt : importables depuis les tests
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
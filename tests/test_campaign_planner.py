@@ -0,0 +1,39 @@
+from campaign_planner import build_coverage_matrix, plan_test_campaign
+from models import RequirementImpact
+
+
+def _impact(req_id, tests):
+    return RequirementImpact(req_id, [], tests, [], "LOW", [])
+
+
+IMPACTS = [
+    _impact("R1", ["TEST_LEAK", "TEST_PRESSURE"]),
+    _impact("R2", ["TEST_LEAK"]),
+    _impact("R3", ["TEST_LEAK", "TEST_FIRE"]),
+    _impact("R4", ["TEST_FIRE"]),
+    _impact("R5", []),
+]
+
+
+def test_coverage_matrix():
+    matrix = build_coverage_matrix(IMPACTS)
+    assert matrix.untested == ["R5"]
+    assert sorted(matrix.requirements_in(matrix.tests["TEST_LEAK"])) == ["R1", "R2", "R3"]
+    assert matrix.all_bits.bit_count() == 4
+
+
+def test_greedy_cover_plans_each_test_once():
+    campaign = plan_test_campaign(build_coverage_matrix(IMPACTS))
+    assert campaign.tests == ["TEST_LEAK", "TEST_FIRE"]
+    assert campaign.covered == campaign.coverable == 4
+    assert campaign.naive_runs == 6
+    assert campaign.untested == ["R5"]
+    assert campaign.steps[-1].newly_covered == ["R4"]
+
+
+def test_costs_change_the_choice():
+    costs = {"TEST_LEAK": 10.0}
+    campaign = plan_test_campaign(build_coverage_matrix(IMPACTS), costs=costs)
+    assert "TEST_LEAK" in campaign.tests            # seul test de R2
+    assert campaign.tests[0] == "TEST_FIRE"
+    assert campaign.total_cost == 12.0
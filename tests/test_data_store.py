@@ -0,0 +1,66 @@
+import random
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+from data_store import InMemoryStore, _date_key
+from event_log import EventLog
+from models import Requirement
+
+T0 = datetime(2024, 1, 1)
+
+
+def _req(i, seconds):
+    return Requirement(
+        id=f"R67-{i}", regulation_id="UNECE-R67", country="EU", version="1.0",
+        text_raw=f"raw {i}", text_engineering=f"eng {i}", created_at=T0 + timedelta(seconds=seconds),
+    )
+
+
+def test_requirements_by_date_follows_every_write():
+    rng = random.Random(34)
+    store = InMemoryStore()
+    views = []
+    for _ in range(60):
+        batch = [_req(rng.randrange(300), rng.randrange(50)) for _ in range(rng.choice([1, 5, 200]))]
+        store.add_requirements(batch)
+        if rng.random() < 0.3:
+            req_id = rng.choice(list(store.view().requirements))
+            store.update_compliance(req_id, "OK", "NOK", "NA")
+        view = store.view()
+        views.append((view, list(view.requirements_by_date)))
+        assert view.requirements_by_date == sorted(view.requirements.values(), key=_date_key)
+    # Une vue publiée ne change jamais
+    for view, by_date in views:
+        assert view.requirements_by_date == by_date
+
+
+def test_no_in_memory_history_with_a_log(tmp_path):
+    store = InMemoryStore()
+    store.attach_event_log(EventLog(str(tmp_path), fsync=False))
+    store.add_requirements([_req(1, 0), _req(2, 1)])
+    assert store.list_history() == []
+    items, total = store.query_history()
+    assert total == 2 and {h.requirement_id for h in items} == {"R67-1", "R67-2"}
+    store.event_log.close()
+
+
+def test_read_only_store_follows_the_writer(tmp_path):
+    writer = InMemoryStore()
+    writer.attach_event_log(EventLog(str(tmp_path), fsync=False))
+    writer.add_requirements([_req(1, 0)])
+    writer.event_log.flush()
+
+    reader = InMemoryStore()
+    reader.attach_event_log(EventLog(str(tmp_path), read_only=True))
+    revision = reader.view().revision
+    assert reader.refresh_from_log() == 0 and reader.view().revision == revision
+
+    writer.add_requirements([_req(2, 1)])
+    writer.update_compliance("R67-1", "OK", "OK", "NA")
+    writer.event_log.flush()
+    assert reader.refresh_from_log() == 2
+    view = reader.view()
+    assert set(view.requirements) == {"R67-1", "R67-2"}
+    assert view.requirements["R67-1"] == replace(_req(1, 0), compliance_eu="OK", compliance_india="OK",
+                                                 compliance_japan="NA")
+    writer.event_log.close()
@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from event_log import EventLog, EventLogGap
+
+
+def _open(directory, applied, **kwargs):
+    log = EventLog(str(directory), fsync=False, **kwargs)
+    log.recover(lambda state: None, applied.append)
+    return log
+
+
+def _write_events(directory, n):
+    log = _open(directory, [])
+    for i in range(n):
+        log.append("requirement_created", f"R67-{i}", {"i": i}, change_type="created")
+    log.close()
+
+
+def _segment(directory):
+    names = sorted(n for n in os.listdir(directory) if n.startswith("events-"))
+    return os.path.join(directory, names[-1])
+
+
+def test_recover_cuts_a_truncated_last_line(tmp_path):
+    _write_events(tmp_path, 5)
+    path = _segment(tmp_path)
+    size = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(b'1234abcd {"seq":6,"ts"')     # écriture interrompue
+
+    applied = []
+    log = _open(tmp_path, applied)
+    assert [e["seq"] for e in applied] == [1, 2, 3, 4, 5]
+    assert os.path.getsize(path) == size
+    # La numérotation reprend juste après le dernier événement valide
+    assert log.append("requirement_created", "R67-5", {}, change_type="created", sync=True) == 6
+    log.close()
+
+    applied = []
+    _open(tmp_path, applied).close()
+    assert [e["seq"] for e in applied] == [1, 2, 3, 4, 5, 6]
+
+
+def test_read_only_recover_leaves_the_partial_line(tmp_path):
+    _write_events(tmp_path, 3)
+    path = _segment(tmp_path)
+    with open(path, "ab") as f:
+        f.write(b'1234abcd {"seq":4')
+    size = os.path.getsize(path)
+
+    applied = []
+    _open(tmp_path, applied, read_only=True)
+    assert len(applied) == 3
+    assert os.path.getsize(path) == size
+
+
+def test_corrupted_line_before_the_end_is_a_gap(tmp_path):
+    _write_events(tmp_path, 3)
+    path = _segment(tmp_path)
+    with open(path, "rb") as f:
+        lines = f.readlines()
+    lines[1] = lines[1].replace(b"R67-1", b"R67-X")      # crc faux
+    with open(path, "wb") as f:
+        f.writelines(lines)
+
+    with pytest.raises(EventLogGap):
+        _open(tmp_path, [])
+
+
+def test_missing_directory_is_an_empty_read_only_log(tmp_path):
+    applied = []
+    log = _open(tmp_path / "absent", applied, read_only=True)
+    assert applied == [] and log.last_seq == 0
+    assert not log.has_new_events()
@@ -0,0 +1,54 @@
+from dataclasses import replace
+
+from impact_engine import InferenceConfig, impact_fingerprint, stale_reasons
+from models import Requirement, RequirementImpact
+
+REQ = Requirement(
+    id="R67-001",
+    regulation_id="UNECE-R67",
+    country="EU",
+    version="1.0",
+    text_raw="The LPG tank shall withstand the test pressure.",
+    text_engineering="LPG_TANK pressure test",
+)
+LLM = InferenceConfig(tiered=False)
+TIERED = InferenceConfig(tiered=True, threshold=0.8, escalation_models=("mistral",))
+
+
+def _impact(req=REQ, config=LLM, **kwargs):
+    impact = RequirementImpact(req.id, ["LPG_TANK"], ["TEST_PRESSURE"], [], "HIGH", [])
+    fields = {"fingerprint": impact_fingerprint(req, config)}
+    fields.update(kwargs)
+    return replace(impact, **fields)
+
+
+def test_up_to_date_impact_has_no_reason():
+    assert stale_reasons(REQ, _impact(), LLM) == []
+
+
+def test_unversioned_impact():
+    assert stale_reasons(REQ, _impact(fingerprint=""), LLM) == ["unversioned"]
+
+
+def test_changed_wording():
+    revised = replace(REQ, text_engineering="LPG_TANK burst test")
+    assert stale_reasons(revised, _impact(), LLM) == ["text"]
+
+
+def test_other_pipeline():
+    assert stale_reasons(REQ, _impact(config=LLM), TIERED) == ["model"]
+
+
+def test_llm_failure_stays_stale():
+    impact = _impact(fingerprint=impact_fingerprint(REQ, LLM, llm_failed=True))
+    assert stale_reasons(REQ, impact, LLM) == ["llm-failed"]
+
+
+def test_threshold_change_only_stales_a_flipped_tier():
+    rules = _impact(config=TIERED, tier="rules", rules_confidence=0.9)
+    escalated = _impact(config=TIERED, tier="llm:mistral", rules_confidence=0.5)
+
+    assert stale_reasons(REQ, rules, replace(TIERED, threshold=0.85)) == []
+    assert stale_reasons(REQ, rules, replace(TIERED, threshold=0.95)) == ["threshold"]
+    assert stale_reasons(REQ, escalated, replace(TIERED, threshold=0.6)) == []
+    assert stale_reasons(REQ, escalated, replace(TIERED, threshold=0.4)) == ["threshold"]
@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from persistent_map import PersistentMap
+
+
+def test_draft_edits_do_not_change_the_base():
+    base = PersistentMap.from_items((f"k{i}", i) for i in range(1000))
+    draft = base.draft()
+    draft["k1"] = -1
+    draft["new"] = 0
+    del draft["k2"]
+
+    assert base["k1"] == 1 and "new" not in base and base["k2"] == 2
+    assert len(base) == 1000
+    assert draft["k1"] == -1 and draft["new"] == 0 and "k2" not in draft
+    assert len(draft) == 1000
+
+
+def test_freeze_publishes_and_closes_the_draft():
+    base = PersistentMap.from_items([("a", 1)])
+    draft = base.draft()
+    draft["b"] = 2
+    frozen = draft.freeze()
+
+    assert dict(frozen.items()) == {"a": 1, "b": 2}
+    with pytest.raises(RuntimeError):
+        draft["c"] = 3
+    # Un second brouillon du même parent ne voit rien du premier
+    other = base.draft()
+    other["c"] = 3
+    assert dict(other.freeze().items()) == {"a": 1, "c": 3}
+    assert dict(frozen.items()) == {"a": 1, "b": 2}
+
+
+def test_versions_match_a_dict_model():
+    rng = random.Random(67)
+    model = {}
+    current = PersistentMap()
+    versions = []
+    for _ in range(200):
+        draft = current.draft()
+        for _ in range(rng.randint(1, 20)):
+            key = rng.randrange(500)
+            if key in model and rng.random() < 0.3:
+                del draft[key]
+                del model[key]
+            else:
+                draft[key] = model[key] = rng.random()
+        current = draft.freeze()
+        versions.append((current, dict(model)))
+
+    for version, expected in versions:
+        assert len(version) == len(expected)
+        assert dict(version.items()) == expected
+        assert set(version) == set(expected)
+
+
+def test_set_and_discard():
+    m = PersistentMap().set("a", 1)
+    assert m.discard("missing") is m
+    assert "a" not in m.discard("a") and m["a"] == 1
@@ -0,0 +1,39 @@
+from text_normalizer import estimate_tokens, normalize_text, split_for_prompt
+
+RAW = (
+    "E/ECE/324/Rev.1/Add.66/Rev. 6\n"
+    "12\n"
+    "5.1.   The LPG  container shall be  fitted with a provisi ons valve.   \n"
+    "\n\n\n"
+    "5.2.   The  multivalve shall  be tested.\n"
+)
+
+
+def test_offsets_point_back_to_the_original():
+    normalized, _ = normalize_text(RAW)
+    text = normalized.text
+    assert len(normalized.offsets) == len(text) + 1
+    assert normalized.offsets[len(text)] == len(RAW)
+    for word in ("LPG", "container", "multivalve", "tested"):
+        start = text.index(word)
+        a, b = normalized.original_span(start, start + len(word))
+        assert RAW[a:b] == word
+    # Offsets croissants : l'ordre du texte est conservé
+    assert list(normalized.offsets) == sorted(normalized.offsets)
+
+
+def test_split_keeps_the_text_and_the_budget():
+    text = "".join(f"{n}.1. Requirement number {n} applies to the LPG tank.\n\n" for n in range(200))
+    chunks = split_for_prompt(text, 100)
+    assert "".join(chunks) == text
+    assert len(chunks) > 1
+    assert all(estimate_tokens(c) <= 100 for c in chunks)
+    # Coupé aux débuts de section
+    assert all(c[0].isdigit() for c in chunks)
+
+
+def test_split_cuts_a_line_longer_than_the_budget():
+    line = "word, " * 5000
+    chunks = split_for_prompt(line, 1000)
+    assert "".join(chunks) == line
+    assert all(estimate_tokens(c) <= 1000 for c in chunks)
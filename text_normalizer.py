@@ -0,0 +1,511 @@
+# text_normalizer.py
+"""
+Normalization of regulation text before it is sent to the LLM.
+
+r67_full.txt is raw PyPDF2 output: every page repeats the document symbol
+("E/ECE/324/Rev.1/Add.66/Rev. 6", "GE.23-01514(E)") and a page number,
+words are split by the PDF layout ("provisi ons", "categ ory"), lines end
+with stray spaces and the annexes are full of form filler ("........").
+All of it costs prompt tokens and context window.
+
+normalize_regulation() removes the page furniture, rejoins split words,
+collapses whitespace and tags the form-like annex sections (communication
+forms, table of contents) as boilerplate, which the extraction prompt
+replaces by a one-line marker. Each normalized character keeps the offset
+of the character it comes from, so anything found in the normalized text
+can be traced back to the original.
+
+split_for_prompt() cuts a normalized text into pieces that fit a token
+budget, at section / paragraph boundaries ("5.1.", "Annex 3", blank lines).
+
+Results are cached per (regulation, text hash, NORMALIZER_VERSION).
+"""
+import hashlib
+import re
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+from models import Regulation
+
+# À incrémenter dès que le résultat de la normalisation change (invalide le cache)
+NORMALIZER_VERSION = 1
+
+CACHE_SIZE = 16
+
+# =====================
+#  Règles
+# =====================
+
+# Lignes d'en-tête / pied de page supprimées où qu'elles soient
+# (numéro de tirage ONU, ex. "GE.23-01514(E)").
+FURNITURE_LINE_PATTERNS = [
+    re.compile(r"^\s*GE\.\d{2}\s*-\s*\d{5}\s*\(E\)\s*$"),
+]
+
+# Une ligne est un en-tête courant si elle ouvre au moins cette part des pages
+HEADER_MIN_PAGE_RATIO = 0.2
+HEADER_MIN_PAGES = 3
+# Lignes examinées en haut de chaque page
+PAGE_TOP_LINES = 5
+# Titre courant (ex. "Annex 8") placé juste avant le numéro de page
+RUNNING_TITLE_MAX_CHARS = 60
+
+# Glyphes de la police Symbol extraits en zone privée Unicode par PyPDF2
+SYMBOL_GLYPHS = {
+    "\uf0b1": "±",
+    "\uf0b3": "≥",
+    "\uf0a3": "≤",
+    "\uf0b0": "°",
+    "\uf0b4": "×",
+    "\uf0b7": "•",
+    "\uf0ae": "→",
+}
+
+# Points de conduite / champs à remplir des formulaires
+FILLER_RE = re.compile(r"[ \t]*(?:[.…_]{4,}[ \t]*)+")
+FILLER = "…"
+
+# Section "formulaire" : part minimale de lignes à remplir dans une fenêtre
+BOILERPLATE_WINDOW_LINES = 12
+BOILERPLATE_MIN_RATIO = 0.5
+ANNEX_HEADING_RE = re.compile(r"^(Annex \d+[A-Z]?(?: [–-] Appendix \d+)?)\s*$")
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]{1,4}|\s{2,}")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Token count approximation without a tokenizer: one token per word, per
+    group of up to 4 punctuation characters and per whitespace run (single
+    spaces are merged into the next word by BPE tokenizers).
+    """
+    return sum(1 for _ in _TOKEN_RE.finditer(text))
+
+
+# =====================
+#  Texte normalisé + table d'offsets
+# =====================
+
+@dataclass
+class BoilerplateSpan:
+    start: int          # offsets in the normalized text
+    end: int
+    label: str          # e.g. "Annex 2B", "Contents"
+
+
+@dataclass
+class NormalizedText:
+    text: str
+    # offsets[i] = index in the original text of text[i];
+    # offsets[len(text)] = len(original) (sentinel for span ends)
+    offsets: Sequence[int]
+    boilerplate: List[BoilerplateSpan] = field(default_factory=list)
+
+    def to_original(self, pos: int) -> int:
+        return self.offsets[max(0, min(pos, len(self.text)))]
+
+    def original_span(self, start: int, end: int) -> Tuple[int, int]:
+        """Span of the original text a normalized span [start, end) comes from."""
+        if end <= start:
+            pos = self.to_original(start)
+            return pos, pos
+        return self.to_original(start), self.to_original(end - 1) + 1
+
+    def is_boilerplate(self, pos: int) -> bool:
+        return any(b.start <= pos < b.end for b in self.boilerplate)
+
+    def without_boilerplate(self) -> "NormalizedText":
+        """Boilerplate spans replaced by a one-line marker (prompt form)."""
+        edits = [(b.start, b.end, f"[{b.label}: form omitted]\n") for b in self.boilerplate]
+        text, offsets = _apply_edits(self.text, self.offsets, edits)
+        return NormalizedText(text, offsets)
+
+
+@dataclass
+class NormalizationStats:
+    original_chars: int
+    normalized_chars: int
+    prompt_chars: int
+    original_tokens: int
+    normalized_tokens: int
+    prompt_tokens: int
+    header_lines_removed: int
+    page_numbers_removed: int
+    words_rejoined: int
+    boilerplate_sections: int
+    seconds: float
+
+    @property
+    def token_reduction(self) -> float:
+        """Share of the estimated prompt tokens saved (0.3 = 30 % fewer)."""
+        if not self.original_tokens:
+            return 0.0
+        return 1.0 - self.prompt_tokens / self.original_tokens
+
+
+@dataclass
+class NormalizedRegulation:
+    regulation_id: str
+    text_hash: str
+    normalized: NormalizedText      # full normalized text, boilerplate tagged
+    prompt: NormalizedText          # boilerplate replaced by markers
+    stats: NormalizationStats
+
+
+# =====================
+#  Réécriture avec suivi des offsets
+# =====================
+
+Edit = Tuple[int, int, str]   # (start, end, replacement)
+
+
+def _apply_edits(text: str, offsets: Sequence[int], edits: List[Edit]) -> Tuple[str, array]:
+    """
+    Applies non-overlapping edits and carries the offset map along:
+    kept characters keep their offset, replacement characters take the
+    offset of the start of the replaced span.
+    """
+    parts: List[str] = []
+    new_offsets = array("q")
+    pos = 0
+    for start, end, repl in sorted(edits):
+        if start < pos:
+            continue
+        parts.append(text[pos:start])
+        new_offsets.extend(offsets[pos:start])
+        if repl:
+            parts.append(repl)
+            new_offsets.extend([offsets[start]] * len(repl))
+        pos = end
+    parts.append(text[pos:])
+    new_offsets.extend(offsets[pos:])    # inclut la sentinelle
+    return "".join(parts), new_offsets
+
+
+def _sub(text: str, offsets: Sequence[int], pattern: "re.Pattern[str]", repl: str) -> Tuple[str, array, int]:
+    edits = [(m.start(), m.end(), repl) for m in pattern.finditer(text)]
+    new_text, new_offsets = _apply_edits(text, offsets, edits)
+    return new_text, new_offsets, len(edits)
+
+
+# =====================
+#  Passes
+# =====================
+
+def _line_spans(text: str, start: int, end: int) -> List[Tuple[int, int]]:
+    """(start, end) of each line in text[start:end], end excluding the newline."""
+    spans = []
+    pos = start
+    while pos < end:
+        nl = text.find("\n", pos, end)
+        stop = end if nl < 0 else nl
+        spans.append((pos, stop))
+        pos = stop + 1
+    return spans
+
+
+def _page_furniture(text: str) -> Tuple[List[Edit], int, int]:
+    """
+    Running headers and page numbers. PyPDF2 pages are joined with a blank
+    line; a line is a running header if it opens many pages (compared
+    without whitespace, which PyPDF2 inserts inconsistently).
+    """
+    page_starts = [0] + [m.end() for m in re.finditer(r"\n\n", text)]
+    pages = [
+        (start, page_starts[i + 1] if i + 1 < len(page_starts) else len(text))
+        for i, start in enumerate(page_starts)
+    ]
+
+    def key(line: str) -> str:
+        return re.sub(r"\s+", "", line)
+
+    top_counts: Counter = Counter()
+    for start, end in pages:
+        top = [key(text[s:e]) for s, e in _line_spans(text, start, end)[:PAGE_TOP_LINES]]
+        top_counts.update(k for k in set(top) if k)
+    min_pages = max(HEADER_MIN_PAGES, int(HEADER_MIN_PAGE_RATIO * len(pages)))
+    header_keys = {k for k, n in top_counts.items() if n >= min_pages}
+
+    edits: List[Edit] = []
+    headers = numbers = 0
+    last_page = 0
+
+    def page_number_at(s: int, e: int, expected: Tuple[int, ...]) -> Optional[re.Match]:
+        m = re.match(r"[ \t]*(\d{1,4})(?:[ \t]+|$)", text[s:e])
+        if m and int(m.group(1)) in expected:
+            return m
+        return None
+
+    for index, (start, end) in enumerate(pages, start=1):
+        expected = (index, last_page + 1)
+        lines = [(s, e) for s, e in _line_spans(text, start, end)[:PAGE_TOP_LINES] if text[s:e].strip()]
+        for i, (s, e) in enumerate(lines):
+            line = text[s:e]
+            if key(line) in header_keys:
+                edits.append((s, min(e + 1, len(text)), ""))
+                headers += 1
+                continue
+            m = page_number_at(s, e, expected)
+            if m:
+                edits.append((s, s + m.end(), ""))
+                numbers += 1
+                last_page = int(m.group(1))
+                break
+            # Titre courant ("Annex 8") suivi du numéro de page
+            nxt = lines[i + 1] if i + 1 < len(lines) else None
+            if nxt and len(line.strip()) <= RUNNING_TITLE_MAX_CHARS and page_number_at(*nxt, expected):
+                edits.append((s, min(e + 1, len(text)), ""))
+                headers += 1
+                continue
+            break
+
+    for s, e in _line_spans(text, 0, len(text)):
+        if any(p.match(text[s:e]) for p in FURNITURE_LINE_PATTERNS):
+            edits.append((s, min(e + 1, len(text)), ""))
+            headers += 1
+
+    return edits, headers, numbers
+
+
+_WORD_RE = re.compile(r"[A-Za-z]+")
+
+
+def _split_word_edits(text: str) -> List[Edit]:
+    """
+    Words split by the PDF layout ("provisi ons", "categ ory", "test s").
+    Two fragments separated by one space are rejoined when the joined word
+    occurs elsewhere in the document and at least one fragment is not a
+    word of its own there; "in a" or "m in" stay as they are.
+    """
+    counts = Counter(w.lower() for w in _WORD_RE.findall(text))
+
+    def is_word(fragment: str, joined_count: int) -> bool:
+        if len(fragment) == 1 and fragment.lower() not in ("a", "i"):
+            return False
+        return counts[fragment.lower()] >= joined_count
+
+    edits: List[Edit] = []
+    prev: Optional[re.Match] = None
+    for m in _WORD_RE.finditer(text):
+        if prev is not None and m.start() == prev.end() + 1 and text[prev.end()] == " ":
+            left, right = prev.group(), m.group()
+            joined = counts[(left + right).lower()]
+            if (
+                joined >= 2
+                and not (right[0].isupper() and not left.isupper())
+                and not (is_word(left, joined) and is_word(right, joined))
+                and not re.search(r"\d\s*$", text[max(0, prev.start() - 3):prev.start()])
+            ):
+                edits.append((prev.end(), m.start(), ""))
+                # "provisi ons" recollé : le fragment suivant repart du mot entier
+        prev = m
+    return edits
+
+
+def _boilerplate_spans(text: str) -> List[BoilerplateSpan]:
+    """
+    Form-like sections: windows of lines where most lines are form fields
+    (contain filler). Labelled with the enclosing annex, or "Contents"
+    before the first annex.
+    """
+    lines = _line_spans(text, 0, len(text))
+    filled = [FILLER in text[s:e] for s, e in lines]
+    half = BOILERPLATE_WINDOW_LINES // 2
+
+    dense = [False] * len(lines)
+    window = sum(filled[:BOILERPLATE_WINDOW_LINES])
+    for i in range(len(lines)):
+        lo = i - half
+        if 0 < lo and lo + BOILERPLATE_WINDOW_LINES <= len(lines):
+            window += filled[lo + BOILERPLATE_WINDOW_LINES - 1] - filled[lo - 1]
+        dense[i] = filled[i] and window >= BOILERPLATE_MIN_RATIO * BOILERPLATE_WINDOW_LINES
+
+    spans: List[BoilerplateSpan] = []
+    label = "Contents"
+    run_start: Optional[int] = None
+    last_dense = -1
+    for i, (s, e) in enumerate(lines):
+        heading = ANNEX_HEADING_RE.match(text[s:e])
+        if heading:
+            if run_start is not None:
+                spans.append(BoilerplateSpan(lines[run_start][0], lines[last_dense][1] + 1, label))
+                run_start = None
+            label = heading.group(1)
+        if dense[i]:
+            if run_start is None:
+                run_start = i
+            last_dense = i
+        elif run_start is not None and i - last_dense > half:
+            spans.append(BoilerplateSpan(lines[run_start][0], lines[last_dense][1] + 1, label))
+            run_start = None
+    if run_start is not None:
+        spans.append(BoilerplateSpan(lines[run_start][0], min(lines[last_dense][1] + 1, len(text)), label))
+    return spans
+
+
+# Espaces : runs, fins / débuts de ligne, lignes vides multiples
+_MULTI_SPACE_RE = re.compile(r"(?<=[ \t])[ \t]+")
+_EDGE_SPACE_RE = re.compile(r"[ \t]+(?=\n)|(?<=\n)[ \t]+")
+_MULTI_NEWLINE_RE = re.compile(r"(?<=\n\n)\n+")
+_FILLER_LINE_RE = re.compile(r"(?m)^…\n")
+_HYPHEN_SPLIT_RE = re.compile(r"(?<=[A-Za-z]) +(?=-[A-Za-z])")
+
+
+def normalize_text(original: str) -> Tuple[NormalizedText, dict]:
+    """Runs every pass on a raw text; returns the normalized text and pass counters."""
+    text = original.translate(str.maketrans(SYMBOL_GLYPHS)).replace("\t", " ").replace("\u00a0", " ")
+    offsets: Sequence[int] = range(len(text) + 1)   # translate ne change pas les longueurs
+
+    edits, headers, numbers = _page_furniture(text)
+    text, offsets = _apply_edits(text, offsets, edits)
+
+    text, offsets, _ = _sub(text, offsets, FILLER_RE, f" {FILLER} ")
+    text, offsets, _ = _sub(text, offsets, _HYPHEN_SPLIT_RE, "")
+    split_edits = _split_word_edits(text)
+    text, offsets = _apply_edits(text, offsets, split_edits)
+
+    text, offsets, _ = _sub(text, offsets, _MULTI_SPACE_RE, "")
+    text, offsets, _ = _sub(text, offsets, _EDGE_SPACE_RE, "")
+    text, offsets, _ = _sub(text, offsets, _FILLER_LINE_RE, "")
+    text, offsets, _ = _sub(text, offsets, _MULTI_NEWLINE_RE, "")
+
+    # Bords du document
+    lead = len(text) - len(text.lstrip())
+    trail = len(text.rstrip())
+    text, offsets = text[lead:trail], array("q", offsets[lead:trail]) + array("q", [len(original)])
+
+    normalized = NormalizedText(text, offsets, _boilerplate_spans(text))
+    counters = {"headers": headers, "page_numbers": numbers, "words_rejoined": len(split_edits)}
+    return normalized, counters
+
+
+# =====================
+#  Découpage pour le prompt
+# =====================
+
+# Débuts de section : numéro de paragraphe, "Annex N", "Part II", ou ligne après une ligne vide
+_SECTION_START_RE = re.compile(r"(?m)^(?=\d{1,3}(?:\.\d{1,3})*\.\s|Annex \d|Part [IVX]+\b)|(?<=\n\n)")
+
+
+def _pack(pieces: List[str], max_tokens: int) -> List[str]:
+    chunks: List[str] = []
+    current: List[str] = []
+    used = 0
+    for piece in pieces:
+        tokens = estimate_tokens(piece)
+        if current and current[-1][-1:].isspace() and piece[:1].isspace():
+            tokens += 1  # "\n" + "\n" : deux blancs isolés font un token une fois recollés
+        if current and used + tokens > max_tokens:
+            chunks.append("".join(current))
+            current, used = [], 0
+        current.append(piece)
+        used += tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+def _hard_split(line: str, max_tokens: int) -> List[str]:
+    """Cuts a line every max_tokens tokens (at a token start, never inside a word)."""
+    cuts = [m.start() for n, m in enumerate(_TOKEN_RE.finditer(line)) if n and n % max_tokens == 0]
+    return [line[a:b] for a, b in zip([0] + cuts, cuts + [len(line)])]
+
+
+def split_for_prompt(text: str, max_tokens: int) -> List[str]:
+    """
+    Consecutive pieces of `text` of at most ~max_tokens (estimate_tokens),
+    cut at section starts; a section longer than the budget is cut between
+    lines, and a line longer than the budget (table, text without line
+    breaks) between tokens. "".join(result) == text.
+    """
+    max_tokens = max(1, max_tokens)
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+    starts = sorted({0, *(m.start() for m in _SECTION_START_RE.finditer(text))})
+    sections = [text[a:b] for a, b in zip(starts, starts[1:] + [len(text)]) if b > a]
+    pieces: List[str] = []
+    for section in sections:
+        if estimate_tokens(section) > max_tokens:
+            for line in section.splitlines(keepends=True):
+                if estimate_tokens(line) > max_tokens:
+                    pieces.extend(_hard_split(line, max_tokens))
+                else:
+                    pieces.append(line)
+        else:
+            pieces.append(section)
+    return _pack(pieces, max_tokens)
+
+
+# =====================
+#  Cache par règlement
+# =====================
+
+_cache: "OrderedDict[Tuple[str, str, int], NormalizedRegulation]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def normalize_regulation(regulation: Regulation) -> NormalizedRegulation:
+    """Normalized text of a regulation (cached)."""
+    digest = text_hash(regulation.text)
+    key = (regulation.id, digest, NORMALIZER_VERSION)
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is not None:
+            _cache.move_to_end(key)
+            return hit
+
+    t0 = time.perf_counter()
+    normalized, counters = normalize_text(regulation.text)
+    prompt = normalized.without_boilerplate()
+    stats = NormalizationStats(
+        original_chars=len(regulation.text),
+        normalized_chars=len(normalized.text),
+        prompt_chars=len(prompt.text),
+        original_tokens=estimate_tokens(regulation.text),
+        normalized_tokens=estimate_tokens(normalized.text),
+        prompt_tokens=estimate_tokens(prompt.text),
+        header_lines_removed=counters["headers"],
+        page_numbers_removed=counters["page_numbers"],
+        words_rejoined=counters["words_rejoined"],
+        boilerplate_sections=len(normalized.boilerplate),
+        seconds=time.perf_counter() - t0,
+    )
+    result = NormalizedRegulation(regulation.id, digest, normalized, prompt, stats)
+    print(
+        f"[INFO] {regulation.id} normalized: ~{stats.original_tokens} -> ~{stats.prompt_tokens} tokens "
+        f"(-{stats.token_reduction:.0%}) in {stats.seconds:.2f}s"
+    )
+
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+if __name__ == "__main__":
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "r67_full.txt"
+    with open(path, encoding="utf-8") as f:
+        raw = f.read()
+    from datetime import datetime
+
+    reg = Regulation(id=path, country="", title=path, version="", date=datetime.utcnow(), url="", text=raw)
+    result = normalize_regulation(reg)
+    s = result.stats
+    print(f"chars   : {s.original_chars} -> {s.normalized_chars} (prompt {s.prompt_chars})")
+    print(f"tokens  : ~{s.original_tokens} -> ~{s.normalized_tokens} (prompt ~{s.prompt_tokens}, "
+          f"-{s.token_reduction:.0%})")
+    print(f"removed : {s.header_lines_removed} header lines, {s.page_numbers_removed} page numbers; "
+          f"{s.words_rejoined} words rejoined")
+    for b in result.normalized.boilerplate:
+        print(f"boilerplate: {b.label:28s} {b.end - b.start:7d} chars")